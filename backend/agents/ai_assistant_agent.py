@@ -1,7 +1,8 @@
-import requests
-import os
 from typing import Dict, List, Any
 from backend.agents.base_agent import BaseAgent
+from backend.llm_router import llm_router
+from backend.precompute import retrieve_context
+from backend.semantic_cache import SEMANTIC_CACHE_ENABLED, semantic_cache
 from backend.utils import logger
 
 class AIAssistantAgent(BaseAgent):
@@ -9,25 +10,39 @@ class AIAssistantAgent(BaseAgent):
     
     def __init__(self):
         super().__init__("AI Assistant")
-        self.google_api_key = os.getenv("GOOGLE_API_KEY")
     
     async def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Answer questions using the research context"""
         question = state.get("question", "")
         context = state.get("context", "")
+        conversation = state.get("conversation", "")
         
         logger.info(f"[{self.name}] Answering question: {question}")
         
-        if not self.google_api_key:
-            raise Exception("GOOGLE_API_KEY not configured")
-        
         if not question:
             logger.warning(f"[{self.name}] No question provided")
             state["answer"] = "No question provided."
             return state
         
+        # Reuse the answer to a near-identical question about the same context. Questions
+        # asked mid-conversation may refer back to earlier turns, so they bypass the cache.
+        use_cache = SEMANTIC_CACHE_ENABLED and bool(context) and not conversation
+        if use_cache:
+            cached = await semantic_cache.lookup(context, question)
+            if cached is not None:
+                state["answer"] = cached
+                return state
+        
+        # Large contexts indexed after research are answered from their most relevant chunks
+        relevant = await retrieve_context(context, question) if context else None
+        if relevant is not None:
+            logger.info(f"[{self.name}] Answering from {len(relevant)} of {len(context)} context characters")
+        
         # Generate answer
-        answer = self._generate_answer_with_gemini(question, context)
+        answer = await self._generate_answer(question, relevant or context, conversation)
+        
+        if use_cache:
+            await semantic_cache.store(context, question, answer)
         
         logger.info(f"[{self.name}] Question answered successfully")
         
@@ -36,36 +51,22 @@ class AIAssistantAgent(BaseAgent):
         
         return state
     
-    def _generate_answer_with_gemini(self, question: str, context: str) -> str:
-        """Generate answer using Google Gemini API"""
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={self.google_api_key}"
-        
+    async def _generate_answer(self, question: str, context: str, conversation: str = "") -> str:
+        """Generate answer with the QA route"""
+        # Bounded conversation memory (rolling summary + recent turns) for multi-turn chat
+        history = f"\n\n{conversation}\n" if conversation else ""
         prompt = f"""You are a helpful AI assistant. Answer the following question using the provided context information.
         
 Question: {question}
 
 Context Information:
 {context}
-
+{history}
 Provide a clear and concise answer based on the context. If the context doesn't contain relevant information, say so."""
 
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.5,
-                "maxOutputTokens": 2048
-            }
-        }
-        
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            return result["candidates"][0]["content"]["parts"][0]["text"]
+            result = await llm_router.agenerate("qa", prompt)
+            return result["content"]
         except Exception as e:
-            logger.error(f"[{self.name}] Gemini QA failed: {str(e)}")
+            logger.error(f"[{self.name}] QA generation failed: {str(e)}")
             raise Exception(f"Question answering failed: {str(e)}")
\ No newline at end of file
@@ -1,4 +1,5 @@
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, Optional
 from backend.agents.base_agent import BaseAgent
 from backend.agents.researcher_agent import ResearcherAgent
 from backend.agents.image_agent import ImageAgent
@@ -6,19 +7,40 @@ from backend.agents.source_agent import SourceAgent
 from backend.agents.report_agent import ReportAgent
 from backend.agents.ai_assistant_agent import AIAssistantAgent
 from backend.agents.document_analyzer_agent import DocumentAnalyzerAgent
+from backend.checkpoints import CheckpointStore
+from backend.deadline import DeadlineExceeded, current_deadline, run_stage
 from backend.utils import logger
 
+# Share of the remaining request time each research stage may use
+STAGE_BUDGETS = {
+    "research": 0.6,
+    "images": 0.25,
+    "sources": 0.5,
+    "report": 1.0,
+}
+# Stages whose timeout degrades the result instead of failing the request
+OPTIONAL_STAGES = {"images"}
+
 class ChiefAgent(BaseAgent):
     """Chief agent that orchestrates all other agents"""
     
-    def __init__(self):
+    def __init__(self, checkpoint_store: Optional[CheckpointStore] = None):
         super().__init__("Chief")
+        self.checkpoint_store = checkpoint_store
         self.researcher = ResearcherAgent()
         self.image_agent = ImageAgent()
         self.source_agent = SourceAgent()
         self.report_agent = ReportAgent()
         self.ai_assistant = AIAssistantAgent()
         self.document_analyzer = DocumentAnalyzerAgent()
+        
+        # Research pipeline stages, in order; each stage's output is checkpointed
+        self.research_stages = [
+            ("research", self.researcher),
+            ("images", self.image_agent),
+            ("sources", self.source_agent),
+            ("report", self.report_agent),
+        ]
     
     async def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Orchestrate the research workflow"""
@@ -38,22 +60,60 @@ class ChiefAgent(BaseAgent):
             else:
                 # For research requests, execute the full workflow
                 logger.info(f"[{self.name}] Processing research request")
-                
-                # 1. Researcher Agent - Gather information
-                state = await self.researcher.execute(state)
-                
-                # 2. Image Agent - Extract visual assets
-                state = await self.image_agent.execute(state)
-                
-                # 3. Source Agent - Process sources
-                state = await self.source_agent.execute(state)
-                
-                # 4. Report Agent - Generate report
-                state = await self.report_agent.execute(state)
+                state = await self._run_research_stages(state)
             
             logger.info(f"[{self.name}] Workflow completed successfully")
             return state
             
         except Exception as e:
             logger.error(f"[{self.name}] Workflow failed: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
+    
+    async def _run_research_stages(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the research stages, resuming after the last checkpointed stage of this run"""
+        run_id = state.get("run_id")
+        store = self.checkpoint_store if run_id else None
+        
+        completed = None
+        if store:
+            checkpoint = await asyncio.to_thread(store.load, run_id)
+            if checkpoint and self._same_request(checkpoint["state"], state):
+                completed = checkpoint["stage"]
+                state = checkpoint["state"]
+                logger.info(f"[{self.name}] Resuming run {run_id} after stage '{completed}'")
+            elif checkpoint:
+                # The run id was reused for a different topic or depth; start over
+                logger.info(f"[{self.name}] Discarding checkpoint of run {run_id} for a different request")
+                await asyncio.to_thread(store.delete, run_id)
+        
+        stage_names = [name for name, _ in self.research_stages]
+        start = stage_names.index(completed) + 1 if completed in stage_names else 0
+        
+        deadline = current_deadline.get()
+        for name, agent in self.research_stages[start:]:
+            # 1. Researcher, 2. Image, 3. Source, 4. Report
+            try:
+                state = await run_stage(deadline, STAGE_BUDGETS[name], agent.execute(state))
+            except DeadlineExceeded:
+                if name not in OPTIONAL_STAGES or (deadline is not None and deadline.cancelled):
+                    raise
+                logger.warning(f"[{self.name}] Stage '{name}' ran out of time, continuing without it")
+            
+            # A refresh without material new findings keeps the stored report
+            if name == "research" and state.get("refreshed") and not state.get("refresh_material"):
+                logger.info(f"[{self.name}] No material updates since last run, reusing report")
+                break
+            
+            if store and name != stage_names[-1]:
+                await asyncio.to_thread(store.save, run_id, name, state)
+        
+        # Completed runs need no resume point
+        if store:
+            await asyncio.to_thread(store.delete, run_id)
+        
+        return state
+    
+    @staticmethod
+    def _same_request(saved: Dict[str, Any], state: Dict[str, Any]) -> bool:
+        """A checkpoint only resumes the request that wrote it"""
+        return all(saved.get(key) == state.get(key) for key in ("topic", "is_deep"))
@@ -1,5 +1,12 @@
 from typing import Dict, List, Any
 from backend.agents.base_agent import BaseAgent
+from backend.images import (
+    IMAGE_PHASH_DEDUPE,
+    MAX_IMAGES,
+    dedupe_by_perceptual_hash,
+    dedupe_image_urls,
+    filter_live_images,
+)
 from backend.utils import logger
 
 class ImageAgent(BaseAgent):
@@ -14,13 +21,24 @@ class ImageAgent(BaseAgent):
         
         # Extract images from the search results
         search_results = state.get("search_results", {})
-        images = []
+        raw_images = search_results.get("images", [])
         
-        # Get images from Tavily search results
-        if "images" in search_results:
-            images.extend(search_results["images"])
+        # 1. Canonicalize URLs and drop duplicates
+        images = dedupe_image_urls(raw_images)
         
-        logger.info(f"[{self.name}] Extracted {len(images)} images")
+        # 2. Drop dead links (checked concurrently, results cached)
+        try:
+            images = await filter_live_images(images)
+        except Exception as e:
+            logger.warning(f"[{self.name}] Image liveness check failed: {str(e)}")
+        
+        # 3. Optionally drop visually identical images hosted at different URLs
+        if IMAGE_PHASH_DEDUPE:
+            images = await dedupe_by_perceptual_hash(images)
+        
+        images = images[:MAX_IMAGES]
+        
+        logger.info(f"[{self.name}] Kept {len(images)} of {len(raw_images)} images")
         
         # Update state
         state["images"] = images
@@ -1,29 +1,40 @@
-import requests
+import asyncio
+import json
 import os
-from typing import Dict, Any
+import re
+from typing import Dict, Any, List
 from backend.agents.base_agent import BaseAgent
+from backend.deadline import DeadlineExceeded
+from backend.llm_router import llm_router
 from backend.utils import logger
 
+# "sectioned" generates deep reports section by section in parallel; "single" uses one call
+DEEP_REPORT_MODE = os.getenv("DEEP_REPORT_MODE", "sectioned")
+# Number of context passages handed to each analysis section
+SECTION_PASSAGES = 4
+# Overview sections (e.g. executive summary) see a trimmed slice of every passage
+OVERVIEW_PASSAGE_CHARS = 400
+
 class ReportAgent(BaseAgent):
-    """Agent responsible for generating reports using Gemini"""
+    """Agent responsible for generating reports through the LLM router"""
     
     def __init__(self):
         super().__init__("Report")
-        self.google_api_key = os.getenv("GOOGLE_API_KEY")
     
     async def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate report using Google Gemini"""
+        """Generate report using the model routed for the report type"""
         topic = state.get("topic", "")
         is_deep = state.get("is_deep", False)
         context = state.get("context", "")
         
         logger.info(f"[{self.name}] Generating {'deep' if is_deep else 'quick'} report on: {topic}")
         
-        if not self.google_api_key:
-            raise Exception("GOOGLE_API_KEY not configured")
-        
         # Generate report
-        report_content = self._generate_report_with_gemini(topic, context, is_deep)
+        report_content = None
+        if is_deep and DEEP_REPORT_MODE == "sectioned":
+            report_content = await self._generate_sectioned_report(topic, context)
+        if report_content is None:
+            report_content = await self._generate_report(topic, context, is_deep)
         
         logger.info(f"[{self.name}] Report generation completed")
         
@@ -32,10 +43,8 @@ class ReportAgent(BaseAgent):
         
         return state
     
-    def _generate_report_with_gemini(self, topic: str, context: str, is_deep: bool) -> str:
-        """Generate report using Google Gemini API"""
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={self.google_api_key}"
-        
+    async def _generate_report(self, topic: str, context: str, is_deep: bool) -> str:
+        """Generate report with the deep or quick report route"""
         if is_deep:
             prompt = f"""You are a research analyst tasked with creating a comprehensive report on "{topic}".
             
@@ -62,23 +71,143 @@ Context Information:
 
 Provide a well-structured markdown report with appropriate headings and sections."""
         
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.7,
-                "maxOutputTokens": 8192 if is_deep else 4096
-            }
-        }
+        try:
+            result = await llm_router.agenerate("deep_report" if is_deep else "quick_report", prompt)
+            return result["content"]
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"[{self.name}] Report generation failed: {str(e)}")
+            raise Exception(f"Report generation failed: {str(e)}")
+    
+    async def _generate_sectioned_report(self, topic: str, context: str):
+        """Generate a deep report from an outline with sections written concurrently.
+        
+        Returns None when the outline or too many sections fail, so the caller
+        can fall back to single-call generation.
+        """
+        passages = self._split_passages(context)
+        outline = await self._generate_outline(topic, passages)
+        if not outline:
+            return None
+        
+        sections = outline["sections"]
+        logger.info(f"[{self.name}] Writing {len(sections)} sections concurrently")
+        
+        results = await asyncio.gather(
+            *[self._generate_section(topic, section, self._select_passages(section, passages)) for section in sections],
+            return_exceptions=True
+        )
+        
+        # Out of time or cancelled: a single-call fallback would only overrun the deadline
+        for result in results:
+            if isinstance(result, (DeadlineExceeded, asyncio.CancelledError)):
+                raise result
+        
+        written = []
+        for section, result in zip(sections, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[{self.name}] Section '{section['heading']}' failed: {str(result)}")
+                continue
+            written.append((section["heading"], result))
+        
+        if len(written) * 2 < len(sections):
+            logger.warning(f"[{self.name}] Too many sections failed, falling back to single-call report")
+            return None
+        
+        return self._stitch_report(outline.get("title") or topic, written)
+    
+    async def _generate_outline(self, topic: str, passages: List[str]):
+        """Ask the planning route for a short JSON outline of the report"""
+        titles = "\n".join(f"- {passage.splitlines()[0]}" for passage in passages)
+        prompt = f"""You are planning a comprehensive research report on "{topic}".
+
+Available sources:
+{titles}
+
+Return JSON of the form:
+{{"title": "...", "sections": [{{"heading": "...", "focus": "...", "keywords": ["..."], "overview": false}}]}}
+
+Include 4 to 6 sections: start with "Executive Summary" and end with "Conclusions and Recommendations" (both with "overview": true), with detailed analysis and key findings sections in between. Keep each focus to one sentence."""
         
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            return result["candidates"][0]["content"]["parts"][0]["text"]
+            result = await llm_router.agenerate("planning", prompt, json_mode=True)
+            outline = json.loads(self._strip_code_fence(result["content"]))
+            sections = [
+                section for section in outline.get("sections", [])
+                if isinstance(section, dict) and section.get("heading")
+            ]
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            logger.error(f"[{self.name}] Gemini generation failed: {str(e)}")
-            raise Exception(f"Report generation failed: {str(e)}")
\ No newline at end of file
+            logger.warning(f"[{self.name}] Outline generation failed: {str(e)}")
+            return None
+        
+        if len(sections) < 2:
+            logger.warning(f"[{self.name}] Outline too short, falling back to single-call report")
+            return None
+        
+        outline["sections"] = sections
+        return outline
+    
+    async def _generate_section(self, topic: str, section: Dict[str, Any], passages: List[str]) -> str:
+        """Write the body of a single section from its slice of the context"""
+        context = "\n\n".join(passages)
+        prompt = f"""You are a research analyst writing the "{section['heading']}" section of a comprehensive report on "{topic}".
+
+Section focus: {section.get('focus', section['heading'])}
+
+Context Information:
+{context}
+
+Write only the body of this section in markdown. Do not repeat the section heading and do not use top-level headings; use ### subheadings if needed."""
+        
+        result = await llm_router.agenerate("deep_report", prompt, max_output_tokens=2048)
+        return result["content"]
+    
+    def _split_passages(self, context: str) -> List[str]:
+        """Split the researcher's context buffer into per-source passages"""
+        passages = [p.strip() for p in re.split(r"\n\s*\n(?=Title: )", context) if p.strip()]
+        return passages or ([context] if context else [])
+    
+    def _select_passages(self, section: Dict[str, Any], passages: List[str]) -> List[str]:
+        """Pick the slice of context relevant to a section"""
+        if section.get("overview"):
+            return [passage[:OVERVIEW_PASSAGE_CHARS] for passage in passages]
+        
+        terms = " ".join([section["heading"], section.get("focus", "")] + list(section.get("keywords") or []))
+        query = {word for word in re.findall(r"[a-z0-9]+", terms.lower()) if len(word) > 3}
+        
+        scored = []
+        for index, passage in enumerate(passages):
+            words = re.findall(r"[a-z0-9]+", passage.lower())
+            score = sum(1 for word in words if word in query)
+            scored.append((score, -index, passage))
+        scored.sort(reverse=True)
+        
+        return [passage for _, _, passage in scored[:SECTION_PASSAGES]]
+    
+    def _stitch_report(self, title: str, sections: List[tuple]) -> str:
+        """Join section bodies under consistent headings"""
+        parts = [f"# {title.strip()}"]
+        for heading, body in sections:
+            parts.append(f"## {heading.strip()}\n\n{self._normalize_section_body(heading, body)}")
+        return "\n\n".join(parts) + "\n"
+    
+    def _normalize_section_body(self, heading: str, body: str) -> str:
+        """Drop a repeated section heading and demote any headings above level 3"""
+        lines = self._strip_code_fence(body).strip().splitlines()
+        if lines and lines[0].lstrip("#").strip().lower() == heading.strip().lower():
+            lines = lines[1:]
+        
+        normalized = []
+        for line in lines:
+            match = re.match(r"^(#{1,2})\s+(.*)$", line)
+            normalized.append(f"### {match.group(2)}" if match else line)
+        return "\n".join(normalized).strip()
+    
+    def _strip_code_fence(self, text: str) -> str:
+        """Remove a surrounding ```json / ```markdown fence that models sometimes add"""
+        text = text.strip()
+        match = re.match(r"^```[a-zA-Z]*\n(.*)\n```$", text, re.DOTALL)
+        return match.group(1) if match else text
\ No newline at end of file
@@ -1,9 +1,25 @@
+import asyncio
 import requests
 import os
-from typing import Dict, List, Any
+from datetime import datetime
+from typing import Dict, List, Any, Optional
 from backend.agents.base_agent import BaseAgent
+from backend.content_fetcher import ContentFetcher
+from backend.deadline import upstream_timeout
+from backend.deep_research import DeepResearchEngine
 from backend.utils import logger
 
+# A refresh regenerates the report once this many new sources have accumulated
+REFRESH_MIN_NEW_SOURCES = int(os.getenv("REFRESH_MIN_NEW_SOURCES", "2"))
+# ...or once a single refresh brings in at least this much new content
+REFRESH_MIN_NEW_CHARS = int(os.getenv("REFRESH_MIN_NEW_CHARS", "1500"))
+# Fetch full page text for the top sources: "deep" (deep mode only), "all" or "off"
+FULL_CONTENT_FETCH = os.getenv("FULL_CONTENT_FETCH", "deep")
+# Number of top sources whose full content is fetched
+FULL_CONTENT_TOP_N = int(os.getenv("FULL_CONTENT_TOP_N", "5"))
+# Upper bound for a single Tavily call; the request deadline may shorten it
+TAVILY_TIMEOUT = float(os.getenv("TAVILY_TIMEOUT", "30"))
+
 class ResearcherAgent(BaseAgent):
     """Agent responsible for web research using Tavily API"""
     
@@ -21,38 +37,109 @@ class ResearcherAgent(BaseAgent):
         if not self.tavily_api_key:
             raise Exception("TAVILY_API_KEY not configured")
         
-        # Perform search
-        search_query = f"comprehensive information about {topic}" if is_deep else f"overview of {topic}"
-        search_results = self._perform_tavily_search(search_query)
+        # Incremental refresh: only look for material newer than the stored snapshot
+        snapshot = state.pop("snapshot", None)
+        if snapshot:
+            return await self._refresh_from_snapshot(state, snapshot)
+        
+        # Perform search (deep mode runs multiple rounds until new information dries up)
+        if is_deep:
+            search_results = await DeepResearchEngine(self._perform_tavily_search).run(topic)
+        else:
+            search_results = await asyncio.to_thread(self._perform_tavily_search, f"overview of {topic}")
+        
+        # Replace short snippets with the full text of the top sources
+        if FULL_CONTENT_FETCH == "all" or (FULL_CONTENT_FETCH == "deep" and is_deep):
+            await self._attach_full_content(search_results)
         
         # Process results
         context = ""
         sources = []
-        images = []
         
         if "results" in search_results:
             for result in search_results["results"]:
-                context += f"\n\nTitle: {result.get('title', 'Unknown')}\nContent: {result.get('content', '')}\n"
+                content = result.get('raw_content') or result.get('content', '')
+                context += f"\n\nTitle: {result.get('title', 'Unknown')}\nContent: {content}\n"
                 sources.append({
                     "title": result.get('title', 'Unknown'),
                     "uri": result.get('url', '#')
                 })
         
-        # Extract images
-        if "images" in search_results:
-            images = search_results["images"]
-        
-        logger.info(f"[{self.name}] Collected {len(sources)} sources and {len(images)} images")
+        # Images are left in search_results for the Image Agent to clean up
+        logger.info(f"[{self.name}] Collected {len(sources)} sources and {len(search_results.get('images', []))} raw images")
         
         # Update state
         state["context"] = context
         state["sources"] = sources
-        state["images"] = images
         state["search_results"] = search_results
         
         return state
     
-    def _perform_tavily_search(self, query: str) -> Dict[str, Any]:
+    async def _attach_full_content(self, search_results: Dict[str, Any]):
+        """Fetch the top source pages concurrently and attach their main text as raw_content"""
+        results = search_results.get("results", [])[:FULL_CONTENT_TOP_N]
+        try:
+            pages = await ContentFetcher().fetch_many([result.get("url", "") for result in results])
+        except Exception as e:
+            logger.warning(f"[{self.name}] Full content fetch failed, using snippets: {str(e)}")
+            return
+        
+        for result in results:
+            text = pages.get(result.get("url", ""))
+            if text and len(text) > len(result.get("content", "")):
+                result["raw_content"] = text
+    
+    async def _refresh_from_snapshot(self, state: Dict[str, Any], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge results published since the snapshot into its context and sources"""
+        topic = state.get("topic", "")
+        since = snapshot.get("timestamp") or datetime.utcnow()
+        
+        logger.info(f"[{self.name}] Refreshing '{topic}' with content since {since.isoformat()}")
+        
+        search_results = await asyncio.to_thread(
+            self._perform_tavily_search,
+            f"latest developments about {topic}",
+            {"start_date": since.strftime("%Y-%m-%d")}
+        )
+        
+        # Dedupe against sources the snapshot already knows
+        known_uris = {source.get("uri") for source in snapshot.get("sources", [])}
+        new_results = [r for r in search_results.get("results", []) if r.get("url", "#") not in known_uris]
+        
+        new_context = ""
+        new_sources = []
+        for result in new_results:
+            new_context += f"\n\nTitle: {result.get('title', 'Unknown')}\nContent: {result.get('content', '')}\n"
+            new_sources.append({
+                "title": result.get('title', 'Unknown'),
+                "uri": result.get('url', '#')
+            })
+        
+        images = list(snapshot.get("images", []))
+        images.extend(image for image in search_results.get("images", []) if image not in images)
+        
+        unreported = snapshot.get("unreported_sources", 0) + len(new_sources)
+        material = unreported >= REFRESH_MIN_NEW_SOURCES or len(new_context) >= REFRESH_MIN_NEW_CHARS
+        
+        logger.info(
+            f"[{self.name}] Refresh found {len(new_sources)} new sources "
+            f"({'regenerating report' if material else 'keeping existing report'})"
+        )
+        
+        # Update state
+        state["context"] = snapshot.get("context", "") + new_context
+        state["sources"] = snapshot.get("sources", []) + new_sources
+        state["images"] = images
+        state["search_results"] = {"results": new_results, "images": images}
+        state["refreshed"] = True
+        state["refresh_material"] = material
+        state["unreported_sources"] = 0 if material else unreported
+        if not material:
+            state["report"] = snapshot.get("report", "")
+        
+        return state
+    
+    def _perform_tavily_search(self, query: str, extra_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Perform search using Tavily API"""
         url = "https://api.tavily.com/search"
         payload = {
@@ -64,9 +151,11 @@ class ResearcherAgent(BaseAgent):
             "include_raw_content": False,
             "max_results": 5
         }
+        if extra_params:
+            payload.update(extra_params)
         
         try:
-            response = requests.post(url, json=payload)
+            response = requests.post(url, json=payload, timeout=upstream_timeout(TAVILY_TIMEOUT))
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -1,5 +1,8 @@
 import os
-from fastapi import APIRouter, HTTPException, Depends, Request
+import asyncio
+import re
+import time
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
 from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
@@ -8,13 +11,24 @@ from typing import Optional
 import jwt
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from pymongo import MongoClient
-import urllib.parse
 import hashlib
+import hmac
+import httpx
 
 # Load environment variables
 load_dotenv()
 
+from backend.cache import Cache
+from backend.database import database
+from backend.sessions import rotate_session
+from backend.utils import logger
+
+GOOGLE_METADATA_URL = 'https://accounts.google.com/.well-known/openid-configuration'
+# Discovery metadata and JWKS are cached this long unless the provider's Cache-Control says otherwise
+OIDC_METADATA_TTL = int(os.getenv("OIDC_METADATA_TTL", "3600"))
+OIDC_FETCH_TIMEOUT = 10.0
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
 # Initialize OAuth
 config = Config(environ=os.environ)
 oauth = OAuth(config)
@@ -24,12 +38,123 @@ oauth.register(
     name='google',
     client_id=os.getenv('GOOGLE_CLIENT_ID'),
     client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+    server_metadata_url=GOOGLE_METADATA_URL,
     client_kwargs={
         'scope': 'openid email profile'
     }
 )
 
+class OIDCMetadataCache:
+    """Keeps the provider's discovery document and JWKS warm for an authlib client.
+
+    Both are fetched at startup and stored in the shared cache, so workers do
+    not each fetch them on their first login. Expired entries are still used
+    while a refresh runs in the background. A JWKS that does not match a
+    token's key is re-fetched by authlib itself.
+    """
+
+    def __init__(self, client, metadata_url: str):
+        self.name = "OIDC Metadata"
+        self.client = client
+        self.metadata_url = metadata_url
+        self.cache = Cache("oidc")
+        self.expires_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _fetch(self, http: httpx.AsyncClient, url: str):
+        response = await http.get(url)
+        response.raise_for_status()
+        match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else OIDC_METADATA_TTL
+        return response.json(), max(60, min(max_age, 24 * 3600))
+
+    def _install(self, entry: dict):
+        metadata = dict(entry["metadata"])
+        metadata["jwks"] = entry["jwks"]
+        # authlib skips its own discovery fetch once _loaded_at is set
+        metadata["_loaded_at"] = entry["fetched_at"]
+        self.client.server_metadata.update(metadata)
+        self.expires_at = entry["expires_at"]
+
+    async def refresh(self):
+        """Fetch discovery metadata and JWKS, share them through the cache and install them"""
+        async with httpx.AsyncClient(timeout=OIDC_FETCH_TIMEOUT) as http:
+            metadata, metadata_ttl = await self._fetch(http, self.metadata_url)
+            jwks, jwks_ttl = await self._fetch(http, metadata["jwks_uri"])
+        ttl = min(metadata_ttl, jwks_ttl)
+        entry = {"metadata": metadata, "jwks": jwks, "fetched_at": time.time(), "expires_at": time.time() + ttl}
+        await self.cache.aset(self.metadata_url, entry, ttl=ttl * 2)
+        self._install(entry)
+        logger.info(f"[{self.name}] Refreshed provider metadata and JWKS (valid {ttl}s)")
+
+    async def _refresh_quietly(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"[{self.name}] Refresh failed, keeping cached copy: {e}")
+        finally:
+            self._refresh_task = None
+
+    async def ensure(self):
+        """Make sure usable metadata is installed; refresh stale metadata in the background"""
+        now = time.time()
+        if now < self.expires_at:
+            return
+        if not self.expires_at:
+            entry = await self.cache.aget(self.metadata_url)
+            if entry is not None:
+                self._install(entry)
+                if now < self.expires_at:
+                    return
+        if "_loaded_at" not in self.client.server_metadata:
+            # Nothing cached anywhere yet: this login has to wait for the fetch
+            await self.refresh()
+        elif self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_quietly())
+
+    def start(self):
+        """Prefetch at startup so the first login does not pay for discovery"""
+        if os.getenv("GOOGLE_CLIENT_ID") and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_quietly())
+
+
+google_metadata = OIDCMetadataCache(oauth.google, GOOGLE_METADATA_URL)
+
+# Upserts run in the background so they never delay the login response
+_pending_upserts = set()
+
+
+def _upsert_user(user: dict):
+    users_collection = database.collection("users")
+    if users_collection is None:
+        return
+    try:
+        # Generate user ID based on email (consistent with existing schema)
+        user_id = generate_user_id(user["email"])
+        now = datetime.utcnow()
+        users_collection.update_one(
+            {"userId": user_id},
+            {
+                "$set": {
+                    "email": user["email"],
+                    "name": user.get("name", ""),
+                    "picture": user.get("picture", ""),
+                    "lastActive": now
+                },
+                "$setOnInsert": {"userId": user_id, "createdAt": now}
+            },
+            upsert=True
+        )
+        logger.info(f"Stored user {user['email']} with ID {user_id} in MongoDB")
+    except Exception as e:
+        logger.warning(f"Failed to store user in MongoDB: {e}")
+
+
+def store_user_in_background(user: dict):
+    task = asyncio.create_task(asyncio.to_thread(_upsert_user, user))
+    _pending_upserts.add(task)
+    task.add_done_callback(_pending_upserts.discard)
+
 # Create router
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -38,82 +163,15 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# MongoDB connection
-MONGODB_URI = os.getenv("MONGODB_URI")
-mongo_client = None
-users_collection = None
+# Admin-only endpoints (profiling, bulk exports) are disabled unless an admin token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
-if MONGODB_URI:
-    try:
-        # Handle both SRV and standard URI formats
-        encoded_uri = MONGODB_URI  # Use as-is for multi-host URIs
-        
-        # Only parse and encode if it's a simple URI (not multi-host)
-        if "," not in MONGODB_URI and "@" in MONGODB_URI:
-            try:
-                parsed_uri = urllib.parse.urlparse(MONGODB_URI)
-                username = parsed_uri.username
-                password = parsed_uri.password
-                
-                # Reconstruct URI with encoded credentials
-                if username and password:
-                    encoded_username = urllib.parse.quote_plus(username)
-                    encoded_password = urllib.parse.quote_plus(password)
-                    new_netloc = f"{encoded_username}:{encoded_password}@{parsed_uri.hostname}"
-                    if parsed_uri.port:
-                        new_netloc += f":{parsed_uri.port}"
-                    encoded_uri = urllib.parse.urlunparse((
-                        parsed_uri.scheme,
-                        new_netloc,
-                        parsed_uri.path,
-                        parsed_uri.params,
-                        parsed_uri.query,
-                        parsed_uri.fragment
-                    ))
-                    
-            except Exception as e:
-                print(f"Failed to encode MongoDB URI: {e}")
-                encoded_uri = MONGODB_URI
-        
-        # Check if SSL is disabled in the URI
-        use_ssl = "ssl=false" not in MONGODB_URI.lower()
-        
-        if use_ssl:
-            mongo_client = MongoClient(
-                encoded_uri,
-                serverSelectionTimeoutMS=10000,
-                connectTimeoutMS=20000,
-                socketTimeoutMS=20000,
-                maxPoolSize=50,
-                minPoolSize=5,
-                tls=True,
-                tlsAllowInvalidCertificates=True,
-                tlsAllowInvalidHostnames=True
-            )
-        else:
-            mongo_client = MongoClient(
-                encoded_uri,
-                serverSelectionTimeoutMS=10000,
-                connectTimeoutMS=20000,
-                socketTimeoutMS=20000,
-                maxPoolSize=50,
-                minPoolSize=5
-            )
-        # Test the connection
-        mongo_client.admin.command('ping')
-        db = mongo_client["jarvis_database"]
-        users_collection = db["users"]
-        
-        # Create indexes for better performance (align with existing schema)
-        users_collection.create_index("userId", unique=True)
-        users_collection.create_index("lastActive")
-        
-        print("Connected to MongoDB successfully for auth module")
-    except Exception as e:
-        print(f"Failed to connect to MongoDB for auth module: {e}")
-        mongo_client = None
-else:
-    print("MONGODB_URI not found in environment variables for auth module")
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Only requests with the configured X-Admin-Token may use admin endpoints"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
@@ -137,6 +195,7 @@ async def login_via_google(request: Request):
     """Initiate Google OAuth login"""
     # Use the full callback URL directly instead of url_for
     redirect_uri = "http://localhost:8002/api/auth/callback"
+    await google_metadata.ensure()
     # Force account selection by adding prompt parameter
     return await oauth.google.authorize_redirect(
         request, 
@@ -149,6 +208,7 @@ async def auth_via_google(request: Request):
     """Handle Google OAuth callback"""
     try:
         # Get user info from Google
+        await google_metadata.ensure()
         token = await oauth.google.authorize_access_token(request)
         user = token.get('userinfo')
         
@@ -162,34 +222,19 @@ async def auth_via_google(request: Request):
             expires_delta=access_token_expires
         )
         
-        # Store user info in session
-        request.session['user'] = dict(user)
-        request.session['jwt_token'] = access_token
+        # Only the essentials go in the (server-side) session; a fresh id guards against fixation
+        rotate_session(request)
+        request.session.clear()
+        request.session['user'] = {
+            "userId": generate_user_id(user["email"]),
+            "email": user["email"],
+            "name": user.get("name", ""),
+            "picture": user.get("picture", "")
+        }
         
-        # Store user in MongoDB if connection is available
-        if mongo_client is not None and users_collection is not None and user.get("email"):
-            try:
-                # Generate user ID based on email (consistent with existing schema)
-                user_id = generate_user_id(user["email"])
-                
-                user_data = {
-                    "userId": user_id,
-                    "email": user["email"],
-                    "name": user.get("name", ""),
-                    "picture": user.get("picture", ""),
-                    "lastActive": datetime.utcnow(),
-                    "createdAt": datetime.utcnow()
-                }
-                
-                # Use upsert to create or update user
-                users_collection.update_one(
-                    {"userId": user_id},
-                    {"$set": user_data},
-                    upsert=True
-                )
-                print(f"Stored user {user['email']} with ID {user_id} in MongoDB")
-            except Exception as e:
-                print(f"Failed to store user in MongoDB: {e}")
+        # Store user in MongoDB without holding up the login response
+        if user.get("email"):
+            store_user_in_background(dict(user))
         
         # Return HTML that communicates with parent window and closes popup
         html_content = f"""
@@ -226,8 +271,7 @@ async def auth_via_google(request: Request):
 @router.get("/logout")
 async def logout(request: Request):
     """Logout user"""
-    request.session.pop('user', None)
-    request.session.pop('jwt_token', None)
+    request.session.clear()
     return {"message": "Successfully logged out"}
 
 @router.get("/user")
@@ -0,0 +1,442 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from backend.utils import logger
+
+# Backend for shared caches: "memory" (per process), "sqlite" (shared by workers on one host) or "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+# SQLite file used by the sqlite backend
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(".cache", "cache.db"))
+# Redis (or any Redis-protocol server) used by the redis backend
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Size limit for the memory and sqlite backends; least recently used entries are evicted beyond it
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class CacheBackend(ABC):
+    """Byte-valued key/value store with per-key TTLs"""
+
+    # Whether calls may block on I/O (async callers then run them in a worker thread)
+    blocking = True
+
+    def __init__(self):
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; returns whether it was set (usable as a lock)"""
+        pass
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add to an integer counter and return the new value; `ttl` applies when the counter is created"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def usage(self, prefix: str = "") -> Tuple[int, int]:
+        """(entries, bytes) stored under a key prefix"""
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU bounded by total value size (unbounded when max_bytes is None)"""
+
+    blocking = False
+
+    def __init__(self, max_bytes: Optional[int] = CACHE_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        # key -> (value, expires_at); order is LRU order
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            self._pop(key)
+            return None
+        return entry
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(key) + len(entry[0])
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]):
+        # Caller holds self._lock
+        self._pop(key)
+        self._entries[key] = (value, time.time() + ttl if ttl else None)
+        self._bytes += len(key) + len(value)
+        # Expired entries at the least recently used end go first
+        while self._entries and self._live(next(iter(self._entries))) is None:
+            pass
+        if self.max_bytes is None:
+            return
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        # Check and write under one lock acquisition, so only one caller can win
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                value = amount
+                self._store(key, str(value).encode(), ttl)
+            else:
+                value = int(entry[0]) + amount
+                # Keep the counter's original expiry
+                self._pop(key)
+                self._entries[key] = (str(value).encode(), entry[1])
+                self._bytes += len(key) + len(self._entries[key][0])
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def usage(self, prefix: str = "") -> Tuple[int, int]:
+        with self._lock:
+            matching = [(key, value) for key, (value, _) in self._entries.items() if key.startswith(prefix)]
+        return len(matching), sum(len(key) + len(value) for key, value in matching)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache in a local SQLite file, shared by all workers on the host"""
+
+    def __init__(self, path: str = CACHE_DB_PATH, max_bytes: Optional[int] = CACHE_MAX_BYTES):
+        super().__init__()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._last_evict = 0.0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers in other workers proceed during writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now, len(key) + len(value))
+            )
+        self._evict()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now, len(key) + len(value))
+            )
+        return cursor.rowcount == 1
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        conn = self._connect()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so read and update are atomic across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            if row is None:
+                value = amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                    (key, str(value).encode(), now + ttl if ttl else None, now, len(key) + len(str(value)))
+                )
+            else:
+                value = int(row[0]) + amount
+                conn.execute(
+                    "UPDATE cache SET value = ?, accessed_at = ?, size = ? WHERE key = ?",
+                    (str(value).encode(), now, len(key) + len(str(value)), key)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return value
+
+    def delete(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _evict(self):
+        # Size accounting scans the table, so it runs at most once a second per worker
+        if time.time() - self._last_evict < 1:
+            return
+        self._last_evict = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            # Without a size limit (e.g. the session store) only expired entries are removed
+            if self.max_bytes is None:
+                return
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Drop least recently used entries until back under the limit
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                if total - freed <= self.max_bytes:
+                    break
+                victims.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+            self.evictions += len(victims)
+
+    def usage(self, prefix: str = "") -> Tuple[int, int]:
+        row = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE key >= ? AND key < ?",
+            (prefix, prefix + "\uffff")
+        ).fetchone()
+        return row[0], row[1]
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache in Redis or any Redis-protocol server; eviction follows the server's maxmemory policy"""
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        super().__init__()
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+            client.ping()
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, value, px=int(ttl * 1000) if ttl else None, nx=True))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = self.client.incrby(key, amount)
+        if ttl and value == amount:
+            self.client.pexpire(key, int(ttl * 1000))
+        return value
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def usage(self, prefix: str = "") -> Tuple[int, int]:
+        entries = 0
+        size = 0
+        for key in self.client.scan_iter(match=f"{prefix}*", count=500):
+            entries += 1
+            size += self.client.strlen(key)
+        return entries, size
+
+
+def create_cache_backend() -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND, falling back to memory"""
+    if CACHE_BACKEND == "redis":
+        try:
+            return RedisCacheBackend()
+        except Exception as e:
+            logger.warning(f"Failed to connect to Redis cache at {REDIS_URL}, using in-memory cache: {e}")
+    elif CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteCacheBackend()
+        except Exception as e:
+            logger.warning(f"Failed to open SQLite cache, using in-memory cache: {e}")
+    return MemoryCacheBackend()
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+_namespaces: Dict[str, "Cache"] = {}
+
+
+def get_cache_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend()
+    return _backend
+
+
+class Cache:
+    """Namespaced view of the shared cache backend with JSON values and hit/miss stats.
+
+    Backend errors are logged and treated as misses so a cache outage never
+    fails a request.
+    """
+
+    def __init__(self, namespace: str, default_ttl: Optional[float] = None, backend: Optional[CacheBackend] = None):
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self._backend = backend
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+        _namespaces[namespace] = self
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_cache_backend()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        try:
+            raw = self.backend.get(self._key(key))
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Cache get failed in {self.namespace}: {e}")
+            raw = None
+        if raw is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            self.backend.set(self._key(key), json.dumps(value).encode("utf-8"), ttl or self.default_ttl)
+            self._stats["sets"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Cache set failed in {self.namespace}: {e}")
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        try:
+            return self.backend.add(self._key(key), json.dumps(value).encode("utf-8"), ttl or self.default_ttl)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Cache add failed in {self.namespace}: {e}")
+            return False
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> Optional[int]:
+        """Atomic counter shared by all workers (with a shared backend); None if the backend failed"""
+        try:
+            return self.backend.incr(self._key(key), amount, ttl or self.default_ttl)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Cache incr failed in {self.namespace}: {e}")
+            return None
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Cache delete failed in {self.namespace}: {e}")
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def aget(self, key: str) -> Any:
+        return await self._call(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self._call(self.set, key, value, ttl)
+
+    async def aadd(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return await self._call(self.add, key, value, ttl)
+
+    async def aincr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> Optional[int]:
+        return await self._call(self.incr, key, amount, ttl)
+
+    async def adelete(self, key: str):
+        await self._call(self.delete, key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        stats = dict(self._stats)
+        stats["hit_rate"] = round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+        try:
+            stats["entries"], stats["bytes"] = self.backend.usage(f"{self.namespace}:")
+        except Exception as e:
+            logger.warning(f"Cache usage lookup failed in {self.namespace}: {e}")
+        return stats
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Per-namespace stats (hits and misses are counted per worker) plus backend evictions"""
+    backend = get_cache_backend()
+    return {
+        "backend": type(backend).__name__,
+        "evictions": backend.evictions,
+        "namespaces": {namespace: cache.stats() for namespace, cache in _namespaces.items()},
+    }
@@ -0,0 +1,279 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.cache import Cache, MemoryCacheBackend
+from backend.database import database
+from backend.deadline import DEEP_RESEARCH_DEADLINE, QUICK_RESEARCH_DEADLINE, Deadline, current_deadline
+from backend.utils import logger
+
+# Finished research results are served from the shared cache for this long
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL", str(6 * 3600)))
+# Which cached results /api/research may serve: "warmed" (only those the warmer computed),
+# "all" (any finished result for the topic) or "off"
+RESEARCH_CACHE_SERVE = os.getenv("RESEARCH_CACHE_SERVE", "warmed").lower()
+CACHE_WARMER_ENABLED = os.getenv("CACHE_WARMER_ENABLED", "true").lower() == "true"
+# Seconds between warming cycles
+CACHE_WARMER_INTERVAL = float(os.getenv("CACHE_WARMER_INTERVAL", "900"))
+# Quota in research units per day (a quick search costs 1, deep research WARMER_DEEP_COST).
+# The quota and the per-cycle lock live in the shared cache, so with several workers
+# CACHE_BACKEND must be sqlite or redis; the memory backend gives each worker its own quota.
+CACHE_WARMER_DAILY_QUOTA = int(os.getenv("CACHE_WARMER_DAILY_QUOTA", "40"))
+CACHE_WARMER_CYCLE_QUOTA = int(os.getenv("CACHE_WARMER_CYCLE_QUOTA", "8"))
+WARMER_DEEP_COST = int(os.getenv("WARMER_DEEP_COST", "5"))
+# Only warm while the worker has served fewer requests than this in the last minute
+CACHE_WARMER_MAX_RPM = int(os.getenv("CACHE_WARMER_MAX_RPM", "10"))
+# Optional UTC hour window for warming, e.g. "1-6"; empty means any quiet minute
+CACHE_WARMER_HOURS = os.getenv("CACHE_WARMER_HOURS", "")
+# Queries from this far back are counted, and those in the trending window count extra
+WARMER_LOOKBACK_DAYS = int(os.getenv("WARMER_LOOKBACK_DAYS", "7"))
+WARMER_TRENDING_HOURS = int(os.getenv("WARMER_TRENDING_HOURS", "24"))
+TRENDING_WEIGHT = 3.0
+# A query must have been asked at least this often to be worth warming
+WARMER_MIN_COUNT = int(os.getenv("WARMER_MIN_COUNT", "2"))
+MAX_CANDIDATES = 50
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Shared across workers so a result computed by one (or by the warmer) serves them all
+research_results = Cache("research", default_ttl=RESEARCH_CACHE_TTL)
+
+
+def normalize_topic(topic: str) -> str:
+    return _WHITESPACE_RE.sub(" ", topic).strip().lower()
+
+
+def research_cache_key(topic: str, is_deep: bool) -> str:
+    return f"{'deep' if is_deep else 'quick'}:{normalize_topic(topic)}"
+
+
+def _parse_hours(window: str):
+    """"1-6" -> (1, 6); anything unparsable disables the hour restriction"""
+    try:
+        start, end = (int(part) for part in window.split("-"))
+        return start % 24, end % 24
+    except ValueError:
+        return None
+
+
+class CacheWarmer:
+    """Pre-computes research results for popular and trending queries during quiet periods.
+
+    Each cycle aggregates QUICK_SEARCH and DEEP_RESEARCH queries from
+    `activity_logs`, scores them by frequency with a boost for recent ones,
+    and runs research for the top uncached topics into the result cache.
+    Work stops as soon as traffic picks up or the quota is spent, and the
+    in-flight run is cancelled through its deadline.
+    """
+
+    def __init__(self):
+        self.name = "Cache Warmer"
+        self._research: Optional[Callable[[str, bool], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._requests: "deque[float]" = deque()
+        self._hours = _parse_hours(CACHE_WARMER_HOURS) if CACHE_WARMER_HOURS else None
+        self._active_deadline: Optional[Deadline] = None
+        self._stats = {"cycles": 0, "warmed": 0, "already_cached": 0, "failed": 0, "aborted": 0}
+        self.last_cycle: Optional[Dict[str, Any]] = None
+
+    def start(self, research: Callable[[str, bool], Awaitable[Any]]):
+        """Start warming in the background; `research(topic, is_deep)` must populate the result cache"""
+        if not CACHE_WARMER_ENABLED or self._task is not None:
+            return
+        self._research = research
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if isinstance(research_results.backend, MemoryCacheBackend):
+            logger.warning(f"[{self.name}] CACHE_BACKEND=memory: each worker warms with its own quota")
+        logger.info(f"[{self.name}] Warming every {CACHE_WARMER_INTERVAL:.0f}s (quota {CACHE_WARMER_DAILY_QUOTA}/day)")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def note_request(self):
+        """Record a served request for the low-traffic check"""
+        now = time.monotonic()
+        self._requests.append(now)
+        while self._requests and self._requests[0] < now - 60:
+            self._requests.popleft()
+
+    def is_quiet(self) -> bool:
+        now = time.monotonic()
+        recent = sum(1 for stamp in self._requests if stamp >= now - 60)
+        if recent >= CACHE_WARMER_MAX_RPM:
+            return False
+        if self._hours is None:
+            return True
+        start, end = self._hours
+        hour = datetime.utcnow().hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    @staticmethod
+    def _quota_key() -> str:
+        return f"warmer-quota:{datetime.utcnow().date().isoformat()}"
+
+    async def _quota_left(self) -> int:
+        used = await research_results.aget(self._quota_key()) or 0
+        return CACHE_WARMER_DAILY_QUOTA - used
+
+    async def _spend_quota(self, cost: int) -> bool:
+        """Reserve quota shared by all workers; False if it would exceed today's quota"""
+        key = self._quota_key()
+        used = await research_results.aincr(key, cost, ttl=2 * 24 * 3600)
+        if used is None:
+            return False
+        if used > CACHE_WARMER_DAILY_QUOTA:
+            await research_results.aincr(key, -cost)
+            return False
+        return True
+
+    def popular_queries(self) -> List[Dict[str, Any]]:
+        """Most frequent and trending research queries from activity_logs, best first"""
+        collection = database.collection("activity_logs")
+        if collection is None:
+            return []
+        now = datetime.utcnow()
+        trending_since = now - timedelta(hours=WARMER_TRENDING_HOURS)
+        pipeline = [
+            {"$match": {
+                "actionType": {"$in": ["QUICK_SEARCH", "DEEP_RESEARCH"]},
+                "timestamp": {"$gte": now - timedelta(days=WARMER_LOOKBACK_DAYS)},
+                "query": {"$type": "string", "$ne": ""},
+            }},
+            {"$group": {
+                "_id": {"query": {"$toLower": {"$trim": {"input": "$query"}}}, "actionType": "$actionType"},
+                "count": {"$sum": 1},
+                "recent": {"$sum": {"$cond": [{"$gte": ["$timestamp", trending_since]}, 1, 0]}},
+                "users": {"$addToSet": "$userId"},
+                "lastAsked": {"$max": "$timestamp"},
+            }},
+            {"$match": {"count": {"$gte": WARMER_MIN_COUNT}}},
+            {"$project": {
+                "_id": 0,
+                "query": "$_id.query",
+                "is_deep": {"$eq": ["$_id.actionType", "DEEP_RESEARCH"]},
+                "count": 1,
+                "recent": 1,
+                "users": {"$size": "$users"},
+                "lastAsked": 1,
+                "score": {"$add": ["$count", {"$multiply": ["$recent", TRENDING_WEIGHT]}]},
+            }},
+            {"$sort": {"score": -1, "lastAsked": -1}},
+            {"$limit": MAX_CANDIDATES * 2},
+        ]
+
+        # Queries differing only in inner whitespace are the same cache entry
+        merged: Dict[str, Dict[str, Any]] = {}
+        for row in collection.aggregate(pipeline, allowDiskUse=True):
+            key = research_cache_key(row["query"], row["is_deep"])
+            if key in merged:
+                merged[key]["score"] += row["score"]
+                merged[key]["count"] += row["count"]
+            else:
+                merged[key] = row
+        ranked = sorted(merged.values(), key=lambda row: -row["score"])
+        return ranked[:MAX_CANDIDATES]
+
+    async def _run(self):
+        await asyncio.sleep(min(60.0, CACHE_WARMER_INTERVAL))
+        while True:
+            try:
+                await self.warm_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[{self.name}] Warming cycle failed: {e}")
+            await asyncio.sleep(CACHE_WARMER_INTERVAL)
+
+    async def warm_once(self) -> Dict[str, Any]:
+        """Run one warming cycle if traffic is low and quota remains"""
+        summary = {"at": datetime.utcnow().isoformat(), "warmed": [], "skipped": None}
+        self.last_cycle = summary
+        if not self.is_quiet():
+            summary["skipped"] = "traffic"
+            return summary
+        if await self._quota_left() <= 0:
+            summary["skipped"] = "quota"
+            return summary
+        # One worker per interval does the warming; the others find the results in the shared cache
+        if not await research_results.aadd("warmer-cycle", os.getpid(), ttl=CACHE_WARMER_INTERVAL * 0.9):
+            summary["skipped"] = "other worker"
+            return summary
+
+        self._stats["cycles"] += 1
+        candidates = await asyncio.to_thread(self.popular_queries)
+        summary["candidates"] = len(candidates)
+        cycle_budget = CACHE_WARMER_CYCLE_QUOTA
+
+        for candidate in candidates:
+            cost = WARMER_DEEP_COST if candidate["is_deep"] else 1
+            if cost > cycle_budget:
+                continue
+            if not self.is_quiet():
+                summary["skipped"] = "traffic"
+                break
+            key = research_cache_key(candidate["query"], candidate["is_deep"])
+            if await research_results.aget(key) is not None:
+                self._stats["already_cached"] += 1
+                continue
+
+            if not await self._spend_quota(cost):
+                continue
+            cycle_budget -= cost
+            if await self._warm(candidate["query"], candidate["is_deep"]):
+                summary["warmed"].append({"query": candidate["query"], "is_deep": candidate["is_deep"]})
+            if cycle_budget <= 0:
+                break
+
+        if summary["warmed"]:
+            logger.info(f"[{self.name}] Warmed {len(summary['warmed'])} research results")
+        return summary
+
+    async def _warm(self, topic: str, is_deep: bool) -> bool:
+        deadline = Deadline(DEEP_RESEARCH_DEADLINE if is_deep else QUICK_RESEARCH_DEADLINE)
+        token = current_deadline.set(deadline)
+        self._active_deadline = deadline
+        watcher = asyncio.create_task(self._cancel_on_traffic(deadline))
+        try:
+            await self._research(topic, is_deep)
+            self._stats["warmed"] += 1
+            return True
+        except Exception as e:
+            if deadline.cancelled:
+                self._stats["aborted"] += 1
+                logger.info(f"[{self.name}] Stopped warming '{topic}': traffic picked up")
+            else:
+                self._stats["failed"] += 1
+                logger.warning(f"[{self.name}] Failed to warm '{topic}': {e}")
+            return False
+        finally:
+            watcher.cancel()
+            self._active_deadline = None
+            current_deadline.reset(token)
+
+    async def _cancel_on_traffic(self, deadline: Deadline):
+        """Give the workers back to users: cancel the warm run once traffic rises"""
+        while True:
+            await asyncio.sleep(1.0)
+            if not self.is_quiet():
+                deadline.cancel()
+                return
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "quiet": self.is_quiet(),
+            "quota_left_today": await self._quota_left(),
+            "warming_now": self._active_deadline is not None,
+            **self._stats,
+            "last_cycle": self.last_cycle,
+            "result_cache": await asyncio.to_thread(research_results.stats),
+        }
+
+
+cache_warmer = CacheWarmer()
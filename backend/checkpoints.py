@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from backend.utils import logger
+
+# Backend for run checkpoints: "memory", "sqlite" or "mongo"
+CHECKPOINT_STORE = os.getenv("CHECKPOINT_STORE", "memory")
+# SQLite file used by the sqlite backend
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(".cache", "checkpoints.db"))
+# Checkpoints older than this are ignored (and expired by the Mongo TTL index)
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", "3600"))
+
+
+class CheckpointStore(ABC):
+    """Stores the state after each completed pipeline stage, keyed by run id"""
+
+    @abstractmethod
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return {"stage": ..., "state": ...} for the last completed stage, if any"""
+        pass
+
+    @abstractmethod
+    def save(self, run_id: str, stage: str, state: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def delete(self, run_id: str):
+        pass
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Per-process checkpoints; survive retries but not restarts"""
+
+    def __init__(self):
+        self._checkpoints: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            checkpoint = self._checkpoints.get(run_id)
+        if not checkpoint or time.time() - checkpoint["updated_at"] > CHECKPOINT_TTL_SECONDS:
+            return None
+        # Hand out a copy so agents cannot mutate the stored checkpoint
+        return json.loads(checkpoint["payload"])
+
+    def save(self, run_id: str, stage: str, state: Dict[str, Any]):
+        payload = json.dumps({"stage": stage, "state": state}, default=str)
+        with self._lock:
+            self._checkpoints[run_id] = {"payload": payload, "updated_at": time.time()}
+            # Drop expired runs so abandoned checkpoints do not accumulate
+            expired = [key for key, value in self._checkpoints.items() if time.time() - value["updated_at"] > CHECKPOINT_TTL_SECONDS]
+            for key in expired:
+                self._checkpoints.pop(key, None)
+
+    def delete(self, run_id: str):
+        with self._lock:
+            self._checkpoints.pop(run_id, None)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Checkpoints in a local SQLite file, shared by all workers on the host"""
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "run_id TEXT PRIMARY KEY, stage TEXT NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT stage, state FROM checkpoints WHERE run_id = ? AND updated_at > ?",
+                (run_id, time.time() - CHECKPOINT_TTL_SECONDS)
+            ).fetchone()
+        if not row:
+            return None
+        return {"stage": row[0], "state": json.loads(row[1])}
+
+    def save(self, run_id: str, stage: str, state: Dict[str, Any]):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, stage, state, updated_at) VALUES (?, ?, ?, ?)",
+                (run_id, stage, json.dumps(state, default=str), time.time())
+            )
+            conn.execute("DELETE FROM checkpoints WHERE updated_at < ?", (time.time() - CHECKPOINT_TTL_SECONDS,))
+
+    def delete(self, run_id: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+
+
+class MongoCheckpointStore(CheckpointStore):
+    """Checkpoints in MongoDB, shared across hosts; expired by a TTL index on updatedAt"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        doc = self.collection.find_one({
+            "runId": run_id,
+            "updatedAt": {"$gt": datetime.utcnow() - timedelta(seconds=CHECKPOINT_TTL_SECONDS)}
+        })
+        if not doc:
+            return None
+        return {"stage": doc["stage"], "state": json.loads(doc["state"])}
+
+    def save(self, run_id: str, stage: str, state: Dict[str, Any]):
+        # State is stored as a JSON string so arbitrary keys survive BSON restrictions
+        self.collection.update_one(
+            {"runId": run_id},
+            {"$set": {"stage": stage, "state": json.dumps(state, default=str), "updatedAt": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def delete(self, run_id: str):
+        self.collection.delete_one({"runId": run_id})
+
+
+def create_checkpoint_store(db=None) -> CheckpointStore:
+    """Build the store selected by CHECKPOINT_STORE, falling back to memory"""
+    if CHECKPOINT_STORE == "mongo":
+        if db is not None:
+            return MongoCheckpointStore(db["run_checkpoints"])
+        logger.warning("CHECKPOINT_STORE=mongo but MongoDB is not connected, using in-memory checkpoints")
+    elif CHECKPOINT_STORE == "sqlite":
+        try:
+            return SQLiteCheckpointStore()
+        except Exception as e:
+            logger.warning(f"Failed to open SQLite checkpoint store, using in-memory checkpoints: {e}")
+    return MemoryCheckpointStore()
@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from backend.deadline import upstream_timeout
+from backend.images import is_public_url
+from backend.utils import logger
+
+# Directory for cached pages (one JSON file per URL)
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(".cache", "pages"))
+# Least recently used pages are dropped once the cache exceeds this size, and any page after this age
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+PAGE_CACHE_MAX_AGE = float(os.getenv("PAGE_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+# Seconds between page cache prunes
+PAGE_CACHE_PRUNE_INTERVAL = 300
+# Concurrent connections per host and overall
+PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "2"))
+MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", "8"))
+# Per-request timeout in seconds
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "8"))
+# Pages larger than this are truncated before extraction
+MAX_PAGE_BYTES = int(os.getenv("FETCH_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+# Extracted text kept per page
+MAX_TEXT_CHARS = int(os.getenv("FETCH_MAX_TEXT_CHARS", "6000"))
+# Worker processes used for HTML text extraction
+EXTRACT_WORKERS = int(os.getenv("FETCH_EXTRACT_WORKERS", "2"))
+MAX_REDIRECTS = 5
+
+USER_AGENT = "Mozilla/5.0 (compatible; JarvisResearchBot/1.0)"
+
+_executor: Optional[Executor] = None
+# Shared by every fetch in this worker, so concurrent research runs respect one per-host limit
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+_last_prune = 0.0
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _executor
+
+
+class _MainTextParser(HTMLParser):
+    """Collects text blocks, skipping navigation, scripts and other page chrome"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"}
+    BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "li", "blockquote", "pre", "td"}
+    CONTAINER_TAGS = {"article", "main"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.container_depth = 0
+        self.block: List[str] = []
+        self.in_block = 0
+        self.blocks: List[str] = []
+        self.container_blocks: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.CONTAINER_TAGS:
+            self.container_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.in_block += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in self.CONTAINER_TAGS:
+            self.container_depth = max(0, self.container_depth - 1)
+        elif tag in self.BLOCK_TAGS and self.in_block:
+            self.in_block -= 1
+            if not self.in_block:
+                self._flush()
+
+    def handle_data(self, data):
+        if self.skip_depth or not self.in_block:
+            return
+        self.block.append(data)
+
+    def _flush(self):
+        text = " ".join(" ".join(self.block).split())
+        self.block = []
+        if len(text) < 40:
+            return
+        self.blocks.append(text)
+        if self.container_depth:
+            self.container_blocks.append(text)
+
+
+def extract_main_text(html: str, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """Extract the main article text from an HTML page"""
+    parser = _MainTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+
+    # Prefer <article>/<main> content when it carries most of the page text
+    blocks = parser.blocks
+    if parser.container_blocks and sum(map(len, parser.container_blocks)) * 2 >= sum(map(len, blocks)):
+        blocks = parser.container_blocks
+
+    return "\n\n".join(blocks)[:max_chars]
+
+
+class PageCache:
+    """On-disk cache of extracted page text with HTTP validators"""
+
+    def __init__(self, directory: str = PAGE_CACHE_DIR, max_bytes: int = PAGE_CACHE_MAX_BYTES, max_age: float = PAGE_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, entry: Dict[str, str]):
+        # Write to a temp file first so concurrent readers never see a partial entry
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write page cache entry for {url}: {e}")
+
+    def touch(self, url: str):
+        """Mark an entry as recently used (e.g. after a 304 revalidation)"""
+        try:
+            os.utime(self._path(url))
+        except OSError:
+            pass
+
+    def prune(self):
+        """Drop expired entries, then the least recently used ones until the cache fits its size budget"""
+        entries = []
+        expired_before = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime < expired_before:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+class ContentFetcher:
+    """Downloads source pages concurrently and extracts their main text"""
+
+    def __init__(
+        self,
+        cache: Optional[PageCache] = None,
+        per_host_limit: int = PER_HOST_LIMIT,
+        max_concurrency: int = MAX_CONCURRENCY,
+        timeout: float = FETCH_TIMEOUT,
+        executor: Optional[Executor] = None,
+    ):
+        self.name = "Content Fetcher"
+        self.cache = cache or PageCache()
+        self.per_host_limit = per_host_limit
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executor = executor
+
+    async def fetch_many(self, urls: List[str]) -> Dict[str, str]:
+        """Fetch pages concurrently and return {url: extracted text} for the ones that succeeded"""
+        urls = [url for url in dict.fromkeys(urls) if url.startswith(("http://", "https://"))]
+        if not urls:
+            return {}
+
+        start = time.monotonic()
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+
+        async with httpx.AsyncClient(
+            timeout=upstream_timeout(self.timeout),
+            limits=limits,
+            headers={"User-Agent": USER_AGENT},
+        ) as client:
+            results = await asyncio.gather(
+                *[self._fetch(client, global_semaphore, url) for url in urls],
+                return_exceptions=True
+            )
+
+        pages = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[{self.name}] Failed to fetch {url}: {str(result)}")
+            elif result:
+                pages[url] = result
+
+        global _last_prune
+        if time.time() - _last_prune > PAGE_CACHE_PRUNE_INTERVAL:
+            _last_prune = time.time()
+            await asyncio.to_thread(self.cache.prune)
+
+        logger.info(f"[{self.name}] Fetched {len(pages)}/{len(urls)} pages in {time.monotonic() - start:.2f}s")
+        return pages
+
+    async def _fetch(self, client: httpx.AsyncClient, global_semaphore: asyncio.Semaphore, url: str) -> str:
+        host = urlparse(url).netloc.lower()
+        host_semaphore = _host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+
+        # Disk I/O stays off the event loop while many sources are fetched at once
+        cached = await asyncio.to_thread(self.cache.get, url)
+        headers = {}
+        if cached:
+            # Revalidate with a conditional GET instead of re-downloading
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with global_semaphore, host_semaphore:
+            target = url
+            for _ in range(MAX_REDIRECTS + 1):
+                # Checked on every hop, so a search result cannot redirect us to an internal address
+                if not await asyncio.to_thread(is_public_url, target):
+                    raise ValueError(f"URL is not publicly routable: {target}")
+
+                async with client.stream("GET", target, headers=headers) as response:
+                    if response.has_redirect_location:
+                        target = str(response.url.join(response.headers["location"]))
+                        continue
+                    if response.status_code == 304 and cached:
+                        await asyncio.to_thread(self.cache.touch, url)
+                        return cached.get("text", "")
+                    response.raise_for_status()
+
+                    content_type = response.headers.get("content-type", "")
+                    if "html" not in content_type and "text" not in content_type:
+                        return ""
+
+                    # Stop reading oversized pages instead of buffering them whole
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) >= MAX_PAGE_BYTES:
+                            break
+                    etag = response.headers.get("etag", "")
+                    last_modified = response.headers.get("last-modified", "")
+                    html = bytes(body[:MAX_PAGE_BYTES]).decode(response.encoding or "utf-8", errors="replace")
+                    break
+            else:
+                raise ValueError("Too many redirects")
+
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(self.executor or _get_executor(), extract_main_text, html)
+
+        await asyncio.to_thread(self.cache.put, url, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "text": text,
+        })
+        return text
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set
+
+from backend.cache import Cache
+from backend.deadline import current_deadline
+from backend.llm_router import estimate_tokens, llm_router
+from backend.utils import logger
+
+# Token budget for turns kept verbatim; older turns are folded into the summary
+RECENT_TOKEN_BUDGET = int(os.getenv("CHAT_RECENT_TOKEN_BUDGET", "1500"))
+# Target size of the rolling summary
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "400"))
+# Idle conversations are forgotten after this many seconds
+SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL", str(6 * 3600)))
+# A summary update that has not finished after this long no longer blocks the next one
+FOLD_LOCK_SECONDS = 120
+# Session updates hold a short lease in the shared cache; a lease left by a dead worker expires after this long
+WRITE_LOCK_SECONDS = 5
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text or ""))
+    return estimate_tokens(text)
+
+
+class ConversationMemory:
+    """Server-side chat history per session: recent turns verbatim plus a rolling summary.
+
+    Sessions live in the shared cache, so every worker sees the same history.
+    """
+
+    def __init__(self):
+        self.name = "Conversation Memory"
+        self.sessions = Cache("chat", default_ttl=SESSION_TTL_SECONDS)
+        # session id -> [lock, holders]
+        self._locks: Dict[str, list] = {}
+        # Running summary folds, referenced so they are not garbage-collected mid-run
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = await self.sessions.aget(session_id)
+        if session is None:
+            return None
+        return {"summary": session["summary"], "turns": session["turns"]}
+
+    async def seed(self, session_id: str, history: List[Dict[str, str]]):
+        """Start a session from client-supplied history (e.g. after a restart)"""
+        async with self._session_lock(session_id):
+            if await self.sessions.aget(session_id) is not None:
+                return
+            session = {"summary": "", "turns": [dict(turn) for turn in history]}
+            await self.sessions.aset(session_id, session)
+        await self._schedule_fold(session_id, session)
+
+    async def append(self, session_id: str, question: str, answer: str):
+        async with self._session_lock(session_id):
+            session = await self.sessions.aget(session_id) or {"summary": "", "turns": []}
+            session["turns"].extend([
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ])
+            await self.sessions.aset(session_id, session)
+        await self._schedule_fold(session_id, session)
+
+    @asynccontextmanager
+    async def _session_lock(self, session_id: str):
+        """Serialize read-modify-write of one session, within this worker and across workers"""
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                key = f"write:{session_id}"
+                give_up = time.monotonic() + WRITE_LOCK_SECONDS
+                acquired = await self.sessions.aadd(key, True, ttl=WRITE_LOCK_SECONDS)
+                # By the time we give up, a lease held by a dead worker has expired anyway
+                while not acquired and time.monotonic() < give_up:
+                    await asyncio.sleep(0.05)
+                    acquired = await self.sessions.aadd(key, True, ttl=WRITE_LOCK_SECONDS)
+                try:
+                    yield
+                finally:
+                    if acquired:
+                        await self.sessions.adelete(key)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._locks.pop(session_id, None)
+
+    def render(self, conversation: Optional[Dict[str, Any]]) -> str:
+        """Prompt section with the summary and the newest turns that fit the token budget"""
+        if not conversation:
+            return ""
+
+        recent = []
+        used = 0
+        for turn in reversed(conversation["turns"]):
+            tokens = count_tokens(turn["content"])
+            if recent and used + tokens > RECENT_TOKEN_BUDGET:
+                break
+            recent.append(turn)
+            used += tokens
+        recent.reverse()
+
+        parts = []
+        if conversation.get("summary"):
+            parts.append(f"Summary of earlier conversation:\n{conversation['summary']}")
+        if recent:
+            lines = "\n".join(
+                f"{'User' if turn['role'] == 'user' else 'Assistant'}: {turn['content']}" for turn in recent
+            )
+            parts.append(f"Recent conversation:\n{lines}")
+        return "\n\n".join(parts)
+
+    async def _schedule_fold(self, session_id: str, session: Dict[str, Any]):
+        """Fold overflowing turns into the summary in the background, off the answer path"""
+        if sum(count_tokens(turn["content"]) for turn in session["turns"]) <= RECENT_TOKEN_BUDGET:
+            return
+        # One fold per session at a time, across all workers
+        if not await self.sessions.aadd(f"fold:{session_id}", True, ttl=FOLD_LOCK_SECONDS):
+            return
+        task = asyncio.get_running_loop().create_task(self._fold(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._fold_done)
+
+    def _fold_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"[{self.name}] Summary fold crashed: {task.exception()}")
+
+    async def _fold(self, session_id: str):
+        # Runs after the request that triggered it, so it must not inherit that request's deadline
+        current_deadline.set(None)
+        try:
+            session = await self.sessions.aget(session_id)
+            if session is None:
+                return
+            summary = session["summary"]
+            turns = session["turns"]
+
+            # Keep the newest turns within budget, fold everything older
+            keep = 0
+            used = 0
+            for turn in reversed(turns):
+                tokens = count_tokens(turn["content"])
+                if keep and used + tokens > RECENT_TOKEN_BUDGET:
+                    break
+                keep += 1
+                used += tokens
+            folded = turns[:len(turns) - keep]
+            if not folded:
+                return
+
+            new_summary = await self._summarize(summary, folded)
+
+            async with self._session_lock(session_id):
+                session = await self.sessions.aget(session_id)
+                if session is None:
+                    return
+                # Turns appended while summarizing stay; only the folded prefix is replaced
+                session["turns"] = session["turns"][len(folded):]
+                session["summary"] = new_summary
+                await self.sessions.aset(session_id, session)
+            logger.info(f"[{self.name}] Folded {len(folded)} turns into summary for session {session_id}")
+        except Exception as e:
+            logger.warning(f"[{self.name}] Failed to update summary for session {session_id}: {str(e)}")
+        finally:
+            await self.sessions.adelete(f"fold:{session_id}")
+
+    async def _summarize(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        # Long answers are clipped so a single summarization call stays bounded
+        transcript = "\n".join(
+            f"{'User' if turn['role'] == 'user' else 'Assistant'}: {turn['content'][:2000]}" for turn in turns
+        )
+        prompt = f"""Update the running summary of a conversation between a user and a research assistant.
+
+Current summary:
+{summary or "(none)"}
+
+New turns to fold in:
+{transcript}
+
+Write the updated summary in at most {SUMMARY_TOKEN_BUDGET // 2} words. Keep facts, decisions, open questions and the user's interests; drop pleasantries."""
+
+        result = await llm_router.agenerate("summary", prompt, max_output_tokens=SUMMARY_TOKEN_BUDGET * 2)
+        new_summary = result["content"].strip()
+        # Hard cap in case the model ignores the length instruction
+        if count_tokens(new_summary) > SUMMARY_TOKEN_BUDGET * 2:
+            new_summary = new_summary[:SUMMARY_TOKEN_BUDGET * 8]
+        return new_summary
+
+
+# Shared conversation store used by the /api/question endpoint
+conversation_memory = ConversationMemory()
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import threading
+import urllib.parse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.checkpoints import CHECKPOINT_TTL_SECONDS
+from backend.utils import logger
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "jarvis_database")
+# One pool per process, shared by every module
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+# Background connection attempts before giving up (the app keeps serving without MongoDB)
+MONGO_CONNECT_RETRIES = int(os.getenv("MONGO_CONNECT_RETRIES", "3"))
+MONGO_RETRY_DELAY = float(os.getenv("MONGO_RETRY_DELAY", "5"))
+
+# Indexes every collection needs: collection -> [(keys, options)]
+INDEXES: Dict[str, List[Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    "users": [
+        ([("userId", 1)], {"unique": True}),
+        ([("lastActive", 1)], {}),
+    ],
+    "activity_logs": [
+        ([("userId", 1)], {}),
+        ([("timestamp", 1)], {}),
+        # Cache warmer aggregation over recent research queries
+        ([("actionType", 1), ("timestamp", -1)], {}),
+    ],
+    "research_snapshots": [
+        ([("key", 1)], {"unique": True}),
+    ],
+    "reports": [
+        ([("reportId", 1)], {"unique": True}),
+        ([("userIds", 1), ("createdAt", -1)], {}),
+    ],
+    "run_checkpoints": [
+        ([("runId", 1)], {"unique": True}),
+        ([("updatedAt", 1)], {"expireAfterSeconds": CHECKPOINT_TTL_SECONDS}),
+    ],
+}
+
+
+def encode_mongo_uri(uri: str) -> str:
+    """Percent-encode credentials in a single-host URI (multi-host URIs are used as-is)"""
+    if "," in uri or "@" not in uri:
+        return uri
+    try:
+        parsed_uri = urllib.parse.urlparse(uri)
+        username = parsed_uri.username
+        password = parsed_uri.password
+        if not (username and password):
+            return uri
+        new_netloc = f"{urllib.parse.quote_plus(username)}:{urllib.parse.quote_plus(password)}@{parsed_uri.hostname}"
+        if parsed_uri.port:
+            new_netloc += f":{parsed_uri.port}"
+        return urllib.parse.urlunparse((
+            parsed_uri.scheme,
+            new_netloc,
+            parsed_uri.path,
+            parsed_uri.params,
+            parsed_uri.query,
+            parsed_uri.fragment
+        ))
+    except Exception as e:
+        logger.warning(f"Failed to encode MongoDB URI: {e}")
+        return uri
+
+
+def _index_name(keys: List[Tuple[str, int]]) -> str:
+    """Default name MongoDB gives an index on these keys"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+class Database:
+    """Shared, lazily connected MongoDB client.
+
+    Nothing touches the network at import time. The connection check and
+    index setup run in a background task started by the server, and
+    collection() returns None until that has succeeded.
+    """
+
+    def __init__(self, uri: Optional[str] = MONGODB_URI):
+        self.name = "Database"
+        self.uri = uri
+        self.client = None
+        self.db = None
+        # disabled | pending | connecting | ready | failed
+        self.status = "pending" if uri else "disabled"
+        self.error: Optional[str] = None
+        self._client_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._ready_callbacks: List[Callable[[Any], None]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def get_client(self):
+        """The process-wide MongoClient; creating it does not block on the network"""
+        if self.client is not None or not self.uri:
+            return self.client
+        with self._client_lock:
+            if self.client is None:
+                from pymongo import MongoClient
+
+                options = {
+                    "serverSelectionTimeoutMS": 10000,
+                    "connectTimeoutMS": 20000,
+                    "socketTimeoutMS": 20000,
+                    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+                    "minPoolSize": MONGO_MIN_POOL_SIZE,
+                }
+                # Check if SSL is disabled in the URI
+                if "ssl=false" not in self.uri.lower():
+                    options.update(tls=True, tlsAllowInvalidCertificates=True, tlsAllowInvalidHostnames=True)
+                self.client = MongoClient(encode_mongo_uri(self.uri), **options)
+        return self.client
+
+    def collection(self, name: str):
+        """Collection handle, or None while MongoDB is not (yet) available"""
+        if not self.ready:
+            return None
+        return self.db[name]
+
+    def on_ready(self, callback: Callable[[Any], None]):
+        """Run callback(db) once connected (immediately if already connected)"""
+        if self.ready:
+            callback(self.db)
+        else:
+            self._ready_callbacks.append(callback)
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Connect and set up indexes in the background; safe to call more than once"""
+        if self.status == "disabled":
+            logger.warning("MONGODB_URI not found in environment variables")
+            return None
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._connect_with_retries())
+        return self._task
+
+    async def _connect_with_retries(self):
+        self.status = "connecting"
+        for attempt in range(MONGO_CONNECT_RETRIES):
+            try:
+                await asyncio.to_thread(self._connect)
+                self.status = "ready"
+                self.error = None
+                logger.info("Connected to MongoDB successfully")
+                break
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Attempt {attempt + 1} failed to connect to MongoDB: {e}")
+                if attempt < MONGO_CONNECT_RETRIES - 1:
+                    logger.info(f"Retrying in {MONGO_RETRY_DELAY} seconds...")
+                    await asyncio.sleep(MONGO_RETRY_DELAY)
+        else:
+            self.status = "failed"
+            logger.error("Failed to connect to MongoDB after all retries")
+            return
+
+        for callback in self._ready_callbacks:
+            try:
+                callback(self.db)
+            except Exception as e:
+                logger.warning(f"[{self.name}] Ready callback failed: {e}")
+        self._ready_callbacks = []
+
+    def _connect(self):
+        client = self.get_client()
+        client.admin.command("ping")
+        db = client[MONGODB_DATABASE]
+        self._ensure_indexes(db)
+        self.db = db
+
+    def _ensure_indexes(self, db):
+        """Create only the indexes that do not exist yet, so restarts skip index builds"""
+        for collection_name, indexes in INDEXES.items():
+            collection = db[collection_name]
+            existing = {index["name"] for index in collection.list_indexes()}
+            for keys, options in indexes:
+                if _index_name(keys) in existing:
+                    continue
+                collection.create_index(keys, **options)
+                logger.info(f"[{self.name}] Created index {_index_name(keys)} on {collection_name}")
+
+    def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self.client is not None:
+            self.client.close()
+
+
+# Shared by the server, auth routes and every store backed by MongoDB
+database = Database()
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import os
+import time
+from typing import Any, Awaitable, Optional
+
+from backend.utils import logger
+
+# Default end-to-end deadlines per request type, in seconds
+QUICK_RESEARCH_DEADLINE = float(os.getenv("QUICK_RESEARCH_DEADLINE", "90"))
+DEEP_RESEARCH_DEADLINE = float(os.getenv("DEEP_RESEARCH_DEADLINE", "240"))
+QUESTION_DEADLINE = float(os.getenv("QUESTION_DEADLINE", "60"))
+DOCUMENT_ANALYSIS_DEADLINE = float(os.getenv("DOCUMENT_ANALYSIS_DEADLINE", "180"))
+# How often in-flight requests check whether the client went away
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "1.0"))
+# Upstream calls never get less than this, so a nearly spent deadline fails fast instead of hanging
+MIN_UPSTREAM_TIMEOUT = 1.0
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of time or was cancelled"""
+    pass
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client closed the connection before the response was ready"""
+    pass
+
+
+class Deadline:
+    """Point in time by which a request (or one of its stages) must finish"""
+
+    def __init__(self, timeout: float, parent: Optional["Deadline"] = None):
+        self.expires_at = time.monotonic() + timeout
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.parent = parent
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    def cancel(self):
+        self._cancelled = True
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """Raise if the request was cancelled or its time is up"""
+        if self.cancelled:
+            raise DeadlineExceeded("Request was cancelled")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def child(self, fraction: float) -> "Deadline":
+        """Stage deadline covering a fraction of the remaining time"""
+        return Deadline(self.remaining() * fraction, parent=self)
+
+
+current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("current_deadline", default=None)
+
+
+def check_deadline():
+    """Raise if the current request was cancelled or ran out of time"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def upstream_timeout(default: float) -> float:
+    """Timeout for an upstream HTTP call, capped by the current request deadline"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    return max(MIN_UPSTREAM_TIMEOUT, min(default, deadline.remaining()))
+
+
+async def run_stage(deadline: Optional[Deadline], fraction: float, coro: Awaitable[Any]) -> Any:
+    """Run a pipeline stage under its share of the remaining request time"""
+    if deadline is None:
+        return await coro
+    stage_deadline = deadline.child(fraction)
+    token = current_deadline.set(stage_deadline)
+    try:
+        return await asyncio.wait_for(coro, timeout=max(stage_deadline.remaining(), MIN_UPSTREAM_TIMEOUT))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Stage deadline exceeded")
+    finally:
+        current_deadline.reset(token)
+
+
+async def run_with_deadline(request, coro_factory, timeout: float) -> Any:
+    """Run a request's work under a deadline and cancel it if the client disconnects.
+
+    coro_factory is called after the deadline is installed so every task and
+    worker thread spawned by the work inherits it.
+    """
+    # Clients may ask for a shorter deadline, never a longer one
+    header = request.headers.get("x-request-timeout")
+    if header:
+        try:
+            timeout = min(timeout, float(header))
+        except ValueError:
+            pass
+
+    deadline = Deadline(timeout)
+    token = current_deadline.set(deadline)
+    try:
+        task = asyncio.ensure_future(coro_factory())
+    finally:
+        current_deadline.reset(token)
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_INTERVAL, max(deadline.remaining(), 0.01)))
+            if task in done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}, cancelling outstanding work")
+                raise ClientDisconnected()
+            if deadline.remaining() <= 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+    finally:
+        if not task.done():
+            # Stops new upstream calls in worker threads and cancels pending awaits
+            deadline.cancel()
+            task.cancel()
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+from backend.deadline import check_deadline, current_deadline
+from backend.llm_router import estimate_tokens, llm_router
+from backend.utils import logger
+
+# Deep research stops after this many rounds even if novelty stays high
+MAX_ROUNDS = int(os.getenv("DEEP_RESEARCH_MAX_ROUNDS", "4"))
+# Follow-up queries generated (and searched concurrently) per round
+QUERIES_PER_ROUND = int(os.getenv("DEEP_RESEARCH_QUERIES_PER_ROUND", "3"))
+# Stop once less than this fraction of a round's sources/passages is new
+NOVELTY_THRESHOLD = float(os.getenv("DEEP_RESEARCH_NOVELTY_THRESHOLD", "0.25"))
+# Wall-clock budget for all rounds, in seconds
+TIME_BUDGET = float(os.getenv("DEEP_RESEARCH_TIME_BUDGET", "45"))
+# Token budget covering planning calls plus the accumulated context
+TOKEN_BUDGET = int(os.getenv("DEEP_RESEARCH_TOKEN_BUDGET", "24000"))
+# Upper bound on search API calls per run (Tavily quota)
+MAX_SEARCHES = int(os.getenv("DEEP_RESEARCH_MAX_SEARCHES", "10"))
+
+
+class DeepResearchEngine:
+    """Multi-round research that follows up on gaps until new information dries up"""
+
+    def __init__(self, search: Callable[[str], Dict[str, Any]]):
+        self.name = "Deep Research"
+        self.search = search
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.images: List[Any] = []
+        self.answer = ""
+        self.seen_passages = set()
+        self.queries: List[str] = []
+        self.rounds: List[Dict[str, Any]] = []
+        self.tokens_used = 0
+        self.searches = 0
+
+    async def run(self, topic: str) -> Dict[str, Any]:
+        """Run research rounds and return Tavily-shaped combined results"""
+        start = time.monotonic()
+        queries = [f"comprehensive information about {topic}"]
+        stop_reason = "max_rounds"
+
+        # Leave part of the stage deadline for processing what was found
+        time_budget = TIME_BUDGET
+        deadline = current_deadline.get()
+        if deadline is not None:
+            time_budget = min(time_budget, deadline.remaining() * 0.8)
+
+        for round_number in range(1, MAX_ROUNDS + 1):
+            check_deadline()
+            queries = queries[:max(0, MAX_SEARCHES - self.searches)]
+            if not queries:
+                stop_reason = "search_budget"
+                break
+
+            novelty = await self._run_round(round_number, queries)
+
+            if novelty < NOVELTY_THRESHOLD:
+                stop_reason = "low_novelty"
+                break
+            if time.monotonic() - start >= time_budget:
+                stop_reason = "time_budget"
+                break
+            if self.tokens_used >= TOKEN_BUDGET:
+                stop_reason = "token_budget"
+                break
+            if round_number == MAX_ROUNDS:
+                break
+
+            queries = await self._generate_follow_up_queries(topic)
+            if not queries:
+                stop_reason = "no_follow_ups"
+                break
+
+        elapsed = time.monotonic() - start
+        logger.info(
+            f"[{self.name}] Finished after {len(self.rounds)} rounds ({stop_reason}) in {elapsed:.2f}s: "
+            f"{len(self.results)} sources, {self.searches} searches, ~{self.tokens_used} tokens"
+        )
+
+        return {
+            "answer": self.answer,
+            "results": list(self.results.values()),
+            "images": self.images,
+            "rounds": self.rounds,
+            "stop_reason": stop_reason,
+        }
+
+    async def _run_round(self, round_number: int, queries: List[str]) -> float:
+        """Search all queries concurrently and return the round's novelty ratio"""
+        self.queries.extend(queries)
+        self.searches += len(queries)
+        responses = await asyncio.gather(
+            *[asyncio.to_thread(self.search, query) for query in queries],
+            return_exceptions=True
+        )
+
+        returned = 0
+        new_items = 0
+        new_sources = 0
+        for query, response in zip(queries, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"[{self.name}] Query '{query}' failed: {str(response)}")
+                continue
+
+            if not self.answer and response.get("answer"):
+                self.answer = response["answer"]
+            for image in response.get("images", []):
+                if image not in self.images:
+                    self.images.append(image)
+
+            for result in response.get("results", []):
+                url = result.get("url", "#")
+                passages = self._passage_fingerprints(result.get("content", ""))
+                fresh = passages - self.seen_passages
+                returned += 1 + len(passages)
+
+                if url not in self.results:
+                    self.results[url] = result
+                    new_sources += 1
+                    new_items += 1
+                    self.tokens_used += estimate_tokens(result.get("content", ""))
+                elif fresh:
+                    # Same source, new passage: keep the extra content
+                    self.results[url]["content"] = f"{self.results[url].get('content', '')}\n{result.get('content', '')}"
+                    self.tokens_used += estimate_tokens(result.get("content", ""))
+
+                new_items += len(fresh)
+                self.seen_passages |= fresh
+
+        novelty = new_items / returned if returned else 0.0
+        self.rounds.append({
+            "round": round_number,
+            "queries": queries,
+            "new_sources": new_sources,
+            "novelty": round(novelty, 3),
+        })
+        logger.info(f"[{self.name}] Round {round_number}: {len(queries)} queries, {new_sources} new sources, novelty {novelty:.2f}")
+        return novelty
+
+    async def _generate_follow_up_queries(self, topic: str) -> List[str]:
+        """Ask the planning route for queries that cover gaps in what was found"""
+        covered = "\n".join(
+            f"- {result.get('title', 'Unknown')}: {result.get('content', '')[:200]}"
+            for result in list(self.results.values())[:15]
+        )
+        asked = "\n".join(f"- {query}" for query in self.queries)
+        prompt = f"""You are researching "{topic}".
+
+Queries already searched:
+{asked}
+
+What has been found so far:
+{covered}
+
+Identify the most important gaps in this coverage and return JSON of the form {{"queries": ["..."]}} with at most {QUERIES_PER_ROUND} new web search queries that would fill them. Do not repeat earlier queries."""
+
+        try:
+            result = await llm_router.agenerate("planning", prompt, json_mode=True)
+        except Exception as e:
+            logger.warning(f"[{self.name}] Follow-up query generation failed: {str(e)}")
+            return []
+
+        usage = result.get("usage", {})
+        self.tokens_used += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+        try:
+            content = re.sub(r"^```[a-zA-Z]*\n|\n```$", "", result["content"].strip())
+            queries = json.loads(content).get("queries", [])
+        except Exception as e:
+            logger.warning(f"[{self.name}] Could not parse follow-up queries: {str(e)}")
+            return []
+
+        seen = {query.lower() for query in self.queries}
+        follow_ups = []
+        for query in queries:
+            if isinstance(query, str) and query.strip() and query.strip().lower() not in seen:
+                follow_ups.append(query.strip())
+                seen.add(query.strip().lower())
+        return follow_ups[:QUERIES_PER_ROUND]
+
+    def _passage_fingerprints(self, content: str) -> set:
+        """Hash normalized sentences so a passage repeated across sources is not counted as new"""
+        fingerprints = set()
+        for sentence in re.split(r"(?<=[.!?])\s+", content):
+            words = re.findall(r"[a-z0-9]+", sentence.lower())
+            if len(words) < 5:
+                continue
+            fingerprints.add(hashlib.sha1(" ".join(words).encode()).hexdigest())
+        return fingerprints
+
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.utils import logger
+
+# Local sentence-transformers model used for all embedding features (runs on CPU)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+# Inference backend: "torch", "quantized" (int8 dynamic quantization) or "onnx"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Largest micro-batch and how long the first request in a batch waits for company
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+# Threads running model inference (each batch already uses torch's intra-op threads)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+# Recently embedded texts kept in memory
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+
+def _load_model():
+    """Load the embedding model for the configured backend, falling back to plain torch"""
+    from sentence_transformers import SentenceTransformer
+
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            return SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE, backend="onnx")
+        except Exception as e:
+            logger.warning(f"ONNX embedding backend unavailable, using torch: {e}")
+
+    model = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE)
+    if EMBEDDING_BACKEND == "quantized":
+        try:
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            logger.warning(f"Failed to quantize embedding model, using full precision: {e}")
+    return model
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two unit-normalized vectors"""
+    return sum(x * y for x, y in zip(a, b))
+
+
+class EmbeddingService:
+    """Queues embedding requests from all handlers and runs them through the model in micro-batches"""
+
+    def __init__(self, max_batch: int = EMBEDDING_MAX_BATCH, batch_window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 workers: int = EMBEDDING_WORKERS, cache_size: int = EMBEDDING_CACHE_SIZE, loader=_load_model):
+        self.name = "Embedding Service"
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self.cache_size = cache_size
+        self._loader = loader
+        self._model = None
+        self._model_failed = False
+        self._model_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+        # Bounds batches in flight so the queue keeps filling while the model is busy
+        self._slots = threading.Semaphore(workers)
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats = {"texts": 0, "cache_hits": 0, "batches": 0, "batched_texts": 0, "inference_seconds": 0.0}
+
+    def _get_model(self):
+        if self._model is not None or self._model_failed:
+            return self._model
+        with self._model_lock:
+            if self._model is None and not self._model_failed:
+                try:
+                    self._model = self._loader()
+                    logger.info(f"[{self.name}] Loaded {EMBEDDING_MODEL} ({EMBEDDING_BACKEND}) on {EMBEDDING_DEVICE}")
+                except Exception as e:
+                    self._model_failed = True
+                    logger.warning(f"[{self.name}] Embedding model unavailable, embedding features disabled: {e}")
+        return self._model
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        """Queue texts for embedding; each future resolves to a unit-normalized vector (or None)"""
+        self._ensure_started()
+        futures = []
+        for text in texts:
+            future: Future = Future()
+            with self._cache_lock:
+                self._stats["texts"] += 1
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    self._stats["cache_hits"] += 1
+            if vector is not None:
+                future.set_result(vector)
+            else:
+                self._queue.put((text, future))
+            futures.append(future)
+        return futures
+
+    async def embed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embed texts without blocking the event loop; None if no model is available"""
+        futures = [asyncio.wrap_future(future) for future in self.submit(texts)]
+        vectors = await asyncio.gather(*futures)
+        if any(vector is None for vector in vectors):
+            return None
+        return list(vectors)
+
+    def embed_sync(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Blocking variant for worker threads"""
+        vectors = [future.result() for future in self.submit(texts)]
+        if any(vector is None for vector in vectors):
+            return None
+        return vectors
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect more requests until the batch is full or the window closes
+            window_ends = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = window_ends - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Requests that queued up while a batch was running are taken without waiting
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._slots.acquire()
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]):
+        try:
+            # Identical texts in one batch are embedded once
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            model = self._get_model()
+            vectors: Dict[str, Any] = {}
+            if model is not None:
+                start = time.monotonic()
+                encoded = model.encode(texts, batch_size=len(texts), normalize_embeddings=True,
+                                       convert_to_numpy=True, show_progress_bar=False)
+                vectors = {text: vector.tolist() for text, vector in zip(texts, encoded)}
+                with self._cache_lock:
+                    self._stats["batches"] += 1
+                    self._stats["batched_texts"] += len(texts)
+                    self._stats["inference_seconds"] += time.monotonic() - start
+                    for text, vector in vectors.items():
+                        self._cache[text] = vector
+                        self._cache.move_to_end(text)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+            for text, future in batch:
+                future.set_result(vectors.get(text))
+        except Exception as e:
+            logger.error(f"[{self.name}] Embedding batch failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            stats = dict(self._stats)
+            stats["cache_entries"] = len(self._cache)
+        stats["queued"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["batched_texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["texts_per_second"] = (
+            round(stats["batched_texts"] / stats["inference_seconds"], 1) if stats["inference_seconds"] else 0.0
+        )
+        stats["inference_seconds"] = round(stats["inference_seconds"], 3)
+        stats["backend"] = EMBEDDING_BACKEND
+        stats["model"] = EMBEDDING_MODEL
+        return stats
+
+
+# Shared service used by every embedding feature
+embedding_service = EmbeddingService()
+
+
+async def embed(texts: List[str]) -> Optional[List[List[float]]]:
+    """Unit-normalized embeddings for texts, or None if no model is available"""
+    return await embedding_service.embed(texts)
+
+
+def embed_sync(texts: List[str]) -> Optional[List[List[float]]]:
+    return embedding_service.embed_sync(texts)
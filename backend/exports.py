@@ -0,0 +1,329 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from backend.utils import logger
+
+# Rendered exports, keyed by report hash and format
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(".cache", "exports"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+# Processes rendering PDF/DOCX files (rendering is CPU-bound and would hold the GIL)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+# Width images are fetched at for embedding
+EXPORT_IMAGE_WIDTH = 960
+# Bump when the layout changes so stale cached renders are not served
+RENDER_VERSION = 1
+
+# format -> (media type, extension, module needed to render it)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "pdf": ("application/pdf", "pdf", "reportlab"),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx", "docx"),
+    "md": ("text/markdown; charset=utf-8", "md", None),
+}
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*+]|\d+\.)\s+(.*)$")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_FILENAME_RE = re.compile(r"[^\w\-]+")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_export_locks: Dict[str, asyncio.Lock] = {}
+
+
+def format_available(fmt: str) -> bool:
+    module = EXPORT_FORMATS[fmt][2]
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def export_filename(topic: str, fmt: str) -> str:
+    name = _FILENAME_RE.sub("_", topic).strip("_")[:80] or "Report"
+    return f"{name}_JARVIS_Report.{EXPORT_FORMATS[fmt][1]}"
+
+
+def export_path(report_hash: str, fmt: str) -> str:
+    return os.path.join(EXPORT_CACHE_DIR, f"{report_hash}.v{RENDER_VERSION}.{EXPORT_FORMATS[fmt][1]}")
+
+
+def _parse_blocks(markdown: str) -> List[Tuple[str, Any]]:
+    """Split report markdown into ("heading", (level, text)), ("bullet", text) and ("para", text) blocks"""
+    blocks = []
+    paragraph: List[str] = []
+
+    def flush():
+        if paragraph:
+            blocks.append(("para", " ".join(paragraph)))
+            paragraph.clear()
+
+    for line in markdown.splitlines():
+        text = line.strip()
+        if not text or text.startswith("```"):
+            flush()
+            continue
+        heading = _HEADING_RE.match(text)
+        bullet = _BULLET_RE.match(line)
+        if heading:
+            flush()
+            blocks.append(("heading", (len(heading.group(1)), heading.group(2).strip("# "))))
+        elif bullet:
+            flush()
+            blocks.append(("bullet", bullet.group(1)))
+        else:
+            paragraph.append(text)
+    flush()
+    return blocks
+
+
+def _generated_line(created_at: Optional[datetime]) -> str:
+    stamp = created_at or datetime.utcnow()
+    return f"Generated by JARVIS on {stamp.strftime('%Y-%m-%d %H:%M UTC')}"
+
+
+def render_markdown(report: Dict[str, Any]) -> bytes:
+    parts = [f"# {report['topic']}", "", f"*{_generated_line(report.get('created_at'))}*", "", report["report"].strip(), ""]
+    if report.get("images"):
+        parts += ["## Visual Assets", ""]
+        parts += [f"![Image {i}]({url})" for i, url in enumerate(report["images"], 1)]
+        parts.append("")
+    if report.get("sources"):
+        parts += ["## References", ""]
+        parts += [
+            f"{i}. [{source.get('title') or 'Unknown Source'}]({source.get('uri', '')})"
+            for i, source in enumerate(report["sources"], 1)
+        ]
+        parts.append("")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _to_jpeg(data: bytes) -> Optional[bytes]:
+    """Re-encode an image as JPEG, which both PDF and DOCX writers accept"""
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(data)) as image:
+            output = BytesIO()
+            image.convert("RGB").save(output, format="JPEG", quality=85)
+            return output.getvalue()
+    except Exception:
+        return None
+
+
+def _pdf_inline(text: str) -> str:
+    text = escape(text, {'"': "&quot;"})
+    text = _LINK_RE.sub(r'<link href="\2" color="blue">\1</link>', text)
+    text = _BOLD_RE.sub(r"<b>\1</b>", text)
+    return _ITALIC_RE.sub(r"<i>\1</i>", text)
+
+
+def render_pdf(report: Dict[str, Any], images: List[bytes]) -> bytes:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Image, ListFlowable, ListItem, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle("JarvisTitle", parent=styles["Title"], textColor=colors.HexColor("#0096ff"))
+    meta_style = ParagraphStyle("JarvisMeta", parent=styles["Normal"], textColor=colors.grey, fontSize=9)
+    body_style = ParagraphStyle("JarvisBody", parent=styles["BodyText"], fontSize=11, leading=15)
+    heading_styles = {1: styles["Heading1"], 2: styles["Heading2"], 3: styles["Heading3"]}
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20 * mm, rightMargin=20 * mm,
+                            topMargin=20 * mm, bottomMargin=20 * mm, title=report["topic"], author="JARVIS")
+    story = [Paragraph(escape(report["topic"]), title_style), Paragraph(_generated_line(report.get("created_at")), meta_style), Spacer(1, 8 * mm)]
+
+    bullets: List[Any] = []
+    for kind, value in _parse_blocks(report["report"]):
+        if kind != "bullet" and bullets:
+            story.append(ListFlowable(bullets, bulletType="bullet"))
+            bullets = []
+        if kind == "heading":
+            level, text = value
+            story.append(Paragraph(_pdf_inline(text), heading_styles.get(level, styles["Heading4"])))
+        elif kind == "bullet":
+            bullets.append(ListItem(Paragraph(_pdf_inline(value), body_style)))
+        else:
+            story.append(Paragraph(_pdf_inline(value), body_style))
+    if bullets:
+        story.append(ListFlowable(bullets, bulletType="bullet"))
+
+    if images:
+        story += [PageBreak(), Paragraph("Visual Assets", heading_styles[1])]
+        for data in images:
+            image = Image(BytesIO(data))
+            scale = min(1.0, doc.width / image.imageWidth, (doc.height * 0.45) / image.imageHeight)
+            image.drawWidth = image.imageWidth * scale
+            image.drawHeight = image.imageHeight * scale
+            story += [image, Spacer(1, 5 * mm)]
+
+    if report.get("sources"):
+        story.append(Paragraph("References &amp; Sources", heading_styles[1]))
+        for i, source in enumerate(report["sources"], 1):
+            title = escape(source.get("title") or "Unknown Source")
+            uri = escape(source.get("uri", ""), {'"': "&quot;"})
+            story.append(Paragraph(f'[{i}] {title} (<link href="{uri}" color="blue">{uri}</link>)', meta_style))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _docx_runs(paragraph, text: str):
+    """Add text to a python-docx paragraph, turning **bold** spans into bold runs"""
+    for index, part in enumerate(_BOLD_RE.split(_LINK_RE.sub(r"\1 (\2)", text))):
+        if part:
+            paragraph.add_run(part.replace("*", "")).bold = index % 2 == 1
+
+
+def render_docx(report: Dict[str, Any], images: List[bytes]) -> bytes:
+    from docx import Document
+    from docx.shared import Inches, Pt, RGBColor
+
+    document = Document()
+    document.core_properties.title = report["topic"]
+    document.core_properties.author = "JARVIS"
+    document.add_heading(report["topic"], level=0)
+    meta = document.add_paragraph().add_run(_generated_line(report.get("created_at")))
+    meta.italic = True
+    meta.font.size = Pt(10)
+    meta.font.color.rgb = RGBColor(0x66, 0x66, 0x66)
+
+    for kind, value in _parse_blocks(report["report"]):
+        if kind == "heading":
+            level, text = value
+            document.add_heading(text.replace("*", ""), level=min(level, 4))
+        elif kind == "bullet":
+            _docx_runs(document.add_paragraph(style="List Bullet"), value)
+        else:
+            _docx_runs(document.add_paragraph(), value)
+
+    if images:
+        document.add_page_break()
+        document.add_heading("Visual Assets", level=1)
+        for data in images:
+            document.add_picture(BytesIO(data), width=Inches(6))
+
+    if report.get("sources"):
+        document.add_heading("References & Sources", level=1)
+        for i, source in enumerate(report["sources"], 1):
+            paragraph = document.add_paragraph()
+            paragraph.add_run(f"[{i}] {source.get('title') or 'Unknown Source'} ").bold = True
+            paragraph.add_run(source.get("uri", ""))
+
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def render_export(fmt: str, report: Dict[str, Any], images: List[bytes]) -> bytes:
+    """Render a report in one format (runs in a pool process)"""
+    if fmt == "md":
+        return render_markdown(report)
+    images = [jpeg for jpeg in (_to_jpeg(data) for data in images) if jpeg]
+    if fmt == "pdf":
+        return render_pdf(report, images)
+    return render_docx(report, images)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawn rather than fork: the server process has live threads and sockets
+        _pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _fetch_images(urls: List[str]) -> List[bytes]:
+    """Embeddable copies of report images via the thumbnail cache; unreachable images are skipped"""
+    from backend.images import get_thumbnail
+
+    results = await asyncio.gather(*(get_thumbnail(url, EXPORT_IMAGE_WIDTH) for url in urls), return_exceptions=True)
+    images = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Skipping image {url} in export: {result}")
+        else:
+            images.append(result[0])
+    return images
+
+
+def _prune_cache():
+    """Drop the least recently served exports once the cache exceeds its size budget"""
+    entries = []
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        path = os.path.join(EXPORT_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= EXPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+async def get_export(report_hash: str, fmt: str, load_report) -> Optional[str]:
+    """Path of the rendered export, rendering it into the disk cache on first request.
+
+    `load_report` is a blocking callable returning the archived report (or None).
+    """
+    path = export_path(report_hash, fmt)
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+
+    lock = _export_locks.setdefault(path, asyncio.Lock())
+    try:
+        async with lock:
+            if os.path.exists(path):
+                # Mark as recently used for pruning
+                os.utime(path)
+                return path
+
+            report = await asyncio.to_thread(load_report)
+            if report is None:
+                return None
+            images = await _fetch_images(report.get("images") or []) if fmt != "md" else []
+
+            start = time.perf_counter()
+            if fmt == "md":
+                body = await asyncio.to_thread(render_markdown, report)
+            else:
+                try:
+                    body = await asyncio.get_running_loop().run_in_executor(_get_pool(), render_export, fmt, report, images)
+                except BrokenProcessPool:
+                    # A crashed renderer poisons the pool; start a fresh one for the next export
+                    shutdown_pool()
+                    raise Exception("Export worker crashed")
+            logger.info(f"Rendered {fmt} export of report {report.get('report_id')} ({len(body)} bytes) in {time.perf_counter() - start:.2f}s")
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            await asyncio.to_thread(_prune_cache)
+            return path
+    finally:
+        if _export_locks.get(path) is lock:
+            _export_locks.pop(path, None)
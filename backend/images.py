@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import os
+import socket
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urlparse, urlunparse
+
+import httpx
+
+from backend.cache import Cache
+from backend.deadline import upstream_timeout
+from backend.utils import logger
+
+# Directory for resized thumbnails
+THUMB_CACHE_DIR = os.getenv("THUMB_CACHE_DIR", os.path.join(".cache", "thumbs"))
+# Thumbnails unused for this long are dropped, then the least recently served ones beyond the size budget
+THUMB_CACHE_MAX_BYTES = int(os.getenv("THUMB_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+THUMB_CACHE_MAX_AGE = float(os.getenv("THUMB_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+# Seconds between thumbnail cache prunes
+THUMB_PRUNE_INTERVAL = 300
+# Proxy links are signed so the endpoint only fetches images this server handed out
+IMAGE_PROXY_SECRET = os.getenv("IMAGE_PROXY_SECRET") or os.getenv("SESSION_SECRET_KEY", "your-session-secret-key-change-in-production")
+# Thumbnail widths we render; requests are snapped to the nearest one to bound cache variants
+THUMB_WIDTHS = (160, 320, 480, 640, 960)
+DEFAULT_THUMB_WIDTH = 640
+# Largest upstream image the proxy will download
+MAX_IMAGE_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Liveness check timeout and how long results are reused
+IMAGE_CHECK_TIMEOUT = float(os.getenv("IMAGE_CHECK_TIMEOUT", "4"))
+IMAGE_CHECK_TTL = int(os.getenv("IMAGE_CHECK_TTL", str(6 * 3600)))
+IMAGE_CHECK_CONCURRENCY = int(os.getenv("IMAGE_CHECK_CONCURRENCY", "8"))
+# Rewrite report images to the thumbnail proxy so clients never download full-size originals
+IMAGE_THUMB_PROXY = os.getenv("IMAGE_THUMB_PROXY", "true").lower() == "true"
+# Externally visible base URL for proxy links (defaults to the request's base URL)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "")
+# Maximum images kept per report
+MAX_IMAGES = int(os.getenv("MAX_IMAGES", "8"))
+# Perceptual-hash dedupe downloads every image, so it is opt-in
+IMAGE_PHASH_DEDUPE = os.getenv("IMAGE_PHASH_DEDUPE", "false").lower() == "true"
+# Images whose difference hashes differ in at most this many bits are duplicates
+PHASH_MAX_DISTANCE = 6
+
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "cmpid"}
+
+USER_AGENT = "Mozilla/5.0 (compatible; JarvisResearchBot/1.0)"
+
+# url -> is_alive, shared by all workers
+_liveness_cache = Cache("image-liveness", default_ttl=IMAGE_CHECK_TTL)
+# Per-thumbnail locks so concurrent requests resize an image only once
+_thumb_locks: Dict[str, asyncio.Lock] = {}
+_last_prune = 0.0
+
+
+def image_url(image: Any) -> str:
+    """Tavily returns plain URLs or {"url", "description"} dicts depending on options"""
+    if isinstance(image, dict):
+        return image.get("url", "")
+    return image or ""
+
+
+def canonicalize_image_url(url: str) -> str:
+    """Normalize an image URL so trivially different links to the same file compare equal"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    netloc = host
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        netloc = f"{host}:{port}"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, urlencode(sorted(query)), ""))
+
+
+def dedupe_image_urls(images: List[Any]) -> List[str]:
+    """Canonicalize and drop duplicate or non-http image URLs, keeping the first occurrence"""
+    unique = []
+    seen = set()
+    for image in images:
+        url = image_url(image)
+        if not url.startswith(("http://", "https://")):
+            continue
+        canonical = canonicalize_image_url(url)
+        if canonical in seen:
+            continue
+        seen.add(canonical)
+        unique.append(canonical)
+    return unique
+
+
+def is_public_url(url: str) -> bool:
+    """Reject URLs that resolve to private, loopback or link-local addresses"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, None)}
+    except socket.gaierror:
+        return False
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast:
+            return False
+    return True
+
+
+async def _probe_image(client: httpx.AsyncClient, url: str, max_redirects: int = 3) -> httpx.Response:
+    """HEAD an image, following redirects only while every hop is public"""
+    for _ in range(max_redirects + 1):
+        if not await asyncio.to_thread(is_public_url, url):
+            raise ValueError("Image URL is not publicly routable")
+        response = await client.head(url)
+        # Some CDNs reject HEAD; fall back to a one-byte ranged GET
+        if response.status_code in (403, 405, 501):
+            response = await client.get(url, headers={"Range": "bytes=0-0"})
+        if not response.has_redirect_location:
+            return response
+        url = str(response.url.join(response.headers["location"]))
+    raise ValueError("Too many redirects")
+
+
+async def _check_image(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str) -> bool:
+    cached = await _liveness_cache.aget(url)
+    if cached is not None:
+        return cached
+
+    alive = False
+    try:
+        async with semaphore:
+            response = await _probe_image(client, url)
+        alive = response.status_code < 400 and response.headers.get("content-type", "").startswith("image/")
+    except Exception as e:
+        logger.debug(f"Image liveness check failed for {url}: {e}")
+
+    await _liveness_cache.aset(url, alive)
+    return alive
+
+
+async def filter_live_images(urls: List[str]) -> List[str]:
+    """HEAD-check images concurrently and keep the ones that still resolve to an image"""
+    if not urls:
+        return []
+    semaphore = asyncio.Semaphore(IMAGE_CHECK_CONCURRENCY)
+    async with httpx.AsyncClient(
+        timeout=upstream_timeout(IMAGE_CHECK_TIMEOUT),
+        headers={"User-Agent": USER_AGENT},
+    ) as client:
+        results = await asyncio.gather(*[_check_image(client, semaphore, url) for url in urls])
+    return [url for url, alive in zip(urls, results) if alive]
+
+
+def _difference_hash(data: bytes) -> Optional[int]:
+    """64-bit difference hash of an image, or None if it cannot be decoded"""
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(data)) as image:
+            pixels = list(image.convert("L").resize((9, 8)).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+async def dedupe_by_perceptual_hash(urls: List[str]) -> List[str]:
+    """Drop images that look the same even though their URLs differ"""
+    downloads = await asyncio.gather(*[fetch_image_bytes(url) for url in urls], return_exceptions=True)
+
+    hashes: List[int] = []
+    unique = []
+    for url, data in zip(urls, downloads):
+        value = None if isinstance(data, Exception) else await asyncio.to_thread(_difference_hash, data)
+        if value is not None and any(bin(value ^ other).count("1") <= PHASH_MAX_DISTANCE for other in hashes):
+            continue
+        if value is not None:
+            hashes.append(value)
+        unique.append(url)
+    return unique
+
+
+async def fetch_image_bytes(url: str, max_redirects: int = 3) -> bytes:
+    """Download an image with a size cap, refusing non-public hosts (including on redirects)"""
+    async with httpx.AsyncClient(timeout=upstream_timeout(IMAGE_CHECK_TIMEOUT * 2), headers={"User-Agent": USER_AGENT}) as client:
+        for _ in range(max_redirects + 1):
+            if not await asyncio.to_thread(is_public_url, url):
+                raise ValueError("Image URL is not publicly routable")
+
+            async with client.stream("GET", url) as response:
+                if response.has_redirect_location:
+                    url = str(response.url.join(response.headers["location"]))
+                    continue
+                response.raise_for_status()
+                if not response.headers.get("content-type", "").startswith("image/"):
+                    raise ValueError("URL did not return an image")
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > MAX_IMAGE_BYTES:
+                        raise ValueError("Image too large")
+                return bytes(body)
+
+    raise ValueError("Too many redirects")
+
+
+def snap_thumb_width(width: Optional[int]) -> int:
+    if not width:
+        return DEFAULT_THUMB_WIDTH
+    return min(THUMB_WIDTHS, key=lambda candidate: abs(candidate - width))
+
+
+def thumbnail_signature(url: str) -> str:
+    return hmac.new(IMAGE_PROXY_SECRET.encode(), url.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def verify_thumbnail_signature(url: str, signature: Optional[str]) -> bool:
+    return bool(signature) and hmac.compare_digest(thumbnail_signature(url), signature)
+
+
+def thumbnail_url(base_url: str, url: str, width: int = DEFAULT_THUMB_WIDTH) -> str:
+    """Signed proxy URL that serves a cached, resized copy of an image"""
+    return f"{base_url.rstrip('/')}/api/images/thumb?url={quote(url, safe='')}&w={width}&sig={thumbnail_signature(url)}"
+
+
+def _render_thumbnail(data: bytes, width: int) -> Tuple[bytes, str]:
+    """Resize to the target width and re-encode as WebP (or JPEG without WebP support)"""
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as image:
+        image = image.convert("RGB")
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        output = BytesIO()
+        try:
+            image.save(output, format="WEBP", quality=80, method=4)
+            media_type = "image/webp"
+        except Exception:
+            output = BytesIO()
+            image.save(output, format="JPEG", quality=80, optimize=True, progressive=True)
+            media_type = "image/jpeg"
+    return output.getvalue(), media_type
+
+
+def _prune_thumbnails():
+    """Drop stale thumbnails, then the least recently served ones once the cache exceeds its size budget"""
+    entries = []
+    expired_before = time.time() - THUMB_CACHE_MAX_AGE
+    for name in os.listdir(THUMB_CACHE_DIR):
+        path = os.path.join(THUMB_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime < expired_before:
+                os.remove(path)
+                continue
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= THUMB_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def thumbnail_key(url: str, width: int) -> str:
+    """Cache key (also used as the ETag) for a thumbnail"""
+    return hashlib.sha256(f"{canonicalize_image_url(url)}|{width}".encode()).hexdigest()
+
+
+async def get_thumbnail(url: str, width: int) -> Tuple[bytes, str, str]:
+    """Return (body, media_type, key) for a thumbnail, rendering it into the disk cache once"""
+    key = thumbnail_key(url, width)
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+
+    lock = _thumb_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            for extension, media_type in (("webp", "image/webp"), ("jpg", "image/jpeg")):
+                path = os.path.join(THUMB_CACHE_DIR, f"{key}.{extension}")
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        body = f.read()
+                    # Recency for the LRU prune
+                    os.utime(path)
+                    return body, media_type, key
+
+            data = await fetch_image_bytes(url)
+            body, media_type = await asyncio.to_thread(_render_thumbnail, data, width)
+
+            extension = "webp" if media_type == "image/webp" else "jpg"
+            path = os.path.join(THUMB_CACHE_DIR, f"{key}.{extension}")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+            global _last_prune
+            if time.time() - _last_prune > THUMB_PRUNE_INTERVAL:
+                _last_prune = time.time()
+                await asyncio.to_thread(_prune_thumbnails)
+            return body, media_type, key
+    finally:
+        if _thumb_locks.get(key) is lock:
+            _thumb_locks.pop(key, None)
@@ -0,0 +1,379 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from backend.deadline import DeadlineExceeded, current_deadline, upstream_timeout
+from backend.utils import logger
+
+# Provider display names (kept stable for the /api/llm/generate response)
+PROVIDER_NAMES = {
+    "gemini": "Google Gemini",
+    "groq": "Groq",
+    "huggingface": "Hugging Face",
+}
+
+PROVIDER_KEYS = {
+    "gemini": "GOOGLE_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "huggingface": "HUGGINGFACE_API_KEY",
+}
+
+# Default routing policies per task type. Routes are "provider:model" and are
+# listed in order of preference; live stats may reorder them at call time.
+DEFAULT_POLICIES = {
+    "planning": {
+        "routes": ["groq:llama-3.3-70b-versatile", "gemini:gemini-2.5-flash-lite", "gemini:gemini-2.5-flash"],
+        "latency_budget": 8.0,
+        "temperature": 0.3,
+        "max_output_tokens": 1024,
+    },
+    "quick_report": {
+        "routes": ["gemini:gemini-2.5-flash-lite", "gemini:gemini-2.5-flash", "groq:llama-3.3-70b-versatile"],
+        "latency_budget": 20.0,
+        "temperature": 0.7,
+        "max_output_tokens": 4096,
+    },
+    "deep_report": {
+        "routes": ["gemini:gemini-2.5-flash", "groq:llama-3.3-70b-versatile"],
+        "latency_budget": 60.0,
+        "temperature": 0.7,
+        "max_output_tokens": 8192,
+    },
+    "qa": {
+        "routes": ["groq:llama-3.3-70b-versatile", "gemini:gemini-2.5-flash-lite", "gemini:gemini-2.5-flash"],
+        "latency_budget": 10.0,
+        "temperature": 0.5,
+        "max_output_tokens": 2048,
+    },
+    "summary": {
+        "routes": ["groq:llama-3.3-70b-versatile", "gemini:gemini-2.5-flash-lite", "gemini:gemini-2.5-flash"],
+        "latency_budget": 10.0,
+        "temperature": 0.3,
+        "max_output_tokens": 1024,
+    },
+    "document_analysis": {
+        "routes": ["gemini:gemini-2.5-flash"],
+        "latency_budget": 90.0,
+        "temperature": 0.7,
+        "max_output_tokens": 8192,
+    },
+    "general": {
+        "routes": ["gemini:gemini-2.5-flash", "groq:llama-3.3-70b-versatile", "huggingface:meta-llama/Meta-Llama-3-8B-Instruct"],
+        "latency_budget": 30.0,
+        "temperature": 0.7,
+        "max_output_tokens": 4096,
+    },
+}
+
+# Upper bound for a single provider call; the request deadline may shorten it
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+
+# Only Gemini accepts inline file data (used by document analysis)
+INLINE_DATA_PROVIDERS = {"gemini"}
+
+# Smoothing factor for the latency / error moving averages
+EWMA_ALPHA = 0.3
+# A route whose smoothed error rate exceeds this is tried last
+ERROR_RATE_THRESHOLD = 0.5
+# Minimum number of calls before live stats influence routing
+MIN_SAMPLES = 3
+# Unhealthy routes are demoted only for this long after their last failure,
+# so they get probed again once the provider recovers
+ROUTE_COOLDOWN_SECONDS = 60
+
+
+class RouteStats:
+    """Live latency, error and token counters for a single route"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.last_error_at: Optional[float] = None
+
+    def record(self, latency: float, ok: bool, prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+            self.last_error_at = time.monotonic()
+        if ok:
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+        self.ewma_error_rate = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * self.ewma_error_rate
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    @property
+    def unhealthy(self) -> bool:
+        if self.calls < MIN_SAMPLES or self.ewma_error_rate <= ERROR_RATE_THRESHOLD:
+            return False
+        return self.last_error_at is not None and time.monotonic() - self.last_error_at < ROUTE_COOLDOWN_SECONDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 3),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class LLMRouter:
+    """Picks a provider/model per task from configured policies and live stats"""
+
+    def __init__(self, policies: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.name = "LLM Router"
+        self.policies = {task: dict(policy) for task, policy in DEFAULT_POLICIES.items()}
+        self._apply_overrides(policies or self._load_env_overrides())
+        self._stats: Dict[str, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def _load_env_overrides(self) -> Dict[str, Any]:
+        """Read policy overrides from LLM_ROUTES, e.g. {"qa": {"routes": ["gemini:gemini-2.5-flash"]}}"""
+        raw = os.getenv("LLM_ROUTES")
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except Exception as e:
+            logger.warning(f"[{self.name}] Ignoring invalid LLM_ROUTES: {e}")
+            return {}
+
+    def _apply_overrides(self, overrides: Dict[str, Any]):
+        for task, override in overrides.items():
+            # A bare list is shorthand for {"routes": [...]}
+            if isinstance(override, list):
+                override = {"routes": override}
+            policy = self.policies.setdefault(task, dict(DEFAULT_POLICIES["general"]))
+            policy.update(override)
+
+    def _route_stats(self, route: str) -> RouteStats:
+        with self._lock:
+            if route not in self._stats:
+                self._stats[route] = RouteStats()
+            return self._stats[route]
+
+    def candidate_routes(self, task: str, inline_data: bool = False) -> List[str]:
+        """Return the usable routes for a task, best first"""
+        policy = self.policies.get(task) or self.policies["general"]
+        budget = policy.get("latency_budget")
+
+        candidates = []
+        for index, route in enumerate(policy["routes"]):
+            provider = route.split(":", 1)[0]
+            if not os.getenv(PROVIDER_KEYS.get(provider, "")):
+                continue
+            if inline_data and provider not in INLINE_DATA_PROVIDERS:
+                continue
+            stats = self._route_stats(route)
+            over_budget = (
+                budget is not None
+                and stats.calls >= MIN_SAMPLES
+                and stats.ewma_latency is not None
+                and stats.ewma_latency > budget
+            )
+            # Healthy routes within the latency budget keep their configured order
+            candidates.append(((stats.unhealthy, over_budget, index), route))
+
+        candidates.sort(key=lambda item: item[0])
+        return [route for _, route in candidates]
+
+    def generate(
+        self,
+        task: str,
+        prompt: str,
+        system_instruction: Optional[str] = None,
+        json_mode: bool = False,
+        max_output_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        inline_data: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Generate content for a task, falling back through the ranked routes"""
+        policy = self.policies.get(task) or self.policies["general"]
+        routes = self.candidate_routes(task, inline_data=inline_data is not None)
+        if not routes:
+            raise Exception(f"No LLM provider configured for task '{task}'")
+
+        max_output_tokens = max_output_tokens or policy.get("max_output_tokens", 4096)
+        temperature = policy.get("temperature", 0.7) if temperature is None else temperature
+
+        last_error = None
+        for route in routes:
+            provider, model = route.split(":", 1)
+            stats = self._route_stats(route)
+            start = time.monotonic()
+            try:
+                content, prompt_tokens, completion_tokens = self._call_provider(
+                    provider, model, prompt, system_instruction, json_mode,
+                    max_output_tokens, temperature, inline_data
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                # Running out of request time is not the route's fault; don't record it or fall back
+                deadline = current_deadline.get()
+                if deadline is not None and (deadline.cancelled or deadline.remaining() <= 0):
+                    raise DeadlineExceeded(f"Request deadline exceeded during task '{task}'")
+                latency = time.monotonic() - start
+                with self._lock:
+                    stats.record(latency, ok=False)
+                last_error = e
+                logger.warning(f"[{self.name}] task={task} route={route} failed after {latency:.2f}s: {str(e)}")
+                continue
+
+            latency = time.monotonic() - start
+            with self._lock:
+                stats.record(latency, ok=True, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            logger.info(
+                f"[{self.name}] task={task} route={route} latency={latency:.2f}s "
+                f"prompt_tokens={prompt_tokens} completion_tokens={completion_tokens}"
+            )
+            return {
+                "content": content,
+                "provider": PROVIDER_NAMES.get(provider, provider),
+                "model": model,
+                "latency": latency,
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+            }
+
+        raise Exception(f"All LLM routes failed for task '{task}'. Last error: {str(last_error)}")
+
+    async def agenerate(self, task: str, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Async wrapper that keeps the blocking HTTP call off the event loop"""
+        return await asyncio.to_thread(self.generate, task, prompt, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {route: stats.to_dict() for route, stats in self._stats.items()}
+
+    def _call_provider(
+        self,
+        provider: str,
+        model: str,
+        prompt: str,
+        system_instruction: Optional[str],
+        json_mode: bool,
+        max_output_tokens: int,
+        temperature: float,
+        inline_data: Optional[Dict[str, str]],
+    ):
+        """Call a single provider and return (content, prompt_tokens, completion_tokens)"""
+        if provider == "gemini":
+            return self._call_gemini(model, prompt, system_instruction, json_mode, max_output_tokens, temperature, inline_data)
+        if provider == "groq":
+            return self._call_groq(model, prompt, system_instruction, json_mode, max_output_tokens, temperature)
+        if provider == "huggingface":
+            return self._call_huggingface(model, prompt, system_instruction, json_mode, max_output_tokens, temperature)
+        raise Exception(f"Unknown LLM provider: {provider}")
+
+    def _call_gemini(self, model, prompt, system_instruction, json_mode, max_output_tokens, temperature, inline_data):
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={os.getenv('GOOGLE_API_KEY')}"
+
+        parts = []
+        if inline_data:
+            parts.append({"inlineData": inline_data})
+        parts.append({"text": prompt})
+
+        payload = {
+            "contents": [{"parts": parts}],
+            "generationConfig": {
+                "temperature": temperature,
+                "maxOutputTokens": max_output_tokens
+            }
+        }
+        if system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        if json_mode:
+            payload["generationConfig"]["responseMimeType"] = "application/json"
+
+        response = requests.post(url, json=payload, timeout=upstream_timeout(LLM_REQUEST_TIMEOUT))
+        response.raise_for_status()
+        result = response.json()
+        content = result["candidates"][0]["content"]["parts"][0]["text"]
+        usage = result.get("usageMetadata", {})
+        return (
+            content,
+            usage.get("promptTokenCount", estimate_tokens(prompt)),
+            usage.get("candidatesTokenCount", estimate_tokens(content)),
+        )
+
+    def _call_groq(self, model, prompt, system_instruction, json_mode, max_output_tokens, temperature):
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_instruction or "You are a helpful research assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_output_tokens
+        }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+
+        response = requests.post(
+            "https://api.groq.com/openai/v1/chat/completions",
+            json=payload,
+            timeout=upstream_timeout(LLM_REQUEST_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}",
+                "Content-Type": "application/json"
+            }
+        )
+        response.raise_for_status()
+        result = response.json()
+        content = result["choices"][0]["message"]["content"]
+        usage = result.get("usage", {})
+        return (
+            content,
+            usage.get("prompt_tokens", estimate_tokens(prompt)),
+            usage.get("completion_tokens", estimate_tokens(content)),
+        )
+
+    def _call_huggingface(self, model, prompt, system_instruction, json_mode, max_output_tokens, temperature):
+        system = system_instruction or "You are a helpful assistant."
+        if json_mode:
+            system += " Output strict JSON only."
+        payload = {
+            "inputs": f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n{system}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n",
+            "parameters": {
+                "max_new_tokens": max_output_tokens,
+                "return_full_text": False,
+                "temperature": temperature
+            }
+        }
+
+        response = requests.post(
+            f"https://api-inference.huggingface.co/models/{model}",
+            json=payload,
+            timeout=upstream_timeout(LLM_REQUEST_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}",
+                "Content-Type": "application/json"
+            }
+        )
+        response.raise_for_status()
+        result = response.json()
+        content = result[0]["generated_text"] if isinstance(result, list) else result.get("generated_text", "")
+        # The inference API does not report usage, so estimate it
+        return content, estimate_tokens(payload["inputs"]), estimate_tokens(content)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) when a provider omits usage"""
+    return max(1, len(text or "") // 4)
+
+
+# Shared router used by every agent and the /api/llm/generate endpoint
+llm_router = LLMRouter()
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from typing import Any, Dict, Optional
+
+from backend.utils import logger
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+# How often the event loop is probed for lag, in seconds
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+# A loop blocked longer than this has its stack captured
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+# Lag samples kept for percentiles (10 minutes at the default interval)
+LAG_SAMPLES = 6000
+# Blocking events kept for inspection
+MAX_BLOCK_EVENTS = 50
+# Frames kept per captured stack
+STACK_DEPTH = 30
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Task -> "METHOD /path" of the request it serves; inherited by tasks it creates
+_task_endpoints: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+
+def _task_factory(loop, coro, **kwargs):
+    """Create tasks as usual, carrying over the endpoint label of the creating task"""
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    parent = asyncio.current_task(loop)
+    if parent is not None:
+        endpoint = _task_endpoints.get(parent)
+        if endpoint is not None:
+            _task_endpoints[task] = endpoint
+    return task
+
+
+def _agent_for_frame(frame) -> Optional[str]:
+    """Innermost agent on a stack, found through the `self` of agent methods"""
+    from backend.agents.base_agent import BaseAgent
+
+    while frame is not None:
+        candidate = frame.f_locals.get("self")
+        if isinstance(candidate, BaseAgent):
+            return candidate.name
+        frame = frame.f_back
+    return None
+
+
+class LoopMonitor:
+    """Measures event-loop lag and captures the stack whenever the loop is blocked.
+
+    A heartbeat coroutine records how late each tick runs. A watchdog thread
+    notices when the heartbeat stops and snapshots the loop thread's stack
+    while the blocking code is still on it, labelled with the endpoint and
+    agent that were running.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD):
+        self.name = "Loop Monitor"
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._captured_beat = 0.0
+        self._lags: "deque[float]" = deque(maxlen=LAG_SAMPLES)
+        self._buckets = [0] * (len(LAG_BUCKETS) + 1)
+        self._max_lag = 0.0
+        self._lag_sum = 0.0
+        self._lag_count = 0
+        self._events: "deque[Dict[str, Any]]" = deque(maxlen=MAX_BLOCK_EVENTS)
+        self._blocked_total = 0
+        self._lock = threading.Lock()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start monitoring the running loop (call from the loop thread)"""
+        if not LOOP_MONITOR_ENABLED or self._heartbeat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self._loop.get_task_factory() is None:
+            self._loop.set_task_factory(_task_factory)
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True).start()
+        logger.info(f"[{self.name}] Monitoring event loop (interval {self.interval}s, threshold {self.threshold}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    def label_current_task(self, endpoint: str):
+        """Attribute the current task (and the tasks it spawns) to an endpoint"""
+        task = asyncio.current_task()
+        if task is not None:
+            _task_endpoints[task] = endpoint
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            self._record_lag(max(0.0, now - expected))
+
+    def _record_lag(self, lag: float):
+        with self._lock:
+            self._lags.append(lag)
+            self._lag_sum += lag
+            self._lag_count += 1
+            self._max_lag = max(self._max_lag, lag)
+            for index, bound in enumerate(LAG_BUCKETS):
+                if lag <= bound:
+                    self._buckets[index] += 1
+                    break
+            else:
+                self._buckets[-1] += 1
+            # Close out a captured stall with its final duration
+            if self._events and self._events[-1]["open"]:
+                self._events[-1]["blocked_seconds"] = round(lag + self.interval, 3)
+                self._events[-1]["open"] = False
+
+    def _watchdog(self):
+        while not self._stop.wait(self.interval / 2):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for < self.threshold or last_beat == self._captured_beat:
+                continue
+            self._captured_beat = last_beat
+            try:
+                self._capture(blocked_for)
+            except Exception as e:
+                logger.debug(f"[{self.name}] Failed to capture blocked stack: {e}")
+
+    def _capture(self, blocked_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        task = asyncio.current_task(self._loop)
+        endpoint = _task_endpoints.get(task) if task is not None else None
+        agent = _agent_for_frame(frame)
+        stack = traceback.format_stack(frame, limit=STACK_DEPTH)
+
+        event = {
+            "at": time.time(),
+            "blocked_seconds": round(blocked_for, 3),
+            "open": True,
+            "endpoint": endpoint,
+            "agent": agent,
+            "task": task.get_name() if task is not None else None,
+            "stack": "".join(stack),
+        }
+        with self._lock:
+            self._events.append(event)
+            self._blocked_total += 1
+
+        location = stack[-1].strip().splitlines()[0] if stack else "unknown"
+        logger.warning(
+            f"[{self.name}] Event loop blocked for {blocked_for:.2f}s+ "
+            f"(endpoint: {endpoint or 'n/a'}, agent: {agent or 'n/a'}) at {location}"
+        )
+
+    def stats(self, include_stacks: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            lags = sorted(self._lags)
+            buckets = list(self._buckets)
+            events = [dict(event) for event in self._events]
+            count = self._lag_count
+
+        def percentile(p: float) -> float:
+            if not lags:
+                return 0.0
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))], 4)
+
+        cumulative = 0
+        histogram = {}
+        for bound, bucket in zip(list(LAG_BUCKETS) + ["+Inf"], buckets):
+            cumulative += bucket
+            histogram[str(bound)] = cumulative
+
+        if not include_stacks:
+            for event in events:
+                event.pop("stack", None)
+        return {
+            "enabled": self._heartbeat_task is not None,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag_seconds": {
+                "current": round(self._lags[-1], 4) if self._lags else 0.0,
+                "mean": round(self._lag_sum / count, 4) if count else 0.0,
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": round(self._max_lag, 4),
+            },
+            "lag_histogram": histogram,
+            "samples": count,
+            "blocked_events_total": self._blocked_total,
+            "blocked_events": events,
+        }
+
+
+# Single monitor for the server's event loop
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """Labels each request's task with its endpoint so stalls can be attributed"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            loop_monitor.label_current_task(f"{scope['method']} {scope['path']}")
+        await self.app(scope, receive, send)
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.cache import Cache
+from backend.embeddings import cosine_similarity, embed
+from backend.llm_router import llm_router
+from backend.semantic_cache import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_TTL, context_fingerprint
+from backend.utils import logger
+
+FOLLOWUP_PRECOMPUTE_ENABLED = os.getenv("FOLLOWUP_PRECOMPUTE_ENABLED", "false").lower() == "true"
+# Follow-up questions pre-answered per delivered report
+PRECOMPUTE_QUESTIONS = int(os.getenv("PRECOMPUTE_QUESTIONS", "4"))
+# Precomputation stops once nobody has touched the report for this many seconds
+PRECOMPUTE_IDLE_SECONDS = float(os.getenv("PRECOMPUTE_IDLE_SECONDS", "90"))
+# Precompute runs allowed per user per day
+PRECOMPUTE_DAILY_BUDGET = int(os.getenv("PRECOMPUTE_DAILY_BUDGET", "10"))
+# Contexts are split into chunks of about this many characters for retrieval
+CHUNK_CHARS = 1200
+# Contexts shorter than this are always sent whole
+RETRIEVAL_MIN_CHARS = int(os.getenv("RETRIEVAL_MIN_CHARS", "8000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+
+# context fingerprint -> {"chunks": [...], "vectors": [...]}
+context_index = Cache("context-index", default_ttl=SEMANTIC_CACHE_TTL)
+_budgets = Cache("precompute-budget", default_ttl=2 * 24 * 3600)
+
+
+class SessionIdle(Exception):
+    """Raised when a report goes idle while follow-ups are being prepared for it"""
+    pass
+
+
+def chunk_context(context: str, size: int = CHUNK_CHARS) -> List[str]:
+    """Pack paragraphs into chunks of roughly `size` characters (long paragraphs are split)"""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", context):
+        paragraph = paragraph.strip()
+        while len(paragraph) > size:
+            cut = paragraph.rfind(" ", 0, size)
+            cut = cut if cut > size // 2 else size
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def build_context_index(context: str) -> bool:
+    """Chunk and embed a context so questions about it can be answered from the relevant parts"""
+    fingerprint = context_fingerprint(context)
+    if await context_index.aget(fingerprint) is not None:
+        return True
+    chunks = chunk_context(context)
+    vectors = await embed(chunks)
+    if vectors is None:
+        return False
+    await context_index.aset(fingerprint, {"chunks": chunks, "vectors": vectors})
+    return True
+
+
+async def retrieve_context(context: str, question: str, top_k: int = RETRIEVAL_TOP_K) -> Optional[str]:
+    """The chunks of an indexed context most relevant to a question, in document order.
+
+    None when the context is short or has not been indexed, in which case
+    the whole context should be used.
+    """
+    if len(context) < RETRIEVAL_MIN_CHARS:
+        return None
+    index = await context_index.aget(context_fingerprint(context))
+    if index is None:
+        return None
+    vectors = await embed([question])
+    if vectors is None:
+        return None
+    scored = sorted(
+        range(len(index["chunks"])),
+        key=lambda i: cosine_similarity(vectors[0], index["vectors"][i]),
+        reverse=True
+    )
+    return "\n\n".join(index["chunks"][i] for i in sorted(scored[:top_k]))
+
+
+class FollowUpPrecomputer:
+    """Prepares a delivered report for follow-up questions while the user reads it.
+
+    The context is chunked and indexed, and a few likely follow-up
+    questions are generated and answered through the AI Assistant. Their
+    answers land in the semantic cache, so a matching first question is
+    answered without an LLM call. Each user has one run at a time; a new
+    report replaces it. A run is cancelled once the report has been idle
+    for PRECOMPUTE_IDLE_SECONDS, and runs are capped per user per day.
+    """
+
+    def __init__(self):
+        self.name = "Follow-up Precompute"
+        # user id -> {"task", "fingerprint", "last_active"}
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"started": 0, "completed": 0, "cancelled_idle": 0, "superseded": 0, "over_budget": 0, "answers": 0}
+
+    async def schedule(self, user_id: Optional[str], context: str):
+        """Start precomputing for a report just delivered to a user"""
+        if not (FOLLOWUP_PRECOMPUTE_ENABLED and SEMANTIC_CACHE_ENABLED and user_id and context):
+            return
+        previous = self._runs.pop(user_id, None)
+        if previous is not None and not previous["task"].done():
+            previous["task"].cancel()
+            self._stats["superseded"] += 1
+
+        budget_key = f"{user_id}:{datetime.utcnow().date().isoformat()}"
+        used = await _budgets.aincr(budget_key)
+        if used is None or used > PRECOMPUTE_DAILY_BUDGET:
+            self._stats["over_budget"] += 1
+            logger.info(f"[{self.name}] Daily budget used up for {user_id}")
+            return
+
+        run = {"fingerprint": context_fingerprint(context), "last_active": time.monotonic()}
+        run["task"] = asyncio.create_task(self._run(user_id, context, run))
+        self._runs[user_id] = run
+        self._stats["started"] += 1
+
+    def touch(self, context: str):
+        """Record activity on a report (e.g. a question about it), keeping its run alive"""
+        fingerprint = context_fingerprint(context)
+        for run in self._runs.values():
+            if run["fingerprint"] == fingerprint:
+                run["last_active"] = time.monotonic()
+
+    async def _step(self, run: Dict[str, Any], awaitable):
+        """Await one stage, cancelling it if the report goes idle meanwhile"""
+        task = asyncio.ensure_future(awaitable)
+        while True:
+            remaining = run["last_active"] + PRECOMPUTE_IDLE_SECONDS - time.monotonic()
+            if remaining <= 0:
+                task.cancel()
+                raise SessionIdle()
+            try:
+                done, _ = await asyncio.wait({task}, timeout=remaining)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            if done:
+                return task.result()
+
+    async def _run(self, user_id: str, context: str, run: Dict[str, Any]):
+        # Imported here: the assistant imports this module for retrieval
+        from backend.agents.ai_assistant_agent import AIAssistantAgent
+
+        start = time.perf_counter()
+        try:
+            await self._step(run, build_context_index(context))
+            questions = await self._step(run, self._generate_questions(context))
+            assistant = AIAssistantAgent()
+            for question in questions:
+                # The assistant stores its answer in the semantic cache
+                await self._step(run, assistant.execute({"question": question, "context": context, "conversation": "", "answer": ""}))
+                self._stats["answers"] += 1
+            self._stats["completed"] += 1
+            logger.info(f"[{self.name}] Prepared {len(questions)} follow-ups for {user_id} in {time.perf_counter() - start:.1f}s")
+        except SessionIdle:
+            self._stats["cancelled_idle"] += 1
+            logger.info(f"[{self.name}] Stopped for {user_id}: report idle")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"[{self.name}] Failed for {user_id}: {e}")
+        finally:
+            if self._runs.get(user_id) is run:
+                self._runs.pop(user_id, None)
+
+    async def _generate_questions(self, context: str) -> List[str]:
+        excerpt = context[:RETRIEVAL_MIN_CHARS]
+        prompt = f"""Here is a research report a user has just read:
+
+{excerpt}
+
+Predict the {PRECOMPUTE_QUESTIONS} follow-up questions the user is most likely to ask about it next. Return JSON of the form {{"questions": ["..."]}}. Keep each question short and self-contained."""
+        result = await llm_router.agenerate("planning", prompt, json_mode=True)
+        content = re.sub(r"^```[a-zA-Z]*\n|\n```$", "", result["content"].strip())
+        questions = json.loads(content).get("questions", [])
+        return [question.strip() for question in questions if isinstance(question, str) and question.strip()][:PRECOMPUTE_QUESTIONS]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": FOLLOWUP_PRECOMPUTE_ENABLED,
+            "running": len(self._runs),
+            "questions_per_report": PRECOMPUTE_QUESTIONS,
+            "idle_seconds": PRECOMPUTE_IDLE_SECONDS,
+            "daily_budget": PRECOMPUTE_DAILY_BUDGET,
+            **self._stats,
+        }
+
+
+follow_up_precomputer = FollowUpPrecomputer()
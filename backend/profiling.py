@@ -0,0 +1,334 @@
+import asyncio
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+
+from backend.auth import require_admin
+from backend.utils import logger
+
+# Sampling profiler interval in seconds
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Upper bound on a single CPU profile
+MAX_PROFILE_SECONDS = 300
+# Frames recorded per allocation while tracemalloc is on
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+# Finished profiles and memory snapshots kept for download
+MAX_RESULTS = 10
+TOP_STATS = 30
+
+_THREAD_NAME = "cpu-sampler"
+# Path segment of the profiling routes, which are never queued or measured
+PROFILE_ROUTE_MARKER = "/admin/profile/"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """On-demand CPU and memory profiling for a live worker.
+
+    Nothing is hooked while no profile is running: the request middleware
+    only checks two flags.
+    """
+
+    def __init__(self):
+        self.name = "Profiler"
+        self._lock = threading.Lock()
+        self._cpu: Optional[Dict[str, Any]] = None
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._endpoint_peaks: Dict[str, Dict[str, float]] = {}
+
+    # --- CPU ---
+
+    @property
+    def cpu_active(self) -> bool:
+        return self._cpu is not None
+
+    def start_cpu(self, mode: str, seconds: float, requests: int) -> str:
+        """Start a CPU profile that ends after `seconds` or `requests` completed requests"""
+        with self._lock:
+            if self._cpu is not None:
+                raise HTTPException(status_code=409, detail="A CPU profile is already running")
+            profile_id = uuid.uuid4().hex[:12]
+            self._cpu = {
+                "id": profile_id,
+                "mode": mode,
+                "deadline": time.monotonic() + min(seconds, MAX_PROFILE_SECONDS),
+                "requests_left": requests or None,
+                "done": threading.Event(),
+                "started_at": time.time(),
+            }
+            self._results[profile_id] = {"status": "running", "mode": mode}
+            self._trim(self._results)
+
+        if mode == "sampling":
+            threading.Thread(target=self._sample, args=(self._cpu,), name=_THREAD_NAME, daemon=True).start()
+        else:
+            asyncio.get_running_loop().create_task(self._run_cprofile(self._cpu))
+        logger.info(f"[{self.name}] Started {mode} CPU profile {profile_id}")
+        return profile_id
+
+    def _finished(self, session: Dict[str, Any]) -> bool:
+        return session["done"].is_set() or time.monotonic() >= session["deadline"]
+
+    def _sample(self, session: Dict[str, Any]):
+        """Sample every thread's stack and aggregate them as collapsed stacks"""
+        stacks: Counter = Counter()
+        samples = 0
+        me = threading.get_ident()
+        while not self._finished(session):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(PROFILE_SAMPLE_INTERVAL)
+
+        body = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        self._finish(session, body.encode("utf-8"), "text/plain; charset=utf-8", "collapsed", samples)
+
+    async def _run_cprofile(self, session: Dict[str, Any]):
+        """Deterministic profile of the event-loop thread"""
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            while not self._finished(session):
+                await asyncio.sleep(0.05)
+        finally:
+            profile.disable()
+        profile.create_stats()
+        self._finish(session, marshal.dumps(profile.stats), "application/octet-stream", "pstats", None)
+
+    def _finish(self, session: Dict[str, Any], body: bytes, media_type: str, extension: str, samples: Optional[int]):
+        with self._lock:
+            self._results[session["id"]] = {
+                "status": "done",
+                "mode": session["mode"],
+                "body": body,
+                "media_type": media_type,
+                "filename": f"cpu-{session['id']}.{extension}",
+                "duration": round(time.time() - session["started_at"], 2),
+                "samples": samples,
+            }
+            if self._cpu is session:
+                self._cpu = None
+        logger.info(f"[{self.name}] Finished {session['mode']} CPU profile {session['id']}")
+
+    def get_cpu_result(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self._results.get(profile_id)
+
+    # --- Memory ---
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """Start tracing if needed and take a tracemalloc snapshot"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            logger.info(f"[{self.name}] Started tracemalloc ({TRACEMALLOC_FRAMES} frames)")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        snapshot_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._snapshots[snapshot_id] = snapshot
+            self._trim(self._snapshots)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "snapshot_id": snapshot_id,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [self._format_stat(stat) for stat in snapshot.statistics("lineno")[:TOP_STATS]],
+        }
+
+    def diff_snapshots(self, base_id: str, target_id: str) -> Dict[str, Any]:
+        base = self._snapshots.get(base_id)
+        target = self._snapshots.get(target_id)
+        if base is None or target is None:
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        diff = target.compare_to(base, "lineno")
+        return {
+            "base": base_id,
+            "target": target_id,
+            "size_diff_bytes": sum(stat.size_diff for stat in diff),
+            "top": [
+                {
+                    "location": str(stat.traceback[0]),
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size_bytes": stat.size,
+                }
+                for stat in diff[:TOP_STATS]
+            ],
+        }
+
+    def stop_memory(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    @staticmethod
+    def _format_stat(stat) -> Dict[str, Any]:
+        return {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+
+    def endpoint_peaks(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracing": tracemalloc.is_tracing(),
+                "endpoints": {
+                    endpoint: {
+                        "requests": int(entry["requests"]),
+                        "max_peak_bytes": int(entry["max"]),
+                        "mean_peak_bytes": int(entry["total"] / entry["requests"]),
+                    }
+                    for endpoint, entry in sorted(self._endpoint_peaks.items(), key=lambda item: -item[1]["max"])
+                },
+            }
+
+    # --- Request hooks ---
+
+    def request_started(self) -> Optional[int]:
+        """Reset the traced peak and return the traced size the request starts from"""
+        if not tracemalloc.is_tracing():
+            return None
+        # The peak is process-wide; the middleware runs measured requests one at a time
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def request_finished(self, endpoint: str, baseline: Optional[int] = None):
+        if baseline is not None and tracemalloc.is_tracing():
+            peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+            with self._lock:
+                entry = self._endpoint_peaks.setdefault(endpoint, {"requests": 0, "max": 0, "total": 0})
+                entry["requests"] += 1
+                entry["max"] = max(entry["max"], peak)
+                entry["total"] += peak
+
+        session = self._cpu
+        if session is not None and session["requests_left"] is not None:
+            session["requests_left"] -= 1
+            if session["requests_left"] <= 0:
+                session["done"].set()
+
+    @staticmethod
+    def _trim(entries: OrderedDict):
+        while len(entries) > MAX_RESULTS:
+            entries.popitem(last=False)
+
+
+profiler = Profiler()
+
+
+_route_paths: Dict[Any, str] = {}
+
+
+def _endpoint_label(scope) -> str:
+    """"METHOD /route/{template}" for a request, so path parameters do not split the figures"""
+    endpoint = scope.get("endpoint")
+    if endpoint is not None and endpoint not in _route_paths:
+        # Routes included with a prefix only expose their own path on the scope
+        for route in getattr(scope.get("app"), "routes", []):
+            if getattr(route, "endpoint", None) is not None:
+                _route_paths.setdefault(route.endpoint, route.path)
+    return f"{scope['method']} {_route_paths.get(endpoint, scope['path'])}"
+
+
+class ProfilingMiddleware:
+    """Feeds request boundaries to the profiler; a no-op unless a profile is running.
+
+    While memory tracing is on, requests run one at a time so each traced peak
+    belongs to a single request. The profiling routes themselves bypass the
+    queue so tracing can always be stopped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._peak_lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (profiler.cpu_active or tracemalloc.is_tracing()):
+            await self.app(scope, receive, send)
+            return
+        if tracemalloc.is_tracing() and PROFILE_ROUTE_MARKER not in scope["path"]:
+            async with self._peak_lock:
+                await self._run(scope, receive, send, profiler.request_started())
+        else:
+            await self._run(scope, receive, send, None)
+
+    async def _run(self, scope, receive, send, baseline: Optional[int]):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.request_finished(_endpoint_label(scope), baseline)
+
+
+# Create router
+router = APIRouter(prefix="/admin/profile", tags=["Profiling"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/cpu")
+async def start_cpu_profile(mode: str = "sampling", seconds: float = 10, requests: int = 0):
+    """Start a CPU profile: "sampling" (all threads, collapsed stacks) or "cprofile" (event loop, pstats)"""
+    if mode not in ("sampling", "cprofile"):
+        raise HTTPException(status_code=400, detail="mode must be 'sampling' or 'cprofile'")
+    profile_id = profiler.start_cpu(mode, seconds, max(requests, 0))
+    return {"profile_id": profile_id, "mode": mode}
+
+
+@router.get("/cpu/{profile_id}")
+async def get_cpu_profile(profile_id: str):
+    """Download a finished CPU profile (202 while it is still running)"""
+    result = profiler.get_cpu_result(profile_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if result["status"] != "done":
+        return Response(status_code=202, content=b"", headers={"Retry-After": "1"})
+    return Response(
+        content=result["body"],
+        media_type=result["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{result["filename"]}"'}
+    )
+
+
+@router.post("/memory/snapshot")
+async def take_memory_snapshot():
+    """Take a tracemalloc snapshot (starts tracing on first use)"""
+    return await asyncio.to_thread(profiler.take_snapshot)
+
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(base: str, target: str):
+    """Allocation growth between two snapshots, largest first"""
+    return await asyncio.to_thread(profiler.diff_snapshots, base, target)
+
+
+@router.get("/memory/requests")
+async def get_request_peaks():
+    """Per-endpoint peak traced allocation while tracing is on"""
+    return profiler.endpoint_peaks()
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    """Stop tracemalloc and drop stored snapshots"""
+    profiler.stop_memory()
+    return {"tracing": False}
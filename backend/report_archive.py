@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.utils import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# In-memory fallback keeps at most this many reports (oldest dropped first)
+MAX_MEMORY_REPORTS = 200
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+def compress(data: bytes) -> Dict[str, Any]:
+    """Compress with zstd when available, gzip otherwise"""
+    if zstandard is not None:
+        return {"encoding": "zstd", "body": zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)}
+    return {"encoding": "gzip", "body": gzip.compress(data, compresslevel=GZIP_LEVEL)}
+
+
+def decompress(encoding: str, body: bytes) -> bytes:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise Exception("Report is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return gzip.decompress(body)
+
+
+class ReportArchive:
+    """Persists generated reports with their sources and context, compressed and content-addressed.
+
+    The report id is derived from the content hash, so archiving the same
+    report twice stores it once and the hash doubles as a strong ETag.
+    Reports live in MongoDB when a collection is available and in process
+    memory otherwise.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self._memory: Dict[str, Dict[str, Any]] = {}
+
+    def save(self, topic: str, is_deep: bool, state: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, str]:
+        """Archive a finished research state and return {"report_id", "hash"}"""
+        payload = {
+            "topic": topic,
+            "is_deep": is_deep,
+            "report": state.get("report", ""),
+            "sources": state.get("sources", []),
+            "images": state.get("images", []),
+            "context": state.get("context", ""),
+        }
+        data = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        report_id = content_hash[:24]
+        compressed = compress(data)
+
+        now = datetime.utcnow()
+        doc = {
+            "reportId": report_id,
+            "hash": content_hash,
+            "topic": topic,
+            "is_deep": is_deep,
+            "encoding": compressed["encoding"],
+            "body": compressed["body"],
+            "size": len(data),
+            "compressedSize": len(compressed["body"]),
+            "createdAt": now,
+        }
+
+        if self.collection is not None:
+            try:
+                update = {"$setOnInsert": doc}
+                if user_id:
+                    update["$addToSet"] = {"userIds": user_id}
+                self.collection.update_one({"reportId": report_id}, update, upsert=True)
+                logger.info(f"Archived report {report_id} ({len(data)} -> {len(compressed['body'])} bytes, {compressed['encoding']})")
+                return {"report_id": report_id, "hash": content_hash}
+            except Exception as e:
+                logger.warning(f"Failed to archive report for '{topic}': {e}")
+
+        existing = self._memory.pop(report_id, None)
+        doc["userIds"] = (existing or {}).get("userIds", [])
+        if user_id and user_id not in doc["userIds"]:
+            doc["userIds"].append(user_id)
+        self._memory[report_id] = doc
+        while len(self._memory) > MAX_MEMORY_REPORTS:
+            self._memory.pop(next(iter(self._memory)))
+        return {"report_id": report_id, "hash": content_hash}
+
+    def link_user(self, report_id: str, user_id: str):
+        """Add an already archived report to a user's archive (e.g. when served from the result cache)"""
+        if self.collection is not None:
+            try:
+                self.collection.update_one({"reportId": report_id}, {"$addToSet": {"userIds": user_id}})
+                return
+            except Exception as e:
+                logger.warning(f"Failed to link report {report_id} to {user_id}: {e}")
+        doc = self._memory.get(report_id)
+        if doc is not None and user_id not in doc["userIds"]:
+            doc["userIds"].append(user_id)
+
+    def get_meta(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Report metadata without the body (enough to answer a conditional request)"""
+        if self.collection is not None:
+            try:
+                return self.collection.find_one({"reportId": report_id}, {"_id": 0, "body": 0})
+            except Exception as e:
+                logger.warning(f"Failed to load report metadata {report_id}: {e}")
+        doc = self._memory.get(report_id)
+        if doc is None:
+            return None
+        return {key: value for key, value in doc.items() if key != "body"}
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Decompressed report payload plus metadata"""
+        doc = None
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({"reportId": report_id}, {"_id": 0})
+            except Exception as e:
+                logger.warning(f"Failed to load report {report_id}: {e}")
+        if doc is None:
+            doc = self._memory.get(report_id)
+        if doc is None:
+            return None
+
+        payload = json.loads(decompress(doc["encoding"], bytes(doc["body"])))
+        payload["report_id"] = doc["reportId"]
+        payload["hash"] = doc["hash"]
+        payload["created_at"] = doc["createdAt"]
+        return payload
+
+    def list_for_user(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent archived reports for a user (metadata only)"""
+        projection = {"_id": 0, "reportId": 1, "topic": 1, "is_deep": 1, "createdAt": 1, "size": 1}
+        if self.collection is not None:
+            try:
+                cursor = self.collection.find({"userIds": user_id}, projection).sort("createdAt", -1).limit(limit)
+                return list(cursor)
+            except Exception as e:
+                logger.warning(f"Failed to list reports for {user_id}: {e}")
+        docs = [doc for doc in reversed(list(self._memory.values())) if user_id in doc.get("userIds", [])]
+        return [{key: doc[key] for key in projection if key in doc} for doc in docs[:limit]]
+
+    def iter_reports(self):
+        """Yield every archived report (decompressed), e.g. to rebuild the search index"""
+        if self.collection is not None:
+            docs = self.collection.find({}, {"_id": 0})
+        else:
+            docs = list(self._memory.values())
+        for doc in docs:
+            try:
+                payload = json.loads(decompress(doc["encoding"], bytes(doc["body"])))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable report {doc.get('reportId')}: {e}")
+                continue
+            yield {
+                "report_id": doc["reportId"],
+                "user_ids": doc.get("userIds", []),
+                "topic": payload.get("topic", ""),
+                "report": payload.get("report", ""),
+                "created_at": doc.get("createdAt"),
+            }
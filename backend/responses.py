@@ -0,0 +1,245 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional
+
+from starlette.concurrency import iterate_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Brotli quality 4-5 compresses better than gzip -6 at similar CPU cost
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Items encoded per chunk by streaming list responses
+STREAM_CHUNK_ITEMS = 100
+# NDJSON streams are flushed in chunks of roughly this many bytes
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+# Content types worth compressing (images and archives are already compressed)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+
+
+def _default(value: Any) -> Any:
+    """Fallback serializer for values orjson/json do not handle natively"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson; pydantic models are dumped directly"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def _stream_json_object(prefix: dict, key: str, items: Iterable[Any]) -> AsyncIterator[bytes]:
+    head = dumps(prefix)[:-1] if prefix else b"{"
+    separator = b"," if prefix else b""
+    yield head + separator + dumps(key) + b":["
+
+    def chunks() -> Iterator[bytes]:
+        first = True
+        batch = []
+        for item in items:
+            batch.append(dumps(item))
+            if len(batch) >= STREAM_CHUNK_ITEMS:
+                yield (b"" if first else b",") + b",".join(batch)
+                first = False
+                batch = []
+        if batch:
+            yield (b"" if first else b",") + b",".join(batch)
+
+    # Items may come from a blocking source such as a MongoDB cursor
+    async for chunk in iterate_in_threadpool(chunks()):
+        yield chunk
+    yield b"]}"
+
+
+def stream_json_list(key: str, items: Iterable[Any], prefix: Optional[dict] = None, headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream {**prefix, key: [items...]} without building the whole list or body in memory"""
+    return StreamingResponse(_stream_json_object(prefix or {}, key, items), media_type="application/json", headers=headers)
+
+
+def _ndjson_chunks(items: Iterable[Any], compress: bool) -> Iterator[bytes]:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    buffer = bytearray()
+    for item in items:
+        buffer += dumps(item)
+        buffer += b"\n"
+        if len(buffer) >= NDJSON_CHUNK_BYTES:
+            chunk = bytes(buffer)
+            buffer.clear()
+            if compressor is None:
+                yield chunk
+            else:
+                # A file download needs no per-chunk flush; emit whatever the compressor produced
+                compressed = compressor.compress(chunk)
+                if compressed:
+                    yield compressed
+    if compressor:
+        yield compressor.compress(bytes(buffer)) + compressor.flush(zlib.Z_FINISH)
+    elif buffer:
+        yield bytes(buffer)
+
+
+def stream_ndjson(items: Iterable[Any], compress: bool = False, filename: Optional[str] = None, headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream items as newline-delimited JSON, optionally as a .ndjson.gz file.
+
+    Items are pulled lazily in a worker thread (e.g. from a MongoDB cursor),
+    so memory stays bounded by one chunk however many rows are sent.
+    """
+    headers = dict(headers or {})
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    media_type = "application/gzip" if compress else "application/x-ndjson"
+    return StreamingResponse(iterate_in_threadpool(_ndjson_chunks(items, compress)), media_type=media_type, headers=headers)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits 31 produces a gzip container
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) if self.encoding == "br" else self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything buffered so far so streamed chunks reach the client promptly"""
+        return self._compressor.flush() if self.encoding == "br" else self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self.encoding == "br" else self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Negotiated brotli/gzip compression for responses above a size threshold.
+
+    Responses that already carry a Content-Encoding, are not a compressible
+    type, or have no body (204/304) pass through untouched. Streaming
+    responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body:
+                    # Whole body in one message: compress it in one go if it is big enough
+                    if len(body) < self.minimum_size:
+                        await send(start_message)
+                        await send(message)
+                        return
+                    body = compress_body(encoding, body)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                await send(start_message)
+
+            chunk = compressor.compress(body)
+            chunk += compressor.flush() if more_body else compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,142 @@
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from backend.utils import logger
+
+# SQLite file holding the full-text index of archived reports
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", os.path.join(".cache", "search.db"))
+# Relative BM25 weight of a match in the topic versus the report body
+TOPIC_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+SNIPPET_TOKENS = 24
+# FTS5 marks matches with control characters; the text is HTML-escaped before they become <mark> tags
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _to_html(text: str) -> str:
+    return html.escape(text or "").replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def build_match_query(user_id: str, query: str) -> Optional[str]:
+    """FTS5 query for all terms (prefix match on the last), narrowed to documents whose owner tokens match.
+
+    The owner clause only narrows the candidates: tokenizing splits ids, so
+    "user" also matches "user_abc". Callers must still filter on the exact owner.
+    """
+    terms = _TOKEN_RE.findall(query.lower())
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    match = f'{{topic body}}: ({" ".join(quoted)})'
+    # unicode61 splits on underscores and punctuation; an owner with no letters or digits has no tokens
+    if re.search(r"[^\W_]", user_id):
+        owner = user_id.replace('"', '""')
+        match = f'owner:"{owner}" AND {match}'
+    return match
+
+
+class ReportSearchIndex:
+    """BM25-ranked inverted index over users' archived reports (SQLite FTS5).
+
+    Each (user, report) pair is one document. The owner is an indexed column,
+    so a search intersects postings for the user and the query terms instead
+    of scanning the user's reports. Results are then restricted to the exact
+    owner through report_docs, since a token match is not an access check.
+    """
+
+    def __init__(self, path: str = SEARCH_DB_PATH):
+        self.name = "Search Index"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS report_fts USING fts5("
+                "owner, topic, body, report_id UNINDEXED, created_at UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_docs ("
+                "user_id TEXT NOT NULL, report_id TEXT NOT NULL, doc_rowid INTEGER NOT NULL, "
+                "PRIMARY KEY (user_id, report_id))"
+            )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS report_docs_rowid ON report_docs (doc_rowid)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, user_id: str, report_id: str, topic: str, report: str, created_at: Optional[datetime] = None):
+        """Index a report for a user; re-adding the same pair is a no-op"""
+        conn = self._connect()
+        with conn:
+            if conn.execute(
+                "SELECT 1 FROM report_docs WHERE user_id = ? AND report_id = ?", (user_id, report_id)
+            ).fetchone():
+                return
+            cursor = conn.execute(
+                "INSERT INTO report_fts (owner, topic, body, report_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, topic, report, report_id, (created_at or datetime.utcnow()).isoformat())
+            )
+            conn.execute(
+                "INSERT INTO report_docs (user_id, report_id, doc_rowid) VALUES (?, ?, ?)",
+                (user_id, report_id, cursor.lastrowid)
+            )
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM report_docs").fetchone()[0]
+
+    def search(self, user_id: str, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Ranked matches with an HTML-escaped topic and body snippet, matches wrapped in <mark>"""
+        start = time.perf_counter()
+        match = build_match_query(user_id, query)
+        if match is None:
+            return {"results": [], "took_ms": 0.0}
+
+        rows = self._connect().execute(
+            "SELECT report_fts.report_id, created_at, "
+            f"highlight(report_fts, 1, ?, ?), snippet(report_fts, 2, ?, ?, '…', {SNIPPET_TOKENS}), "
+            f"bm25(report_fts, 0.0, {TOPIC_WEIGHT}, {BODY_WEIGHT}) AS score "
+            "FROM report_fts JOIN report_docs ON report_docs.doc_rowid = report_fts.rowid "
+            "WHERE report_fts MATCH ? AND report_docs.user_id = ? ORDER BY score LIMIT ? OFFSET ?",
+            (_MARK_START, _MARK_END, _MARK_START, _MARK_END, match, user_id, limit, offset)
+        ).fetchall()
+
+        results = [
+            {
+                "report_id": report_id,
+                "created_at": created_at,
+                "topic": _to_html(topic),
+                "snippet": _to_html(snippet),
+                # FTS5 bm25() is lower-is-better; flip it so higher scores rank first
+                "score": round(-score, 6),
+            }
+            for report_id, created_at, topic, snippet, score in rows
+        ]
+        return {"results": results, "took_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    def backfill(self, reports):
+        """Index archived reports that are missing, e.g. on a fresh host"""
+        added = 0
+        for report in reports:
+            for user_id in report.get("user_ids", []):
+                self.add(user_id, report["report_id"], report["topic"], report["report"], report.get("created_at"))
+                added += 1
+        logger.info(f"[{self.name}] Backfilled {added} report entries")
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from backend.cache import Cache
+from backend.embeddings import cosine_similarity, embed
+from backend.utils import logger
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+# Minimum cosine similarity between questions for a cached answer to be reused
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Cached answers expire after this many seconds
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+# Maximum cached answers per research context (least recently used dropped first);
+# overall size is bounded by the shared cache backend
+SEMANTIC_CACHE_MAX_PER_CONTEXT = int(os.getenv("SEMANTIC_CACHE_MAX_PER_CONTEXT", "50"))
+# Stores hold a short lease per context in the shared cache; a lease left by a dead worker expires after this long
+WRITE_LOCK_SECONDS = 5
+
+
+def context_fingerprint(context: str) -> str:
+    """Stable key for a research context, insensitive to whitespace differences"""
+    return hashlib.sha256(" ".join(context.split()).encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """Reuses answers to questions that are near-identical to earlier ones about the same context"""
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: int = SEMANTIC_CACHE_TTL,
+                 max_per_context: int = SEMANTIC_CACHE_MAX_PER_CONTEXT):
+        self.name = "Semantic Cache"
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_context = max_per_context
+        # context fingerprint -> list of {"question", "vector", "answer", "created_at"}, oldest first
+        self.entries = Cache("qa", default_ttl=ttl)
+        # "used:{fingerprint}:{question hash}" -> last hit time, kept apart so a hit never rewrites the vectors;
+        # also holds the per-context write leases
+        self.meta = Cache("qa-meta", default_ttl=ttl)
+        # context fingerprint -> [lock, holders]
+        self._locks: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    async def lookup(self, context: str, question: str) -> Optional[str]:
+        """Return a cached answer for a similar question about the same context, if any"""
+        fingerprint = context_fingerprint(context)
+        entries = await self.entries.aget(fingerprint)
+        if not entries:
+            self._count(False)
+            return None
+
+        vectors = await embed([question])
+        if vectors is None:
+            return None
+        vector = vectors[0]
+
+        now = time.time()
+        entries = [entry for entry in entries if now - entry["created_at"] <= self.ttl]
+        best_index, best_score = None, self.threshold
+        for index, entry in enumerate(entries):
+            score = cosine_similarity(vector, entry["vector"])
+            if score >= best_score:
+                best_index, best_score = index, score
+
+        if best_index is None:
+            self._count(False)
+            return None
+
+        self._count(True)
+        entry = entries[best_index]
+        await self.meta.aset(self._used_key(fingerprint, entry["question"]), now)
+        logger.info(f"[{self.name}] Hit (similarity {best_score:.3f}) for question: {question}")
+        return entry["answer"]
+
+    async def store(self, context: str, question: str, answer: str):
+        vectors = await embed([question])
+        if vectors is None:
+            return
+
+        fingerprint = context_fingerprint(context)
+        async with self._context_lock(fingerprint):
+            now = time.time()
+            entries = await self.entries.aget(fingerprint) or []
+            entries = [entry for entry in entries if now - entry["created_at"] <= self.ttl and entry["question"] != question]
+            entries.append({
+                "question": question,
+                "vector": vectors[0],
+                "answer": answer,
+                "created_at": now,
+            })
+            if len(entries) > self.max_per_context:
+                entries = await self._evict(fingerprint, entries)
+            await self.entries.aset(fingerprint, entries)
+
+    async def _evict(self, fingerprint: str, entries: list) -> list:
+        """Keep the most recently used entries that fit the per-context limit"""
+        last_used = {}
+        for entry in entries:
+            used = await self.meta.aget(self._used_key(fingerprint, entry["question"]))
+            last_used[entry["question"]] = max(used or 0, entry["created_at"])
+        keep = set(sorted(last_used, key=last_used.get)[-self.max_per_context:])
+        for entry in entries:
+            if entry["question"] not in keep:
+                await self.meta.adelete(self._used_key(fingerprint, entry["question"]))
+        return [entry for entry in entries if entry["question"] in keep]
+
+    @staticmethod
+    def _used_key(fingerprint: str, question: str) -> str:
+        return f"used:{fingerprint}:{hashlib.sha256(question.encode('utf-8')).hexdigest()[:16]}"
+
+    @asynccontextmanager
+    async def _context_lock(self, fingerprint: str):
+        """Serialize read-modify-write of one context's entries, within this worker and across workers"""
+        entry = self._locks.setdefault(fingerprint, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                key = f"write:{fingerprint}"
+                give_up = time.monotonic() + WRITE_LOCK_SECONDS
+                acquired = await self.meta.aadd(key, True, ttl=WRITE_LOCK_SECONDS)
+                # By the time we give up, a lease held by a dead worker has expired anyway
+                while not acquired and time.monotonic() < give_up:
+                    await asyncio.sleep(0.05)
+                    acquired = await self.meta.aadd(key, True, ttl=WRITE_LOCK_SECONDS)
+                try:
+                    yield
+                finally:
+                    if acquired:
+                        await self.meta.adelete(key)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._locks.pop(fingerprint, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats = {
+                "enabled": SEMANTIC_CACHE_ENABLED,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "max_per_context": self.max_per_context,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+        storage = self.entries.stats()
+        stats["contexts"] = storage.get("entries")
+        stats["bytes"] = storage.get("bytes")
+        return stats
+
+
+# Shared cache used by the AI Assistant agent
+semantic_cache = SemanticAnswerCache()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
@@ -7,115 +7,85 @@ import logging
 import asyncio
 from dotenv import load_dotenv
 from datetime import datetime
-from pymongo import MongoClient
+import threading
 import time
-import urllib.parse
-from starlette.middleware.sessions import SessionMiddleware
+import hashlib
+import secrets
+from bson import ObjectId
 from starlette.requests import Request
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse
 
 # Load environment variables from .env file
 load_dotenv()
 
+from backend.checkpoints import create_checkpoint_store
+from backend.database import database
+from backend.responses import CompressionMiddleware, FastJSONResponse, stream_json_list, stream_ndjson
+from backend.loop_monitor import LoopMonitorMiddleware, loop_monitor
+from backend.profiling import ProfilingMiddleware
+from backend.sessions import ServerSessionMiddleware, create_session_store
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection with retry logic
-MONGODB_URI = os.getenv("MONGODB_URI")
-mongo_client = None
-db = None
-users_collection = None
-activity_collection = None
 
-if MONGODB_URI:
-    max_retries = 3
-    retry_delay = 5
-    
-    # Handle both SRV and standard URI formats
-    encoded_uri = MONGODB_URI  # Use as-is for multi-host URIs
-    
-    # Only parse and encode if it's a simple URI (not multi-host)
-    if "," not in MONGODB_URI and "@" in MONGODB_URI:
-        try:
-            parsed_uri = urllib.parse.urlparse(MONGODB_URI)
-            username = parsed_uri.username
-            password = parsed_uri.password
-            
-            # Reconstruct URI with encoded credentials
-            if username and password:
-                encoded_username = urllib.parse.quote_plus(username)
-                encoded_password = urllib.parse.quote_plus(password)
-                new_netloc = f"{encoded_username}:{encoded_password}@{parsed_uri.hostname}"
-                if parsed_uri.port:
-                    new_netloc += f":{parsed_uri.port}"
-                encoded_uri = urllib.parse.urlunparse((
-                    parsed_uri.scheme,
-                    new_netloc,
-                    parsed_uri.path,
-                    parsed_uri.params,
-                    parsed_uri.query,
-                    parsed_uri.fragment
-                ))
-                
-        except Exception as e:
-            logger.warning(f"Failed to encode MongoDB URI: {e}")
-            encoded_uri = MONGODB_URI
-    
-    # Check if SSL is disabled in the URI
-    use_ssl = "ssl=false" not in MONGODB_URI.lower()
-    
-    for attempt in range(max_retries):
-        try:
-            if use_ssl:
-                mongo_client = MongoClient(
-                    encoded_uri,
-                    serverSelectionTimeoutMS=10000,
-                    connectTimeoutMS=20000,
-                    socketTimeoutMS=20000,
-                    maxPoolSize=50,
-                    minPoolSize=5,
-                    tls=True,
-                    tlsAllowInvalidCertificates=True,
-                    tlsAllowInvalidHostnames=True
-                )
-            else:
-                mongo_client = MongoClient(
-                    encoded_uri,
-                    serverSelectionTimeoutMS=10000,
-                    connectTimeoutMS=20000,
-                    socketTimeoutMS=20000,
-                    maxPoolSize=50,
-                    minPoolSize=5
-                )
-            # Test the connection
-            mongo_client.admin.command('ping')
-            db = mongo_client["jarvis_database"]
-            users_collection = db["users"]
-            activity_collection = db["activity_logs"]
-            
-            # Create indexes for better performance
-            users_collection.create_index("userId", unique=True)
-            activity_collection.create_index("userId")
-            activity_collection.create_index("timestamp")
-            
-            logger.info("Connected to MongoDB successfully")
-            break
-        except Exception as e:
-            logger.error(f"Attempt {attempt + 1} failed to connect to MongoDB: {e}")
-            if attempt < max_retries - 1:
-                logger.info(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                logger.error("Failed to connect to MongoDB after all retries")
-                mongo_client = None
-else:
-    logger.warning("MONGODB_URI not found in environment variables")
+def _process_start_time() -> float:
+    """Wall-clock time the process started (falls back to import time off Linux)"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return time.time()
+
+
+PROCESS_START_TIME = _process_start_time()
+# Process start to first served request should stay under this many seconds
+STARTUP_TARGET_SECONDS = float(os.getenv("STARTUP_TARGET_SECONDS", "5"))
+startup_timings = {"app_started": None, "first_request": None}
+
+# Research snapshots for incremental refresh (in-memory until MongoDB is connected)
+from backend.snapshots import SnapshotStore
+snapshot_store = SnapshotStore()
+
+# Per-stage checkpoints so failed research runs resume instead of starting over
+checkpoint_store = create_checkpoint_store()
+
+# Documents fetched per database round trip by bulk exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Compressed archive of finished reports so past research reopens without a new run
+from backend.report_archive import ReportArchive
+report_archive = ReportArchive()
+
+# Full-text index over each user's archived reports
+from backend.search_index import ReportSearchIndex
+search_index = ReportSearchIndex()
+
+
+def _attach_mongo_stores(db):
+    """Switch the snapshot and checkpoint stores to MongoDB once it is connected"""
+    global checkpoint_store
+    snapshot_store.collection = db["research_snapshots"]
+    report_archive.collection = db["reports"]
+    # A fresh host starts with an empty index; fill it from the archive without blocking startup
+    if search_index.count() == 0:
+        threading.Thread(target=search_index.backfill, args=(report_archive.iter_reports(),), daemon=True).start()
+    checkpoint_store = create_checkpoint_store(db)
+
+
+database.on_ready(_attach_mongo_stores)
 
 # Initialize the FastAPI app
-app = FastAPI(title="JARVIS Research System API")
+app = FastAPI(title="JARVIS Research System API", default_response_class=FastJSONResponse)
 
-# Add Session Middleware for OAuth
-app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY", "your-session-secret-key-change-in-production"))
+# Sessions for OAuth: server-side, the cookie only carries a signed session id
+SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY", "your-session-secret-key-change-in-production")
+app.add_middleware(ServerSessionMiddleware, secret_key=SESSION_SECRET_KEY, store=create_session_store())
 
 # Add CORS middleware to allow requests from the frontend
 app.add_middleware(
@@ -124,22 +94,104 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Run-Id"],
 )
 
+# Compress large JSON responses (reports, history) with brotli or gzip
+app.add_middleware(CompressionMiddleware)
+
+# Attribute event-loop stalls to the endpoint that caused them
+app.add_middleware(LoopMonitorMiddleware)
+
+# On-demand CPU/memory profiling hooks (no-op unless an admin starts a profile)
+app.add_middleware(ProfilingMiddleware)
+
+@app.on_event("startup")
+async def start_background_services():
+    """Connect to MongoDB in the background so the server accepts requests immediately"""
+    database.start()
+    loop_monitor.start()
+    if RESEARCH_CACHE_SERVE != "off":
+        cache_warmer.start(lambda topic, is_deep: perform_research(topic, is_deep, warmed=True))
+    google_metadata.start()
+    startup_timings["app_started"] = time.time() - PROCESS_START_TIME
+    logger.info(f"Application started {startup_timings['app_started']:.2f}s after process start")
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    cache_warmer.stop()
+    loop_monitor.stop()
+    shutdown_export_pool()
+    database.close()
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    """Measure process start to the first served request"""
+    response = await call_next(request)
+    cache_warmer.note_request()
+    if startup_timings["first_request"] is None:
+        elapsed = time.time() - PROCESS_START_TIME
+        startup_timings["first_request"] = elapsed
+        if elapsed > STARTUP_TARGET_SECONDS:
+            logger.warning(f"First request served {elapsed:.2f}s after process start (target {STARTUP_TARGET_SECONDS}s)")
+        else:
+            logger.info(f"First request served {elapsed:.2f}s after process start")
+    return response
+
 # Import agents
 from backend.agents.chief_agent import ChiefAgent
+from backend.llm_router import llm_router
+from backend.conversation import conversation_memory
+from backend.semantic_cache import semantic_cache
+from backend.embeddings import embedding_service
+from backend.cache import cache_stats
+from backend.exports import EXPORT_FORMATS, export_filename, format_available, get_export
+from backend.exports import shutdown_pool as shutdown_export_pool
+from backend.precompute import follow_up_precomputer
+from backend.cache_warmer import RESEARCH_CACHE_SERVE, cache_warmer, research_cache_key, research_results
+from backend.deadline import (
+    DEEP_RESEARCH_DEADLINE,
+    DOCUMENT_ANALYSIS_DEADLINE,
+    QUESTION_DEADLINE,
+    QUICK_RESEARCH_DEADLINE,
+    ClientDisconnected,
+    DeadlineExceeded,
+    run_with_deadline,
+)
+from backend.images import (
+    IMAGE_THUMB_PROXY,
+    PUBLIC_BASE_URL,
+    get_thumbnail,
+    snap_thumb_width,
+    thumbnail_key,
+    thumbnail_url,
+    verify_thumbnail_signature,
+)
 
 # Import auth routes
-from backend.auth import router as auth_router
+from backend.auth import google_metadata, require_admin, router as auth_router
 app.include_router(auth_router, prefix="/api")
 
+# Admin-only profiling routes (require X-Admin-Token)
+from backend.profiling import router as profiling_router
+app.include_router(profiling_router, prefix="/api")
+
 class ResearchRequest(BaseModel):
     topic: str
     is_deep: bool
+    refresh: Optional[bool] = False
+    run_id: Optional[str] = None
+    user_id: Optional[str] = None
+
+class ChatTurn(BaseModel):
+    role: str  # 'user' or 'assistant'
+    content: str
 
 class QuestionRequest(BaseModel):
     question: str
     context: str
+    session_id: Optional[str] = None
+    history: Optional[List[ChatTurn]] = None
 
 class DocumentAnalysisRequest(BaseModel):
     file_base64: str
@@ -153,6 +205,21 @@ class ResearchResult(BaseModel):
     report: str
     sources: List[Source]
     images: Optional[List[str]] = None
+    run_id: Optional[str] = None
+    report_id: Optional[str] = None
+    # Set when the result was served from the research cache instead of a fresh run
+    cached: bool = False
+    cache_age_seconds: Optional[float] = None
+
+class ArchivedReport(BaseModel):
+    report_id: str
+    topic: str
+    is_deep: bool
+    report: str
+    sources: List[Source]
+    images: Optional[List[str]] = None
+    context: str
+    created_at: datetime
     
 class QuestionResult(BaseModel):
     answer: str
@@ -164,6 +231,7 @@ class LLMRequest(BaseModel):
     json_mode: Optional[bool] = False
     thinking_budget: Optional[int] = None
     is_report: Optional[bool] = False
+    task: Optional[str] = None
 
 # Pydantic models for MongoDB
 class User(BaseModel):
@@ -200,19 +268,44 @@ async def health_check():
             "groq": groq_key,
             "tavily": tavily_key
         },
-        "mongodb": mongo_client is not None
+        "mongodb": database.ready
     }
 
-async def perform_research(topic: str, is_deep: bool):
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: not ready until background startup (MongoDB connection) has finished"""
+    ready = database.status not in ("pending", "connecting")
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "mongodb": database.status,
+        "mongodb_error": database.error,
+        "startup_seconds": startup_timings["app_started"],
+        "first_request_seconds": startup_timings["first_request"],
+        "startup_target_seconds": STARTUP_TARGET_SECONDS
+    }
+
+def make_run_id() -> str:
+    """Fresh run id for a research request; clients pass it back to resume a failed run"""
+    return secrets.token_urlsafe(16)
+
+def checkpoint_key(run_id: str, user_id: Optional[str]) -> str:
+    """Checkpoint key for a run, scoped to the requesting user so nobody else can resume or clear it"""
+    return hashlib.sha256(f"{user_id or 'anonymous'}|{run_id}".encode()).hexdigest()[:32]
+
+async def perform_research(topic: str, is_deep: bool, refresh: bool = False, run_id: Optional[str] = None, user_id: Optional[str] = None, warmed: bool = False):
     """Perform research using the agent architecture"""
     try:
-        logger.info(f"Starting research on topic: {topic}, deep: {is_deep}")
+        run_id = run_id or make_run_id()
+        logger.info(f"Starting research on topic: {topic}, deep: {is_deep}, refresh: {refresh}, run: {run_id}")
         
         # Initialize chief agent
-        chief_agent = ChiefAgent()
+        chief_agent = ChiefAgent(checkpoint_store=checkpoint_store)
         
         # Create initial state
         state = {
+            "run_id": checkpoint_key(run_id, user_id),
             "topic": topic,
             "is_deep": is_deep,
             "context": "",
@@ -221,21 +314,55 @@ async def perform_research(topic: str, is_deep: bool):
             "report": ""
         }
         
+        # Incremental refresh starts from the last snapshot of this topic
+        if refresh:
+            snapshot = await asyncio.to_thread(snapshot_store.get, topic, is_deep)
+            if snapshot:
+                state["snapshot"] = snapshot
+            else:
+                logger.info(f"No snapshot for '{topic}', running full research")
+        
         # Execute the research workflow
         final_state = await chief_agent.execute(state)
         
-        # Return result
-        return ResearchResult(
+        # Snapshot the result so the next refresh only searches for newer material
+        await asyncio.to_thread(snapshot_store.save, topic, is_deep, final_state)
+        
+        # Archive the report so it can be reopened later without rerunning the pipeline
+        report_id = None
+        try:
+            archived = await asyncio.to_thread(report_archive.save, topic, is_deep, final_state, user_id)
+            report_id = archived["report_id"]
+            if user_id:
+                await asyncio.to_thread(search_index.add, user_id, report_id, topic, final_state["report"])
+        except Exception as e:
+            logger.warning(f"Failed to archive report: {str(e)}")
+        
+        result = ResearchResult(
             report=final_state["report"],
             sources=[Source(**source) for source in final_state["sources"]],
-            images=final_state["images"]
+            images=final_state["images"],
+            run_id=run_id,
+            report_id=report_id
         )
         
+        # Cache the result so repeat requests for the topic (from any worker) skip the pipeline
+        if warmed or RESEARCH_CACHE_SERVE == "all":
+            await research_results.aset(
+                research_cache_key(topic, is_deep),
+                {**result.dict(), "cached_at": time.time(), "warmed": warmed}
+            )
+        
+        return result
+        
+    except DeadlineExceeded as e:
+        logger.warning(f"Research stopped: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Research timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Research error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Research failed: {str(e)}")
 
-async def answer_question(question: str, context: str):
+async def answer_question(question: str, context: str, session_id: Optional[str] = None, history: Optional[List[ChatTurn]] = None):
     """Answer a question using the AI Assistant agent"""
     try:
         logger.info(f"Answering question: {question}")
@@ -243,19 +370,33 @@ async def answer_question(question: str, context: str):
         # Initialize chief agent
         chief_agent = ChiefAgent()
         
+        # Load bounded conversation memory (seeded from client history if the server has none)
+        conversation = None
+        if session_id:
+            if history:
+                await conversation_memory.seed(session_id, [turn.dict() for turn in history])
+            conversation = await conversation_memory.get(session_id)
+        
         # Create state for Q&A
         state = {
             "question": question,
             "context": context,
+            "conversation": conversation_memory.render(conversation),
             "answer": ""
         }
         
         # Execute the Q&A workflow
         final_state = await chief_agent.execute(state)
         
+        if session_id:
+            await conversation_memory.append(session_id, question, final_state["answer"])
+        
         # Return result
         return QuestionResult(answer=final_state["answer"])
         
+    except DeadlineExceeded as e:
+        logger.warning(f"Q&A stopped: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Q&A timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Q&A error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Q&A failed: {str(e)}")
@@ -287,45 +428,109 @@ async def analyze_document(file_base64: str, mime_type: str):
             images=final_state["images"]
         )
         
+    except DeadlineExceeded as e:
+        logger.warning(f"Document analysis stopped: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Document analysis timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Document analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Document analysis failed: {str(e)}")
 
+async def link_cached_report(result: ResearchResult, topic: str, user_id: Optional[str]):
+    """Add a cached result's archived report to the requesting user's archive and search index"""
+    if not user_id or not result.report_id:
+        return
+    try:
+        await asyncio.to_thread(report_archive.link_user, result.report_id, user_id)
+        await asyncio.to_thread(search_index.add, user_id, result.report_id, topic, result.report)
+    except Exception as e:
+        logger.warning(f"Failed to link cached report: {str(e)}")
+
 @app.post("/api/research")
-async def start_research(request: ResearchRequest):
+async def start_research(request: ResearchRequest, http_request: Request):
     """Endpoint to start research process"""
+    run_id = request.run_id or make_run_id()
     try:
         logger.info(f"Received research request: {request.topic}")
-        result = await perform_research(request.topic, request.is_deep)
-        return result
-    except HTTPException:
+        cached = None
+        if not request.refresh and RESEARCH_CACHE_SERVE != "off":
+            cached = await research_results.aget(research_cache_key(request.topic, request.is_deep))
+            if cached is not None and RESEARCH_CACHE_SERVE == "warmed" and not cached.get("warmed"):
+                cached = None
+        if cached is not None:
+            logger.info(f"Serving cached research result for: {request.topic}")
+            result = ResearchResult(**cached)
+            result.cached = True
+            if cached.get("cached_at"):
+                result.cache_age_seconds = round(time.time() - cached["cached_at"], 1)
+            await link_cached_report(result, request.topic, request.user_id)
+        else:
+            result = await run_with_deadline(
+                http_request,
+                lambda: perform_research(request.topic, request.is_deep, bool(request.refresh), run_id, request.user_id),
+                DEEP_RESEARCH_DEADLINE if request.is_deep else QUICK_RESEARCH_DEADLINE
+            )
+        
+        # Serve report images through the cached thumbnail proxy
+        if IMAGE_THUMB_PROXY and result.images:
+            base_url = PUBLIC_BASE_URL or str(http_request.base_url)
+            result.images = [thumbnail_url(base_url, image) for image in result.images]
+        
+        # Get the report ready for follow-up questions once it has been sent
+        return FastJSONResponse(
+            result,
+            background=BackgroundTask(follow_up_precomputer.schedule, request.user_id, result.report)
+        )
+    except HTTPException as e:
+        # Retrying with this run id resumes after the last completed stage
+        e.headers = {**(e.headers or {}), "X-Run-Id": run_id}
         raise
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Research timed out: {str(e)}", headers={"X-Run-Id": run_id})
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Research failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Research failed: {str(e)}", headers={"X-Run-Id": run_id})
 
 @app.post("/api/question")
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, http_request: Request):
     """Endpoint to ask questions about research context"""
     try:
         logger.info(f"Received question: {request.question}")
-        result = await answer_question(request.question, request.context)
+        follow_up_precomputer.touch(request.context)
+        result = await run_with_deadline(
+            http_request,
+            lambda: answer_question(request.question, request.context, request.session_id, request.history),
+            QUESTION_DEADLINE
+        )
         return result
     except HTTPException:
         raise
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Q&A timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Q&A failed: {str(e)}")
 
 @app.post("/api/document-analysis")
-async def document_analysis(request: DocumentAnalysisRequest):
+async def document_analysis(request: DocumentAnalysisRequest, http_request: Request):
     """Endpoint to analyze documents"""
     try:
         logger.info(f"Received document analysis request with MIME type: {request.mime_type}")
-        result = await analyze_document(request.file_base64, request.mime_type)
-        return result
+        result = await run_with_deadline(
+            http_request,
+            lambda: analyze_document(request.file_base64, request.mime_type),
+            DOCUMENT_ANALYSIS_DEADLINE
+        )
+        return FastJSONResponse(result)
     except HTTPException:
         raise
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Document analysis timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Document analysis failed: {str(e)}")
@@ -336,128 +541,63 @@ async def generate_llm_content(request: LLMRequest):
     try:
         logger.info(f"Received LLM generation request")
         
-        # Import and initialize the LLM provider
-        import os
-        import requests
-        
-        # Try providers in order of preference
-        providers = []
-        
-        # 1. Google Gemini
-        google_api_key = os.getenv("GOOGLE_API_KEY")
-        if google_api_key:
-            providers.append({
-                "name": "Google Gemini",
-                "url": f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={google_api_key}",
-                "payload": {
-                    "contents": [{
-                        "parts": [{
-                            "text": request.prompt
-                        }]
-                    }],
-                    "generationConfig": {
-                        "temperature": 0.7,
-                        "maxOutputTokens": 8192 if request.is_report else 4096
-                    }
-                },
-                "headers": {"Content-Type": "application/json"}
-            })
-            
-            if request.system_instruction:
-                providers[-1]["payload"]["systemInstruction"] = {"parts": [{"text": request.system_instruction}]}
-        
-        # 2. Groq
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if groq_api_key:
-            providers.append({
-                "name": "Groq",
-                "url": "https://api.groq.com/openai/v1/chat/completions",
-                "payload": {
-                    "model": "llama-3.3-70b-versatile",
-                    "messages": [
-                        {"role": "system", "content": request.system_instruction or "You are a helpful research assistant."},
-                        {"role": "user", "content": request.prompt}
-                    ],
-                    "temperature": 0.5
-                },
-                "headers": {
-                    "Authorization": f"Bearer {groq_api_key}",
-                    "Content-Type": "application/json"
-                }
-            })
-            
-            if request.json_mode:
-                providers[-1]["payload"]["response_format"] = {"type": "json_object"}
-        
-        # 3. Hugging Face
-        hugging_face_api_key = os.getenv("HUGGINGFACE_API_KEY")
-        if hugging_face_api_key:
-            providers.append({
-                "name": "Hugging Face",
-                "url": "https://api-inference.huggingface.co/models/meta-llama/Meta-Llama-3-8B-Instruct",
-                "payload": {
-                    "inputs": f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n{request.system_instruction or 'You are a helpful assistant.'}{'' if not request.json_mode else ' Output strict JSON only.'}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n{request.prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n",
-                    "parameters": {
-                        "max_new_tokens": 4096,
-                        "return_full_text": False,
-                        "temperature": 0.7
-                    }
-                },
-                "headers": {
-                    "Authorization": f"Bearer {hugging_face_api_key}",
-                    "Content-Type": "application/json"
-                }
-            })
-        
-        if not providers:
-            raise HTTPException(status_code=500, detail="No API keys configured for LLM providers")
-        
-        # Try each provider in order
-        last_error = None
-        for provider in providers:
-            try:
-                logger.info(f"Trying LLM provider: {provider['name']}")
-                response = requests.post(
-                    provider["url"],
-                    json=provider["payload"],
-                    headers=provider["headers"]
-                )
-                response.raise_for_status()
-                
-                # Parse response based on provider
-                if provider["name"] == "Google Gemini":
-                    result = response.json()
-                    content = result["candidates"][0]["content"]["parts"][0]["text"]
-                elif provider["name"] == "Groq":
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                elif provider["name"] == "Hugging Face":
-                    result = response.json()
-                    content = result[0]["generated_text"] if isinstance(result, list) else result.get("generated_text", "")
-                else:
-                    content = response.text
-                
-                logger.info(f"Successfully generated content using {provider['name']}")
-                return {"content": content, "provider": provider["name"]}
-                
-            except Exception as e:
-                last_error = e
-                logger.warning(f"Failed to generate content with {provider['name']}: {str(e)}")
-                continue
-        
-        # If we get here, all providers failed
-        raise HTTPException(status_code=500, detail=f"All LLM providers failed. Last error: {str(last_error)}")
+        # The router ranks providers for the task and falls back on failure
+        task = request.task or ("deep_report" if request.is_report else "general")
+        result = await llm_router.agenerate(
+            task,
+            request.prompt,
+            system_instruction=request.system_instruction,
+            json_mode=bool(request.json_mode)
+        )
+        
+        logger.info(f"Successfully generated content using {result['provider']} ({result['model']})")
+        return {"content": result["content"], "provider": result["provider"]}
         
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"LLM generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"LLM generation failed: {str(e)}")
 
+@app.get("/api/llm/stats", dependencies=[Depends(require_admin)])
+async def get_llm_stats():
+    """Endpoint to inspect per-route latency, error and token stats"""
+    return {"policies": llm_router.policies, "routes": llm_router.stats()}
+
+@app.get("/api/semantic-cache/stats", dependencies=[Depends(require_admin)])
+async def get_semantic_cache_stats():
+    """Endpoint to inspect semantic answer cache size and hit rate"""
+    return semantic_cache.stats()
+
+@app.get("/api/embeddings/stats", dependencies=[Depends(require_admin)])
+async def get_embedding_stats():
+    """Endpoint to inspect embedding batch sizes, throughput and cache hits"""
+    return embedding_service.stats()
+
+@app.get("/api/loop/stats", dependencies=[Depends(require_admin)])
+async def get_loop_stats(stacks: bool = False):
+    """Endpoint to inspect event-loop lag and recent blocking events with their stacks"""
+    return loop_monitor.stats(include_stacks=stacks)
+
+@app.get("/api/precompute/stats", dependencies=[Depends(require_admin)])
+async def get_precompute_stats():
+    """Endpoint to inspect speculative follow-up precomputation"""
+    return follow_up_precomputer.stats()
+
+@app.get("/api/cache-warmer/stats", dependencies=[Depends(require_admin)])
+async def get_cache_warmer_stats():
+    """Endpoint to inspect cache warming activity and the research result cache"""
+    return await cache_warmer.stats()
+
+@app.get("/api/cache/stats", dependencies=[Depends(require_admin)])
+async def get_cache_stats():
+    """Endpoint to inspect shared cache usage and hit rates per namespace"""
+    return await asyncio.to_thread(cache_stats)
+
 @app.post("/api/logs")
 async def log_activity(activity: ActivityLog):
     """Endpoint to log user activity to MongoDB"""
-    if mongo_client is None or db is None or users_collection is None or activity_collection is None:
+    users_collection = database.collection("users")
+    activity_collection = database.collection("activity_logs")
+    if users_collection is None or activity_collection is None:
         logger.warning("MongoDB client not initialized")
         return {"message": "MongoDB not connected"}
     
@@ -487,24 +627,188 @@ async def log_activity(activity: ActivityLog):
 @app.get("/api/user-history/{user_id}")
 async def get_user_history(user_id: str):
     """Endpoint to retrieve user activity history from MongoDB"""
-    if mongo_client is None or activity_collection is None:
+    activity_collection = database.collection("activity_logs")
+    if activity_collection is None:
         logger.warning("MongoDB client not initialized")
         raise HTTPException(status_code=500, detail="MongoDB not connected")
     
     try:
         # Query activity logs for the user, sorted by timestamp descending
         cursor = activity_collection.find({"userId": user_id}).sort("timestamp", -1)
-        logs = []
-        for doc in cursor:
-            # Convert ObjectId to string for JSON serialization
-            doc["_id"] = str(doc["_id"])
-            logs.append(doc)
         
-        return {"logs": logs}
+        def logs():
+            for doc in cursor:
+                # Convert ObjectId to string for JSON serialization
+                doc["_id"] = str(doc["_id"])
+                yield doc
+        
+        # Stream the list so long histories are never buffered whole in memory
+        return stream_json_list("logs", logs())
     except Exception as e:
         logger.error(f"Failed to retrieve user history: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve user history: {str(e)}")
 
+@app.get("/api/admin/export/activity", dependencies=[Depends(require_admin)])
+async def export_activity(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    action_type: Optional[List[str]] = Query(None),
+    user_id: Optional[List[str]] = Query(None),
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    format: str = "ndjson",
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000)
+):
+    """Bulk export of activity logs as NDJSON (or gzip NDJSON), streamed from the database cursor.
+    
+    Rows come in `_id` order; pass the `_id` of the last row received as `after`
+    (with the same filters) to resume an interrupted export.
+    """
+    if format not in ("ndjson", "ndjson.gz"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'ndjson.gz'")
+    if after is not None and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    activity_collection = database.collection("activity_logs")
+    if activity_collection is None:
+        raise HTTPException(status_code=503, detail="MongoDB not connected")
+    
+    query = {}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    if action_type:
+        query["actionType"] = {"$in": action_type}
+    if user_id:
+        query["userId"] = {"$in": user_id}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    
+    cursor = activity_collection.find(query).sort("_id", 1).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    
+    def rows():
+        try:
+            for doc in cursor:
+                doc["_id"] = str(doc["_id"])
+                yield doc
+        finally:
+            cursor.close()
+    
+    compress = format == "ndjson.gz"
+    return stream_ndjson(rows(), compress=compress, filename=f"activity.{format}" if compress else None)
+
+@app.get("/api/reports/{report_id}")
+async def get_archived_report(report_id: str, request: Request):
+    """Endpoint to reopen an archived report; answers 304 when the client's copy is current"""
+    meta = await asyncio.to_thread(report_archive.get_meta, report_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    # Reports are content-addressed, so the content hash is a strong validator
+    etag = f'"{meta["hash"]}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+    
+    try:
+        archived = await asyncio.to_thread(report_archive.get, report_id)
+    except Exception as e:
+        logger.error(f"Failed to read archived report {report_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to read report: {str(e)}")
+    if archived is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    images = archived.get("images") or []
+    if IMAGE_THUMB_PROXY and images:
+        base_url = PUBLIC_BASE_URL or str(request.base_url)
+        images = [thumbnail_url(base_url, image) for image in images]
+    
+    result = ArchivedReport(
+        report_id=archived["report_id"],
+        topic=archived["topic"],
+        is_deep=archived["is_deep"],
+        report=archived["report"],
+        sources=[Source(**source) for source in archived["sources"]],
+        images=images,
+        context=archived["context"],
+        created_at=archived["created_at"]
+    )
+    return FastJSONResponse(result, headers=cache_headers)
+
+@app.get("/api/reports/{report_id}/export")
+async def export_archived_report(report_id: str, request: Request, format: str = "pdf"):
+    """Endpoint to download an archived report as PDF, DOCX or Markdown, rendered once per report and format"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    if not format_available(format):
+        raise HTTPException(status_code=501, detail=f"{format.upper()} export is not available on this server")
+    
+    meta = await asyncio.to_thread(report_archive.get_meta, report_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    etag = f'"{meta["hash"]}-{format}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+    
+    try:
+        path = await get_export(meta["hash"], format, lambda: report_archive.get(report_id))
+    except Exception as e:
+        logger.error(f"Failed to export report {report_id} as {format}: {e}")
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    return FileResponse(
+        path,
+        media_type=EXPORT_FORMATS[format][0],
+        filename=export_filename(meta["topic"], format),
+        headers=cache_headers
+    )
+
+@app.get("/api/user-reports/{user_id}")
+async def list_user_reports(user_id: str, limit: int = 50):
+    """Endpoint to list a user's archived reports (metadata only)"""
+    reports = await asyncio.to_thread(report_archive.list_for_user, user_id, min(max(limit, 1), 200))
+    return {"reports": reports}
+
+@app.get("/api/search/{user_id}")
+async def search_user_reports(user_id: str, q: str, limit: int = 20, offset: int = 0):
+    """Endpoint for BM25-ranked search over a user's archived topics and reports"""
+    try:
+        return await asyncio.to_thread(search_index.search, user_id, q, min(max(limit, 1), 100), max(offset, 0))
+    except Exception as e:
+        logger.error(f"Search failed for {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+@app.get("/api/images/thumb")
+async def image_thumbnail(url: str, request: Request, w: Optional[int] = None, sig: Optional[str] = None):
+    """Endpoint to serve a resized, disk-cached copy of a report image"""
+    # Only images this server linked to can be proxied
+    if not verify_thumbnail_signature(url, sig):
+        raise HTTPException(status_code=403, detail="Invalid image signature")
+    width = snap_thumb_width(w)
+    etag = f'"{thumbnail_key(url, width)}"'
+    cache_headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": etag}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
+    try:
+        body, media_type, _ = await get_thumbnail(url, width)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.warning(f"Thumbnail generation failed for {url}: {e}")
+        raise HTTPException(status_code=502, detail="Failed to fetch image")
+    
+    return Response(content=body, media_type=media_type, headers=cache_headers)
+
 @app.options("/api/research")
 async def research_options():
     return {"message": "API endpoint for research requests"}
@@ -0,0 +1,129 @@
+import copy
+import os
+import secrets
+import time
+from http.cookies import SimpleCookie
+from typing import Optional
+
+from itsdangerous import BadSignature, Signer
+from starlette.datastructures import MutableHeaders
+
+from backend.cache import CACHE_BACKEND, REDIS_URL, Cache, MemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+from backend.utils import logger
+
+# Idle sessions expire after this many seconds
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 3600)))
+SESSION_COOKIE = "sid"
+# Cookie set by the previous signed-cookie sessions; cleared when seen
+LEGACY_SESSION_COOKIE = "session"
+# Active sessions have their expiry pushed back at most this often
+SESSION_REFRESH_AFTER = SESSION_MAX_AGE // 4
+# SQLite file for sessions, kept apart from the general cache so sessions are never evicted by its size limit
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(".cache", "sessions.db"))
+# Redis for sessions; it must not evict keys (maxmemory-policy noeviction)
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", REDIS_URL)
+_SAVED_AT = "_saved_at"
+
+
+def create_session_store() -> Cache:
+    """Dedicated session store, on a backend shared by all workers when one is configured.
+
+    With the memory cache backend sessions live in this process only, so an
+    OAuth state saved on one worker is missing when the callback lands on
+    another; run a single worker or configure sqlite or redis.
+    """
+    backend = None
+    try:
+        if CACHE_BACKEND == "sqlite":
+            backend = SQLiteCacheBackend(SESSION_DB_PATH, max_bytes=None)
+        elif CACHE_BACKEND == "redis":
+            backend = RedisCacheBackend(SESSION_REDIS_URL)
+    except Exception as e:
+        logger.warning(f"Failed to open the shared session store: {e}")
+    if backend is None:
+        logger.warning("Sessions are stored in process memory and are not shared between workers; "
+                       "set CACHE_BACKEND=sqlite or redis when running more than one")
+        # Not size-limited, so sessions are only ever dropped when they expire
+        backend = MemoryCacheBackend(max_bytes=None)
+    return Cache("session", default_ttl=SESSION_MAX_AGE, backend=backend)
+
+
+def rotate_session(request):
+    """Issue a new session id at the end of this request (call on login to prevent fixation)"""
+    request.scope["session.rotate"] = True
+
+
+class ServerSessionMiddleware:
+    """Drop-in replacement for Starlette's SessionMiddleware that keeps session data server-side.
+
+    The cookie carries only a signed random session id, so requests stay
+    small and nothing in the session has to be re-verified per request.
+    `request.session` behaves as before; the store is only read when a
+    session cookie is present and only written when the session changed.
+    """
+
+    def __init__(self, app, secret_key: str, store: Cache, max_age: int = SESSION_MAX_AGE, same_site: str = "lax", https_only: bool = False):
+        self.app = app
+        self.store = store
+        self.signer = Signer(secret_key, salt="jarvis-session")
+        self.max_age = max_age
+        self.security_flags = f"httponly; samesite={same_site}" + ("; secure" if https_only else "")
+
+    def _session_id(self, cookie: Optional[str]) -> Optional[str]:
+        if not cookie:
+            return None
+        try:
+            return self.signer.unsign(cookie).decode()
+        except BadSignature:
+            return None
+
+    def _cookie(self, value: str, max_age: int) -> str:
+        return f"{SESSION_COOKIE}={value}; path=/; Max-Age={max_age}; {self.security_flags}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        cookies = SimpleCookie()
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookies.load(value.decode("latin-1"))
+        session_id = self._session_id(cookies[SESSION_COOKIE].value if SESSION_COOKIE in cookies else None)
+        has_legacy_cookie = LEGACY_SESSION_COOKIE in cookies
+
+        data = (await self.store.aget(session_id) if session_id else None) or {}
+        saved_at = data.pop(_SAVED_AT, 0)
+        if not data:
+            session_id = None
+        initial = copy.deepcopy(data)
+        scope["session"] = data
+
+        async def send_wrapper(message):
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                session = scope["session"]
+                rotate = scope.get("session.rotate", False)
+                if rotate and session_id:
+                    await self.store.adelete(session_id)
+                    session_id = None
+
+                if session:
+                    stale = time.time() - saved_at > SESSION_REFRESH_AFTER
+                    if session_id is None or session != initial or stale:
+                        is_new = session_id is None
+                        session_id = session_id or secrets.token_urlsafe(32)
+                        await self.store.aset(session_id, {**session, _SAVED_AT: time.time()}, ttl=self.max_age)
+                        if is_new or stale:
+                            headers.append("Set-Cookie", self._cookie(self.signer.sign(session_id).decode(), self.max_age))
+                elif session_id:
+                    # Session was cleared (e.g. logout)
+                    await self.store.adelete(session_id)
+                    headers.append("Set-Cookie", self._cookie("null", 0))
+
+                if has_legacy_cookie:
+                    headers.append("Set-Cookie", f"{LEGACY_SESSION_COOKIE}=null; path=/; Max-Age=0; {self.security_flags}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,59 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from backend.utils import logger
+
+# In-memory fallback keeps at most this many snapshots (oldest dropped first)
+MAX_MEMORY_SNAPSHOTS = 200
+
+
+class SnapshotStore:
+    """Stores research snapshots (context, sources, report) per topic and mode.
+
+    Snapshots live in MongoDB when a collection is available and in process
+    memory otherwise, so incremental refresh still works without a database.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self._memory: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def make_key(topic: str, is_deep: bool) -> str:
+        normalized = re.sub(r"\s+", " ", topic.strip().lower())
+        return f"{'deep' if is_deep else 'quick'}:{normalized}"
+
+    def get(self, topic: str, is_deep: bool) -> Optional[Dict[str, Any]]:
+        key = self.make_key(topic, is_deep)
+        if self.collection is not None:
+            try:
+                return self.collection.find_one({"key": key}, {"_id": 0})
+            except Exception as e:
+                logger.warning(f"Failed to load research snapshot for '{topic}': {e}")
+        return self._memory.get(key)
+
+    def save(self, topic: str, is_deep: bool, state: Dict[str, Any], timestamp: Optional[datetime] = None):
+        key = self.make_key(topic, is_deep)
+        snapshot = {
+            "key": key,
+            "topic": topic,
+            "is_deep": is_deep,
+            "context": state.get("context", ""),
+            "sources": state.get("sources", []),
+            "images": state.get("images", []),
+            "report": state.get("report", ""),
+            # Sources merged in by refreshes that did not regenerate the report
+            "unreported_sources": state.get("unreported_sources", 0),
+            "timestamp": timestamp or datetime.utcnow()
+        }
+        if self.collection is not None:
+            try:
+                self.collection.update_one({"key": key}, {"$set": snapshot}, upsert=True)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to store research snapshot for '{topic}': {e}")
+        self._memory.pop(key, None)
+        self._memory[key] = snapshot
+        while len(self._memory) > MAX_MEMORY_SNAPSHOTS:
+            self._memory.pop(next(iter(self._memory)))
@@ -8,7 +8,7 @@ import { LayersIcon, GlobeIcon, ArrowLeftIcon, DownloadIcon, FileIcon } from '..
 import { ResearchStatus, LogEntry, AgentEvent, ResearchResult, ChatMessage } from '../types';
 import { askFollowUp } from '../services/analysisService';
 import { logActivity } from '../services/mongoService';
-import { exportToPDF, exportToDOCX } from '../services/exportService';
+import { exportToPDF, exportToDOCX, downloadServerExport } from '../services/exportService';
 
 const generateId = () => Math.random().toString(36).substr(2, 9);
 
@@ -111,6 +111,12 @@ export const DeepResearchPage: React.FC<DeepResearchPageProps> = ({ initialQuery
     const sources = result?.sources || [];
     const images = result?.images || [];
     
+    if (result?.report_id) {
+      downloadServerExport(result.report_id, type);
+      setShowExportMenu(false);
+      return;
+    }
+    
     if (type === 'pdf') exportToPDF(title, content, sources, images);
     if (type === 'docx') exportToDOCX(title, content, sources, images);
     setShowExportMenu(false);
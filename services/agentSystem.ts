@@ -202,6 +202,10 @@ export class ResearchWorkflow {
        this.emit({ type: 'info', message: 'Connected to Neural Backend (Python/LangGraph)', timestamp: new Date() });
        try {
          const result = await api.startResearch(topic, isDeep);
+         if (result.cached) {
+           const minutes = Math.round((result.cache_age_seconds || 0) / 60);
+           this.emit({ type: 'info', message: `Served from cache (researched ${minutes} min ago)`, timestamp: new Date() });
+         }
          this.emit({ 
             type: 'complete', 
             message: 'Research Completed by Backend', 
@@ -53,13 +53,26 @@ export const askQuestion = async (question: string, context: string): Promise<st
 /**
  * Chat / AI Chatbot Service
  */
+// One server-side conversation per research context
+const chatSessions = new Map<string, string>();
+
+const getChatSessionId = (context: string): string => {
+  let sessionId = chatSessions.get(context);
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    chatSessions.set(context, sessionId);
+  }
+  return sessionId;
+};
+
 export const askFollowUp = async (
   history: ChatMessage[], 
   context: string, 
   question: string
 ): Promise<string> => {
   try {
-    // Use backend API for AI Chatbot
+    // Use backend API for AI Chatbot; the backend keeps bounded memory per session
+    // and only uses the history to seed a session it does not know yet
     const response = await fetch("http://localhost:8002/api/question", {
       method: "POST",
       headers: {
@@ -68,6 +81,8 @@ export const askFollowUp = async (
       body: JSON.stringify({
         question: question,
         context: context,
+        session_id: getChatSessionId(context),
+        history: history.slice(-10).map((message) => ({ role: message.role, content: message.content })),
       }),
     });
 
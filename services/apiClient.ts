@@ -1,7 +1,11 @@
 import { ResearchResult, ChatMessage } from "../types";
+import { getUserId } from "./mongoService";
 
 const API_URL = process.env.REACT_APP_API_URL || "http://localhost:8002/api";
 
+// Run ids of failed research requests, so retrying the same topic resumes from its checkpoint
+const failedRuns = new Map<string, string>();
+
 export const api = {
   health: async () => {
     try {
@@ -22,6 +26,7 @@ export const api = {
   },
 
   startResearch: async (topic: string, isDeep: boolean): Promise<ResearchResult> => {
+    const runKey = `${isDeep}|${topic.trim().toLowerCase()}`;
     try {
       const response = await fetch(`${API_URL}/research`, {
         method: 'POST',
@@ -29,11 +34,15 @@ export const api = {
         // Strictly match Python snake_case Pydantic model
         body: JSON.stringify({ 
           topic: topic, 
-          is_deep: isDeep 
+          is_deep: isDeep,
+          user_id: getUserId(),
+          run_id: failedRuns.get(runKey)
         }) 
       });
       
       if (!response.ok) {
+        const runId = response.headers.get('X-Run-Id');
+        if (runId) failedRuns.set(runKey, runId);
         let errorMessage = `Backend Error (${response.status})`;
         try {
            // Try to parse detailed JSON error from FastAPI
@@ -49,6 +58,7 @@ export const api = {
         throw new Error(errorMessage);
       }
       
+      failedRuns.delete(runKey);
       return await response.json();
     } catch (error: any) {
       console.error("Research API Error:", error);
@@ -56,6 +66,20 @@ export const api = {
     }
   },
 
+  // Reopen an archived report; the browser revalidates its cached copy with If-None-Match
+  getReport: async (reportId: string): Promise<ResearchResult> => {
+    const response = await fetch(`${API_URL}/reports/${reportId}`, { cache: 'no-cache' });
+    if (!response.ok) {
+      throw new Error(`Failed to load report (${response.status})`);
+    }
+    return await response.json();
+  },
+
+  // Server-rendered download of an archived report (cached per report and format)
+  exportUrl: (reportId: string, format: 'pdf' | 'docx' | 'md'): string => {
+    return `${API_URL}/reports/${reportId}/export?format=${format}`;
+  },
+
   chat: async (history: ChatMessage[], context: string, question: string) => {
     try {
       const response = await fetch(`${API_URL}/question`, {
@@ -1,6 +1,17 @@
 import { jsPDF } from "jspdf";
 import { Document, Packer, Paragraph, TextRun, HeadingLevel, ExternalHyperlink } from "docx";
 import { Source } from "../types";
+import { api } from "./apiClient";
+
+// Archived reports are rendered (and cached) by the backend instead of in the browser
+export const downloadServerExport = (reportId: string, format: 'pdf' | 'docx' | 'md') => {
+  const link = document.createElement('a');
+  link.href = api.exportUrl(reportId, format);
+  link.rel = 'noopener';
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+};
 
 export const exportToPDF = (title: string, content: string, sources: Source[] = [], images: string[] = []) => {
   const doc = new jsPDF();
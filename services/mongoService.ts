@@ -26,7 +26,7 @@ import { v4 as uuidv4 } from 'uuid';
 const USER_ID_KEY = 'jarvis_user_id';
 const API_URL = process.env.REACT_APP_API_URL || "http://localhost:8002/api";
 
-const getUserId = () => {
+export const getUserId = () => {
   let id = localStorage.getItem(USER_ID_KEY);
   if (!id) {
     id = 'user_' + Math.random().toString(36).substr(2, 9);
@@ -0,0 +1,200 @@
+import fnmatch
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import cache as cache_module
+from backend.cache import Cache, MemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeRedis:
+    """The subset of redis-py the backend uses, with server-side atomicity emulated by a lock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= self.clock.time() * 1000:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def get(self, key):
+        with self.lock:
+            return self._live(key)
+
+    def set(self, key, value, px=None, nx=False):
+        with self.lock:
+            if nx and self._live(key) is not None:
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if px:
+                self.expires[key] = self.clock.time() * 1000 + px
+            return True
+
+    def incrby(self, key, amount):
+        with self.lock:
+            value = int(self._live(key) or 0) + amount
+            self.data[key] = str(value).encode()
+            return value
+
+    def pexpire(self, key, ms):
+        with self.lock:
+            self.expires[key] = self.clock.time() * 1000 + ms
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def scan_iter(self, match="*", count=None):
+        with self.lock:
+            keys = [key for key in list(self.data) if self._live(key) is not None]
+        return [key for key in keys if fnmatch.fnmatchcase(key, match)]
+
+    def strlen(self, key):
+        return len(self.get(key) or b"")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemoryCacheBackend()
+    if request.param == "sqlite":
+        return SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    return RedisCacheBackend(client=FakeRedis(clock))
+
+
+def test_get_set_delete_round_trip(backend):
+    cache = Cache("test-round-trip", backend=backend)
+    assert cache.get("missing") is None
+    cache.set("doc", {"title": "Fusion", "tags": ["energy"]})
+    assert cache.get("doc") == {"title": "Fusion", "tags": ["energy"]}
+    cache.delete("doc")
+    assert cache.get("doc") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["sets"]) == (1, 2, 1)
+
+
+def test_ttl_expires_entries(backend, clock):
+    cache = Cache("test-ttl", default_ttl=60, backend=backend)
+    cache.set("short", "value")
+    cache.set("long", "value", ttl=600)
+    clock.now += 61
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+
+
+def test_add_only_sets_absent_or_expired_keys(backend, clock):
+    cache = Cache("test-add", backend=backend)
+    assert cache.add("lease", "first", ttl=5)
+    assert not cache.add("lease", "second", ttl=5)
+    assert cache.get("lease") == "first"
+    clock.now += 6
+    assert cache.add("lease", "third", ttl=5)
+    assert cache.get("lease") == "third"
+
+
+def test_incr_counts_and_keeps_original_expiry(backend, clock):
+    cache = Cache("test-incr", backend=backend)
+    assert cache.incr("quota", ttl=60) == 1
+    assert cache.incr("quota", 4, ttl=60) == 5
+    clock.now += 30
+    assert cache.incr("quota", ttl=60) == 6
+    clock.now += 31
+    assert cache.incr("quota", ttl=60) == 1
+
+
+def test_add_and_incr_are_atomic_across_threads(backend):
+    cache = Cache("test-atomic", backend=backend)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        winners = list(pool.map(lambda i: cache.add("lock", i, ttl=60), range(50)))
+        list(pool.map(lambda _: cache.incr("counter"), range(200)))
+    assert winners.count(True) == 1
+    assert cache.get("counter") == 200
+
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    backend = MemoryCacheBackend(max_bytes=250)
+    for key in ("a", "b"):
+        backend.set(key, b"x" * 100)
+    backend.get("a")
+    backend.set("c", b"x" * 100)
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+    assert backend.evictions == 1
+
+
+def test_unbounded_memory_backend_only_drops_expired_entries(clock):
+    backend = MemoryCacheBackend(max_bytes=None)
+    backend.set("old", b"x" * 1000, ttl=10)
+    for index in range(100):
+        backend.set(f"key{index}", b"x" * 1000)
+    assert backend.usage()[0] == 101
+    clock.now += 11
+    backend.set("new", b"x")
+    assert backend.usage()[0] == 101
+    assert backend.get("old") is None
+    assert backend.evictions == 0
+
+
+def test_sqlite_backend_evicts_least_recently_used(tmp_path, clock):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"), max_bytes=250)
+    for key in ("a", "b"):
+        backend.set(key, b"x" * 100)
+        clock.now += 1
+    backend.get("a")
+    clock.now += 1
+    backend._last_evict = 0
+    backend.set("c", b"x" * 100)
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+    assert backend.evictions == 1
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = Cache("test-shared", backend=SQLiteCacheBackend(path))
+    second = Cache("test-shared", backend=SQLiteCacheBackend(path))
+    first.set("key", "value")
+    assert second.get("key") == "value"
+    assert first.incr("counter") == 1
+    assert second.incr("counter") == 2
+
+
+def test_redis_usage_counts_namespace_keys(clock):
+    cache = Cache("test-usage", backend=RedisCacheBackend(client=FakeRedis(clock)))
+    cache.set("a", "xx")
+    cache.set("b", "yyy")
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == (2, len('"xx"') + len('"yyy"'))
+
+
+def test_backend_errors_are_treated_as_misses(clock):
+    class BrokenRedis(FakeRedis):
+        def get(self, key):
+            raise ConnectionError("down")
+
+    cache = Cache("test-broken", backend=RedisCacheBackend(client=BrokenRedis(clock)))
+    assert cache.get("key") is None
+    assert cache.stats()["errors"] == 1
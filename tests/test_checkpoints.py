@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from backend import checkpoints
+from backend.agents.chief_agent import ChiefAgent
+from backend.checkpoints import MemoryCheckpointStore, SQLiteCheckpointStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCheckpointStore()
+    return SQLiteCheckpointStore(str(tmp_path / "checkpoints.db"))
+
+
+def test_round_trip_returns_latest_stage(store):
+    assert store.load("run") is None
+    store.save("run", "research", {"topic": "fusion", "context": "notes"})
+    store.save("run", "images", {"topic": "fusion", "context": "notes", "images": ["a.png"]})
+    assert store.load("run") == {
+        "stage": "images",
+        "state": {"topic": "fusion", "context": "notes", "images": ["a.png"]},
+    }
+    assert store.load("other") is None
+
+
+def test_loaded_state_is_a_copy(store):
+    store.save("run", "research", {"sources": []})
+    store.load("run")["state"]["sources"].append("mutated")
+    assert store.load("run")["state"] == {"sources": []}
+
+
+def test_delete_and_expiry(store, monkeypatch):
+    store.save("run", "research", {"topic": "fusion"})
+    store.delete("run")
+    assert store.load("run") is None
+
+    store.save("run", "research", {"topic": "fusion"})
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_TTL_SECONDS", -1)
+    assert store.load("run") is None
+
+
+class RecordingAgent:
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    async def execute(self, state):
+        self.calls.append(self.name)
+        return {**state, self.name: True}
+
+
+def make_chief(store):
+    chief = ChiefAgent(checkpoint_store=store)
+    chief.calls = []
+    chief.research_stages = [(name, RecordingAgent(name, chief.calls)) for name, _ in chief.research_stages]
+    return chief
+
+
+def test_resume_skips_checkpointed_stages():
+    store = MemoryCheckpointStore()
+    store.save("run", "images", {"run_id": "run", "topic": "fusion", "is_deep": False, "research": True, "images": True})
+    chief = make_chief(store)
+
+    state = asyncio.run(chief.execute({"run_id": "run", "topic": "fusion", "is_deep": False}))
+
+    assert chief.calls == ["sources", "report"]
+    assert state["research"] and state["report"]
+    assert store.load("run") is None
+
+
+def test_checkpoint_for_another_request_is_discarded():
+    store = MemoryCheckpointStore()
+    store.save("run", "sources", {"run_id": "run", "topic": "fission", "is_deep": False})
+    chief = make_chief(store)
+
+    state = asyncio.run(chief.execute({"run_id": "run", "topic": "fusion", "is_deep": True}))
+
+    assert chief.calls == ["research", "images", "sources", "report"]
+    assert state["topic"] == "fusion" and state["is_deep"] is True
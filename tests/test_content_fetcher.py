@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from backend import content_fetcher
+from backend.content_fetcher import ContentFetcher, PageCache
+
+ARTICLE = "Fusion reactors confine plasma with strong magnetic fields to sustain the reaction."
+PAGE = f"""<html><body>
+<nav><p>Home | About | Contact | Subscribe to our newsletter today</p></nav>
+<article><h1>Fusion energy explained in plain words</h1><p>{ARTICLE}</p></article>
+<footer><p>Copyright notice and a long list of footer links here</p></footer>
+</body></html>"""
+TAIL = "This paragraph sits past the size cap and must never be extracted."
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        FixtureHandler.requests.append((self.path, self.headers.get("If-None-Match")))
+        html = {"Content-Type": "text/html; charset=utf-8"}
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, headers={"ETag": '"v1"'})
+            else:
+                self._send(200, PAGE.encode(), {**html, "ETag": '"v1"'})
+        elif self.path == "/big":
+            filler = "<p>" + "Padding sentence that keeps the page growing. " * 200 + "</p>"
+            body = f"<html><body><article><p>{ARTICLE}</p>{filler}<p>{TAIL}</p></article></body></html>"
+            self._send(200, body.encode(), html)
+        elif self.path == "/moved":
+            self._send(302, headers={"Location": "/article"})
+        elif self.path == "/internal":
+            self._send(302, headers={"Location": "http://localhost:1/admin"})
+        else:
+            self._send(404)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    FixtureHandler.requests = []
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def fetcher(server, tmp_path, monkeypatch):
+    port = urlparse(server).port
+    # Only the fixture server counts as public; anything else on loopback stays blocked
+    monkeypatch.setattr(content_fetcher, "is_public_url", lambda url: urlparse(url).port == port)
+    monkeypatch.setattr(content_fetcher, "_host_semaphores", {})
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield ContentFetcher(cache=PageCache(str(tmp_path)), executor=executor)
+    executor.shutdown()
+
+
+def test_extracts_main_text(server, fetcher):
+    pages = asyncio.run(fetcher.fetch_many([f"{server}/article"]))
+    text = pages[f"{server}/article"]
+    assert ARTICLE in text
+    assert "newsletter" not in text
+    assert "Copyright" not in text
+
+
+def test_revalidates_with_etag(server, fetcher):
+    url = f"{server}/article"
+    first = asyncio.run(fetcher.fetch_many([url]))
+    second = asyncio.run(fetcher.fetch_many([url]))
+    assert first == second
+    assert FixtureHandler.requests == [("/article", None), ("/article", '"v1"')]
+
+
+def test_truncates_oversized_pages(server, fetcher, monkeypatch):
+    monkeypatch.setattr(content_fetcher, "MAX_PAGE_BYTES", 4096)
+    text = asyncio.run(fetcher.fetch_many([f"{server}/big"]))[f"{server}/big"]
+    assert ARTICLE in text
+    assert TAIL not in text
+
+
+def test_follows_public_redirects(server, fetcher):
+    pages = asyncio.run(fetcher.fetch_many([f"{server}/moved"]))
+    assert ARTICLE in pages[f"{server}/moved"]
+
+
+def test_refuses_redirect_to_internal_address(server, fetcher):
+    assert asyncio.run(fetcher.fetch_many([f"{server}/internal"])) == {}
+    assert [path for path, _ in FixtureHandler.requests] == ["/internal"]
+
+
+def test_prune_evicts_expired_and_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path), max_bytes=250, max_age=3600)
+    for name in ("old", "a", "b", "c"):
+        cache.put(name, {"text": "x" * 100})
+    now = time.time()
+    os.utime(cache._path("old"), (now - 7200, now - 7200))
+    os.utime(cache._path("a"), (now - 60, now - 60))
+    cache.prune()
+    assert cache.get("old") is None
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from backend import deadline as deadline_module
+from backend.deadline import (
+    MIN_UPSTREAM_TIMEOUT,
+    Deadline,
+    DeadlineExceeded,
+    check_deadline,
+    current_deadline,
+    run_stage,
+    upstream_timeout,
+)
+
+
+def test_child_gets_a_fraction_of_the_remaining_time():
+    parent = Deadline(100)
+    child = parent.child(0.25)
+    assert 24 < child.remaining() <= 25
+    assert child.expires_at <= parent.expires_at
+
+
+def test_child_never_outlives_its_parent():
+    parent = Deadline(10)
+    child = Deadline(1000, parent=parent)
+    assert child.expires_at == parent.expires_at
+
+
+def test_cancelling_the_parent_cancels_children():
+    parent = Deadline(100)
+    child = parent.child(0.5)
+    parent.cancel()
+    assert child.cancelled
+    with pytest.raises(DeadlineExceeded, match="cancelled"):
+        child.check()
+
+
+def test_check_raises_once_time_is_up():
+    expired = Deadline(0)
+    assert expired.remaining() == 0
+    with pytest.raises(DeadlineExceeded, match="exceeded"):
+        expired.check()
+    Deadline(10).check()
+
+
+def test_upstream_timeout_follows_the_current_deadline():
+    assert upstream_timeout(30) == 30
+    token = current_deadline.set(Deadline(5))
+    try:
+        assert 4 < upstream_timeout(30) <= 5
+        assert upstream_timeout(2) == 2
+    finally:
+        current_deadline.reset(token)
+
+    token = current_deadline.set(Deadline(0.5))
+    try:
+        assert upstream_timeout(30) == MIN_UPSTREAM_TIMEOUT
+    finally:
+        current_deadline.reset(token)
+
+
+def test_run_stage_installs_the_stage_deadline():
+    parent = Deadline(100)
+
+    async def stage():
+        check_deadline()
+        return current_deadline.get()
+
+    stage_deadline = asyncio.run(run_stage(parent, 0.5, stage()))
+    assert stage_deadline.parent is parent
+    assert 49 < stage_deadline.remaining() <= 50
+    assert current_deadline.get() is None
+
+
+def test_run_stage_times_out(monkeypatch):
+    monkeypatch.setattr(deadline_module, "MIN_UPSTREAM_TIMEOUT", 0.05)
+    with pytest.raises(DeadlineExceeded, match="Stage"):
+        asyncio.run(run_stage(Deadline(0.1), 0.5, asyncio.sleep(5)))
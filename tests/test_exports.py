@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from backend import exports
+from backend.exports import _parse_blocks, _pdf_inline, export_filename, export_path, render_export, render_markdown
+
+REPORT = {
+    "topic": "Fusion energy",
+    "created_at": datetime(2024, 5, 1, 9, 30),
+    "report": "## Overview\n\nFusion joins **light** nuclei.\nIt releases *energy*.\n\n- Tokamaks\n1. Stellarators\n",
+    "images": ["https://example.com/a.png", "https://example.com/b.png"],
+    "sources": [{"title": "ITER", "uri": "https://iter.org"}, {"uri": "https://example.com/paper"}],
+}
+
+
+def test_markdown_export_has_title_report_images_and_references():
+    text = render_markdown(REPORT).decode("utf-8")
+    assert text.startswith("# Fusion energy\n\n*Generated by JARVIS on 2024-05-01 09:30 UTC*\n\n## Overview")
+    assert "## Visual Assets\n\n![Image 1](https://example.com/a.png)\n![Image 2](https://example.com/b.png)" in text
+    assert "## References\n\n1. [ITER](https://iter.org)\n2. [Unknown Source](https://example.com/paper)" in text
+    assert render_export("md", REPORT, []) == render_markdown(REPORT)
+
+
+def test_markdown_export_omits_empty_sections():
+    text = render_markdown({**REPORT, "images": [], "sources": []}).decode("utf-8")
+    assert "Visual Assets" not in text
+    assert "References" not in text
+    assert text.endswith("It releases *energy*.\n\n- Tokamaks\n1. Stellarators\n")
+
+
+def test_parse_blocks_splits_headings_bullets_and_paragraphs():
+    assert _parse_blocks(REPORT["report"] + "```\ncode\n```\n") == [
+        ("heading", (2, "Overview")),
+        ("para", "Fusion joins **light** nuclei. It releases *energy*."),
+        ("bullet", "Tokamaks"),
+        ("bullet", "Stellarators"),
+        ("para", "code"),
+    ]
+
+
+def test_pdf_inline_markup_is_escaped_first():
+    assert _pdf_inline("**a** & *b* [c](https://x.io)") == '<b>a</b> &amp; <i>b</i> <link href="https://x.io" color="blue">c</link>'
+    assert _pdf_inline("<script>") == "&lt;script&gt;"
+
+
+def test_export_filename_and_cache_path(monkeypatch, tmp_path):
+    assert export_filename("Fusion: what's next?", "pdf") == "Fusion_what_s_next_JARVIS_Report.pdf"
+    assert export_filename("???", "md") == "Report_JARVIS_Report.md"
+    monkeypatch.setattr(exports, "EXPORT_CACHE_DIR", str(tmp_path))
+    assert export_path("abc", "docx") == str(tmp_path / f"abc.v{exports.RENDER_VERSION}.docx")
+
+
+def test_markdown_needs_no_optional_library():
+    assert exports.format_available("md")
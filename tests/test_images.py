@@ -0,0 +1,80 @@
+import os
+import time
+from urllib.parse import parse_qs, urlparse
+
+from backend import images
+from backend.images import (
+    canonicalize_image_url,
+    dedupe_image_urls,
+    is_public_url,
+    snap_thumb_width,
+    thumbnail_key,
+    thumbnail_signature,
+    thumbnail_url,
+    verify_thumbnail_signature,
+)
+
+
+def test_canonicalize_normalizes_host_port_and_tracking_params():
+    url = "HTTPS://Images.Example.com:443/a.png?utm_source=x&b=2&fbclid=y&a=1#frag"
+    assert canonicalize_image_url(url) == "https://images.example.com/a.png?a=1&b=2"
+    assert canonicalize_image_url("http://example.com:8080") == "http://example.com:8080/"
+
+
+def test_dedupe_keeps_first_occurrence_and_drops_non_http():
+    urls = dedupe_image_urls([
+        "https://example.com/a.png?utm_campaign=z",
+        {"url": "https://EXAMPLE.com/a.png", "description": "same file"},
+        "data:image/png;base64,AAAA",
+        "https://example.com/b.png",
+    ])
+    assert urls == ["https://example.com/a.png", "https://example.com/b.png"]
+
+
+def test_thumbnail_url_is_signed_for_its_own_image():
+    url = "https://example.com/a.png?x=1"
+    query = parse_qs(urlparse(thumbnail_url("http://api.local/", url, 320)).query)
+    assert query["url"] == [url]
+    assert query["w"] == ["320"]
+    assert verify_thumbnail_signature(url, query["sig"][0])
+    assert not verify_thumbnail_signature("https://example.com/other.png", query["sig"][0])
+    assert not verify_thumbnail_signature(url, None)
+    assert not verify_thumbnail_signature(url, "0" * 32)
+
+
+def test_signature_depends_on_secret(monkeypatch):
+    url = "https://example.com/a.png"
+    signature = thumbnail_signature(url)
+    monkeypatch.setattr(images, "IMAGE_PROXY_SECRET", "rotated")
+    assert thumbnail_signature(url) != signature
+    assert not verify_thumbnail_signature(url, signature)
+
+
+def test_snap_thumb_width_and_key_share_variants():
+    assert snap_thumb_width(None) == images.DEFAULT_THUMB_WIDTH
+    assert snap_thumb_width(10) == 160
+    assert snap_thumb_width(500) == 480
+    assert snap_thumb_width(5000) == 960
+    assert thumbnail_key("https://EXAMPLE.com/a.png?utm_source=x", 320) == thumbnail_key("https://example.com/a.png", 320)
+    assert thumbnail_key("https://example.com/a.png", 320) != thumbnail_key("https://example.com/a.png", 640)
+
+
+def test_is_public_url_rejects_internal_targets():
+    assert not is_public_url("http://127.0.0.1/admin")
+    assert not is_public_url("http://169.254.169.254/latest/meta-data")
+    assert not is_public_url("file:///etc/passwd")
+    assert not is_public_url("http://10.0.0.5:8080/")
+
+
+def test_prune_thumbnails_drops_stale_then_oldest(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "THUMB_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(images, "THUMB_CACHE_MAX_BYTES", 250)
+    monkeypatch.setattr(images, "THUMB_CACHE_MAX_AGE", 3600)
+    now = time.time()
+    for name, age in (("stale.webp", 7200), ("old.webp", 300), ("mid.webp", 200), ("new.webp", 100)):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - age, now - age))
+
+    images._prune_thumbnails()
+    assert sorted(os.listdir(tmp_path)) == ["mid.webp", "new.webp"]
@@ -0,0 +1,67 @@
+import pytest
+
+from backend import llm_router as router_module
+from backend.llm_router import LLMRouter
+
+ROUTES = ["groq:fast", "gemini:backup"]
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    router = LLMRouter(policies={"qa": {"routes": ROUTES, "latency_budget": 10.0}})
+    router.calls = []
+    router.failing = set()
+
+    def call_provider(provider, model, prompt, *args):
+        route = f"{provider}:{model}"
+        router.calls.append(route)
+        if route in router.failing:
+            raise Exception(f"{route} is down")
+        return f"answer from {route}", 10, 5
+
+    monkeypatch.setattr(router, "_call_provider", call_provider)
+    return router
+
+
+def test_uses_configured_order(router):
+    assert router.generate("qa", "hi")["model"] == "fast"
+    assert router.calls == ["groq:fast"]
+
+
+def test_falls_back_to_next_route(router):
+    router.failing.add("groq:fast")
+    result = router.generate("qa", "hi")
+    assert result["model"] == "backup"
+    assert router.calls == ["groq:fast", "gemini:backup"]
+    assert router.stats()["groq:fast"]["errors"] == 1
+
+
+def test_raises_when_every_route_fails(router):
+    router.failing.update(ROUTES)
+    with pytest.raises(Exception, match="All LLM routes failed"):
+        router.generate("qa", "hi")
+
+
+def test_skips_providers_without_keys(router, monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY")
+    assert router.candidate_routes("qa") == ["gemini:backup"]
+
+
+def test_demotes_failing_route_until_cooldown(router, monkeypatch):
+    router.failing.add("groq:fast")
+    for _ in range(router_module.MIN_SAMPLES):
+        router.generate("qa", "hi")
+    assert router.candidate_routes("qa") == ["gemini:backup", "groq:fast"]
+
+    # Once the cooldown has passed the route is probed first again
+    monkeypatch.setattr(router_module, "ROUTE_COOLDOWN_SECONDS", 0)
+    assert router.candidate_routes("qa") == ROUTES
+
+
+def test_demotes_routes_over_latency_budget(router):
+    stats = router._route_stats("groq:fast")
+    for _ in range(router_module.MIN_SAMPLES):
+        stats.record(latency=30.0, ok=True)
+    assert router.candidate_routes("qa") == ["gemini:backup", "groq:fast"]
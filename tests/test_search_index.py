@@ -0,0 +1,53 @@
+import pytest
+
+from backend.search_index import ReportSearchIndex, build_match_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ReportSearchIndex(str(tmp_path / "search.db"))
+    index.add("user", "r1", "Fusion energy", "Tokamaks confine plasma with magnetic fields.")
+    index.add("user_abc", "r2", "Fusion startups", "Private fusion companies raise funding.")
+    index.add("___", "r3", "Fusion history", "Early fusion experiments in the 1950s.")
+    index.add("-", "r4", "Fusion policy", "Governments fund fusion research.")
+    return index
+
+
+def ids(result):
+    return [row["report_id"] for row in result["results"]]
+
+
+def test_match_query_quotes_terms_and_prefixes_the_last():
+    assert build_match_query("user", 'Fusion "reactor') == 'owner:"user" AND {topic body}: ("fusion" "reactor"*)'
+    assert build_match_query("user", "  ?! ") is None
+
+
+def test_match_query_skips_owner_clause_without_tokens():
+    assert build_match_query("___", "fusion") == '{topic body}: ("fusion"*)'
+    assert build_match_query('a"b', "fusion").startswith('owner:"a""b" AND')
+
+
+def test_search_is_scoped_to_the_exact_owner(index):
+    assert ids(index.search("user", "fusion")) == ["r1"]
+    assert ids(index.search("user_abc", "fusion")) == ["r2"]
+    assert ids(index.search("abc", "fusion")) == []
+
+
+def test_owners_without_tokens_see_only_their_reports(index):
+    assert ids(index.search("___", "fusion")) == ["r3"]
+    assert ids(index.search("-", "fusion")) == ["r4"]
+    assert ids(index.search("__", "fusion")) == []
+
+
+def test_results_are_ranked_and_highlighted(index):
+    index.add("user", "r5", "Plasma physics", "Fusion is mentioned once here.")
+    result = index.search("user", "fusion")
+    assert ids(result) == ["r1", "r5"]
+    assert result["results"][0]["topic"] == "<mark>Fusion</mark> energy"
+    assert "<mark>Fusion</mark>" in result["results"][1]["snippet"]
+
+
+def test_readding_a_report_is_a_no_op(index):
+    index.add("user", "r1", "Fusion energy", "Tokamaks confine plasma with magnetic fields.")
+    assert index.count() == 4
+    assert ids(index.search("user", "tokam")) == ["r1"]
@@ -8,6 +8,11 @@ export interface ResearchResult {
   report: string;
   sources: Source[];
   images?: string[];
+  run_id?: string;
+  report_id?: string;
+  // Set when the backend served a precomputed result instead of running the research
+  cached?: boolean;
+  cache_age_seconds?: number;
 }
 
 export enum ResearchStatus {